@@ -0,0 +1,154 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
+
+# per-worker limits, tune these from load test results
+MAX_ACTIVE_SESSIONS = int(os.getenv("MAX_ACTIVE_SESSIONS", "20"))
+MAX_WAITING_SESSIONS = int(os.getenv("MAX_WAITING_SESSIONS", "20"))
+MAX_QUEUE_WAIT_SECS = float(os.getenv("MAX_QUEUE_WAIT_SECS", "60"))
+PROVIDER_LIMITS = {
+    "stt": int(os.getenv("MAX_INFLIGHT_STT", "20")),
+    "llm": int(os.getenv("MAX_INFLIGHT_LLM", "10")),
+    "tts": int(os.getenv("MAX_INFLIGHT_TTS", "10")),
+}
+# starting guess for the ETA, replaced by observed session lengths
+EXPECTED_SESSION_SECS = float(os.getenv("EXPECTED_SESSION_SECS", "180"))
+SESSION_SECS_SMOOTHING = 0.2
+# how often queued clients get a position update
+QUEUE_STATUS_INTERVAL_SECS = 2.0
+
+# websocket close code for "try again later"
+TRY_AGAIN_LATER = 1013
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# limits concurrent sessions per worker and queues the overflow
+class AdmissionController:
+    def __init__(
+        self,
+        max_active: int = MAX_ACTIVE_SESSIONS,
+        max_waiting: int = MAX_WAITING_SESSIONS,
+        max_wait_secs: float = MAX_QUEUE_WAIT_SECS,
+        provider_limits: dict[str, int] | None = None,
+        expected_session_secs: float = EXPECTED_SESSION_SECS,
+    ):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.max_wait_secs = max_wait_secs
+        self.avg_session_secs = expected_session_secs
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._provider_limits = provider_limits or PROVIDER_LIMITS
+        self._provider_slots: dict[str, asyncio.Semaphore] = {}
+        self._provider_in_flight = dict.fromkeys(self._provider_limits, 0)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    # expected seconds until the client at this queue position is admitted
+    def eta(self, position: int) -> float:
+        return math.ceil(position / self.max_active) * self.avg_session_secs
+
+    def retry_after(self) -> int:
+        return max(1, round(self.eta(self.waiting + 1)))
+
+    # admit a session, queueing it while the worker is full
+    # on_position(position, eta_secs) is awaited while the session waits
+    async def acquire(
+        self, on_position: Callable[[int, float], Awaitable] | None = None
+    ):
+        if self.active < self.max_active and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_waiting:
+            self.rejected += 1
+            raise AdmissionRejected("queue_full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        deadline = time.monotonic() + self.max_wait_secs
+        try:
+            while not waiter.done():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    raise AdmissionRejected("queue_timeout", self.retry_after())
+                if on_position:
+                    position = self._waiters.index(waiter) + 1
+                    await on_position(position, self.eta(position))
+                try:
+                    await asyncio.wait_for(
+                        asyncio.shield(waiter),
+                        timeout=min(QUEUE_STATUS_INTERVAL_SECS, remaining),
+                    )
+                except asyncio.TimeoutError:
+                    continue
+            self.admitted += 1
+        except BaseException:
+            # a slot handed over while we were giving up goes to the next waiter
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            raise
+
+    # session_secs feeds the ETA estimate
+    def release(self, session_secs: float | None = None):
+        if session_secs is not None:
+            self.avg_session_secs += SESSION_SECS_SMOOTHING * (
+                session_secs - self.avg_session_secs
+            )
+        # hand the slot straight to the next waiter so it can't be taken out of order
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active = max(self.active - 1, 0)
+
+    # bounds in-flight calls to one provider across all sessions of the worker
+    @asynccontextmanager
+    async def provider_slot(self, provider: str):
+        slots = self._provider_slots.get(provider)
+        if slots is None:
+            slots = asyncio.Semaphore(self._provider_limits.get(provider, 1))
+            self._provider_slots[provider] = slots
+        started = time.perf_counter()
+        async with slots:
+            waited = time.perf_counter() - started
+            if waited > 0.5:
+                print(f"[ADMISSION] Waited {waited:.2f}s for a {provider} slot")
+            self._provider_in_flight[provider] = (
+                self._provider_in_flight.get(provider, 0) + 1
+            )
+            try:
+                yield
+            finally:
+                self._provider_in_flight[provider] -= 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_session_secs": round(self.avg_session_secs, 1),
+            "provider_in_flight": dict(self._provider_in_flight),
+        }
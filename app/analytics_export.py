@@ -0,0 +1,336 @@
+import argparse
+import json
+from collections.abc import Iterable, Iterator
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from app.emotions import NEGATIVE_EMOTIONS, EmotionVector
+from app.models import TurnTiming
+
+SESSIONS_COLLECTION = "sessions"
+DEFAULT_PAGE_SIZE = 500
+STATE_FILE = "_export_state.json"
+# documents written in the last few seconds may still be missing from a query,
+# so each run only exports up to this far in the past
+EXPORT_SETTLE_SECS = 60
+
+# one column per negative emotion so the breakdown is queryable without parsing
+NEGATIVE_EMOTION_COLUMNS = {
+    emotion: f"neg_{emotion.lower()}" for emotion in NEGATIVE_EMOTIONS
+}
+
+# per-turn latency columns, null for sessions stored before timings existed
+TIMING_COLUMNS = list(TurnTiming.model_fields)
+
+SESSION_SCHEMA = pa.schema(
+    [
+        ("session_id", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("updated_at", pa.timestamp("us", tz="UTC")),
+        ("final_emotion", pa.string()),
+        ("final_confidence", pa.float32()),
+        ("total_question_count", pa.int32()),
+        ("direct_question_count", pa.int32()),
+        ("qa_pair_count", pa.int32()),
+        ("audio_url", pa.string()),
+    ]
+)
+
+QA_PAIR_SCHEMA = pa.schema(
+    [
+        ("session_id", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("updated_at", pa.timestamp("us", tz="UTC")),
+        ("turn_index", pa.int32()),
+        ("question", pa.string()),
+        ("answer", pa.string()),
+        ("emotion", pa.string()),
+        ("confidence", pa.float32()),
+        ("is_direct", pa.bool_()),
+    ]
+    + [(column, pa.float32()) for column in NEGATIVE_EMOTION_COLUMNS.values()]
+    + [(column, pa.float32()) for column in TIMING_COLUMNS]
+)
+
+
+# naive timestamps were written with datetime.now() and are treated as UTC
+def parse_timestamp(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value.astimezone(UTC)
+
+
+# documents are keyed on when they were written, older ones only have created_at
+def document_updated_at(document: dict) -> datetime:
+    return parse_timestamp(document.get("updated_at") or document["created_at"])
+
+
+# stream session documents written in (since, until] from Firestore (or the emulator)
+def iter_firestore_sessions(
+    client,
+    since: datetime | None = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    until: datetime | None = None,
+) -> Iterator[list[dict]]:
+    query = client.collection(SESSIONS_COLLECTION)
+    if since is None:
+        # first export also picks up documents written before updated_at existed
+        query = query.order_by("created_at").limit(page_size)
+    else:
+        query = query.where(filter=FieldFilter("updated_at", ">", since))
+        if until is not None:
+            query = query.where(filter=FieldFilter("updated_at", "<=", until))
+        query = query.order_by("updated_at").limit(page_size)
+
+    last_snapshot = None
+    while True:
+        page_query = query.start_after(last_snapshot) if last_snapshot else query
+        snapshots = list(page_query.stream())
+        if not snapshots:
+            return
+        documents = [snapshot.to_dict() for snapshot in snapshots]
+        if until is not None:
+            documents = [d for d in documents if document_updated_at(d) <= until]
+        yield documents
+        if len(snapshots) < page_size:
+            return
+        last_snapshot = snapshots[-1]
+
+
+# read sessions from a JSON array or JSON lines dump of AgentSession documents
+def iter_json_sessions(
+    path: Path,
+    since: datetime | None = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    until: datetime | None = None,
+) -> Iterator[list[dict]]:
+    with path.open() as f:
+        first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            documents: Iterable[dict] = json.load(f)
+        else:
+            documents = (json.loads(line) for line in f if line.strip())
+
+        page = []
+        for document in documents:
+            updated_at = document_updated_at(document)
+            if since is not None and updated_at <= since:
+                continue
+            if until is not None and updated_at > until:
+                continue
+            page.append(document)
+            if len(page) >= page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+
+# flatten a page of session documents into session and QA pair tables
+def flatten_sessions(documents: list[dict]) -> tuple[pa.Table, pa.Table]:
+    sessions = {name: [] for name in SESSION_SCHEMA.names}
+    qa_pairs = {name: [] for name in QA_PAIR_SCHEMA.names}
+
+    for document in documents:
+        created_at = parse_timestamp(document["created_at"])
+        updated_at = document_updated_at(document)
+        pairs = document.get("qa_pairs") or []
+
+        sessions["session_id"].append(document["session_id"])
+        sessions["created_at"].append(created_at)
+        sessions["updated_at"].append(updated_at)
+        sessions["final_emotion"].append(document.get("final_emotion"))
+        sessions["final_confidence"].append(document.get("final_confidence"))
+        sessions["total_question_count"].append(document.get("total_question_count"))
+        sessions["direct_question_count"].append(document.get("direct_question_count"))
+        sessions["qa_pair_count"].append(len(pairs))
+        sessions["audio_url"].append(document.get("audio_url"))
+
+        for turn_index, pair in enumerate(pairs):
+            qa_pairs["session_id"].append(document["session_id"])
+            qa_pairs["created_at"].append(created_at)
+            qa_pairs["updated_at"].append(updated_at)
+            qa_pairs["turn_index"].append(turn_index)
+            qa_pairs["question"].append(pair.get("question"))
+            qa_pairs["answer"].append(pair.get("answer"))
+            qa_pairs["emotion"].append(pair.get("emotion"))
+            qa_pairs["confidence"].append(pair.get("confidence"))
+            qa_pairs["is_direct"].append(pair.get("is_direct", False))
+
+            # missing breakdown stays null, stored bytes and legacy dicts both decode
+            percentages = pair.get("negative_emotion_percentages")
+            vector = EmotionVector.validate(percentages) if percentages else None
+            values = vector.values if vector is not None else None
+            for i, column in enumerate(NEGATIVE_EMOTION_COLUMNS.values()):
+                qa_pairs[column].append(
+                    float(values[i]) if values is not None else None
+                )
+
+            timing = pair.get("timing") or {}
+            for column in TIMING_COLUMNS:
+                qa_pairs[column].append(timing.get(column))
+
+    return (
+        pa.Table.from_pydict(sessions, schema=SESSION_SCHEMA),
+        pa.Table.from_pydict(qa_pairs, schema=QA_PAIR_SCHEMA),
+    )
+
+
+def load_high_water_mark(out_dir: Path) -> datetime | None:
+    state_path = out_dir / STATE_FILE
+    if not state_path.exists():
+        return None
+    state = json.loads(state_path.read_text())
+    return parse_timestamp(state["high_water_mark"])
+
+
+def save_high_water_mark(out_dir: Path, high_water_mark: datetime):
+    state_path = out_dir / STATE_FILE
+    state_path.write_text(json.dumps({"high_water_mark": high_water_mark.isoformat()}))
+
+
+# export sessions written after the stored high-water mark, one parquet part per run
+# a rewritten (resumed) session is exported again, read_table keeps the latest copy
+def export_sessions(pages: Iterable[list[dict]], out_dir: Path) -> int:
+    run_id = datetime.now(UTC).strftime("%Y%m%dT%H%M%S%f")
+    sessions_path = out_dir / "sessions" / f"part-{run_id}.parquet"
+    qa_pairs_path = out_dir / "qa_pairs" / f"part-{run_id}.parquet"
+    sessions_path.parent.mkdir(parents=True, exist_ok=True)
+    qa_pairs_path.parent.mkdir(parents=True, exist_ok=True)
+
+    high_water_mark = load_high_water_mark(out_dir)
+    exported = 0
+    sessions_writer = None
+    qa_pairs_writer = None
+    try:
+        # each page becomes a row group so memory stays bounded by page size
+        for page in pages:
+            sessions_table, qa_pairs_table = flatten_sessions(page)
+            if sessions_writer is None:
+                sessions_writer = pq.ParquetWriter(sessions_path, SESSION_SCHEMA)
+                qa_pairs_writer = pq.ParquetWriter(qa_pairs_path, QA_PAIR_SCHEMA)
+            sessions_writer.write_table(sessions_table)
+            qa_pairs_writer.write_table(qa_pairs_table)
+
+            exported += sessions_table.num_rows
+            page_max = pc.max(sessions_table["updated_at"]).as_py()
+            if page_max and (high_water_mark is None or page_max > high_water_mark):
+                high_water_mark = page_max
+    finally:
+        if sessions_writer is not None:
+            sessions_writer.close()
+            qa_pairs_writer.close()
+
+    # only advance the mark once the parts are fully written
+    if exported:
+        save_high_water_mark(out_dir, high_water_mark)
+    print(f"[EXPORT] Exported {exported} sessions to {out_dir}")
+    return exported
+
+
+def read_table(out_dir: Path, name: str) -> pa.Table:
+    schema = SESSION_SCHEMA if name == "sessions" else QA_PAIR_SCHEMA
+    path = out_dir / name
+    if not path.exists():
+        return schema.empty_table()
+    return latest_versions(ds.dataset(path, format="parquet", schema=schema).to_table())
+
+
+# keep only rows from the newest export of each session
+def latest_versions(table: pa.Table) -> pa.Table:
+    if table.num_rows == 0:
+        return table
+    latest = (
+        table.group_by("session_id")
+        .aggregate([("updated_at", "max")])
+        .rename_columns(["session_id", "updated_at"])
+    )
+    return table.join(latest, ["session_id", "updated_at"], join_type="inner").select(
+        table.schema.names
+    )
+
+
+# aggregate queries, vectorized over the exported tables
+
+
+def emotion_summary(qa_pairs: pa.Table) -> pa.Table:
+    return (
+        qa_pairs.group_by("emotion")
+        .aggregate([("confidence", "count"), ("confidence", "mean")])
+        .rename_columns(["emotion", "turns", "mean_confidence"])
+        .sort_by([("turns", "descending")])
+    )
+
+
+def negative_emotion_means(qa_pairs: pa.Table) -> dict[str, float | None]:
+    return {
+        emotion: pc.mean(qa_pairs[column]).as_py()
+        for emotion, column in NEGATIVE_EMOTION_COLUMNS.items()
+    }
+
+
+def daily_sessions(sessions: pa.Table) -> pa.Table:
+    days = pc.floor_temporal(sessions["created_at"], unit="day")
+    return (
+        sessions.append_column("day", days)
+        .group_by("day")
+        .aggregate(
+            [
+                ("session_id", "count"),
+                ("qa_pair_count", "mean"),
+                ("final_confidence", "mean"),
+            ]
+        )
+        .rename_columns(["day", "sessions", "mean_turns", "mean_final_confidence"])
+        .sort_by("day")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export stored sessions to Parquet tables"
+    )
+    parser.add_argument("--source", choices=["firestore", "json"], default="firestore")
+    parser.add_argument("--input", type=Path, help="JSON dump when --source=json")
+    parser.add_argument("--out", type=Path, default=Path("analytics"))
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument(
+        "--summary", action="store_true", help="print aggregates after export"
+    )
+    args = parser.parse_args()
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    since = load_high_water_mark(args.out)
+    until = datetime.now(UTC) - timedelta(seconds=EXPORT_SETTLE_SECS)
+    if args.source == "json":
+        if args.input is None:
+            parser.error("--input is required when --source=json")
+        pages = iter_json_sessions(args.input, since, args.page_size, until)
+    else:
+        # set FIRESTORE_EMULATOR_HOST to export from the emulator
+        from app.deps import get_firestore_client
+
+        pages = iter_firestore_sessions(
+            get_firestore_client(), since, args.page_size, until
+        )
+
+    export_sessions(pages, args.out)
+
+    if args.summary:
+        qa_pairs = read_table(args.out, "qa_pairs")
+        print(emotion_summary(qa_pairs))
+        print(json.dumps(negative_emotion_means(qa_pairs), indent=2))
+        print(daily_sessions(read_table(args.out, "sessions")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import base64
+
+try:
+    import opuslib
+except Exception:  # opuslib raises when the libopus shared library is missing
+    opuslib = None
+
+# MPEG audio frame header tables
+# http://www.mp3-tech.org/programmer/frame_header.html
+MPEG_VERSION_1 = 3
+MPEG_VERSION_2 = 2
+MPEG_VERSION_2_5 = 0
+
+LAYER_I = 3
+LAYER_II = 2
+LAYER_III = 1
+
+BITRATES_KBPS = {
+    (MPEG_VERSION_1, LAYER_I): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (MPEG_VERSION_1, LAYER_II): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (MPEG_VERSION_1, LAYER_III): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (MPEG_VERSION_2, LAYER_I): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (MPEG_VERSION_2, LAYER_II): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (MPEG_VERSION_2, LAYER_III): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}  # fmt: skip
+
+SAMPLE_RATES = {
+    MPEG_VERSION_1: (44100, 48000, 32000),
+    MPEG_VERSION_2: (22050, 24000, 16000),
+    MPEG_VERSION_2_5: (11025, 12000, 8000),
+}
+
+MP3_HEADER_SIZE = 4
+ID3_HEADER_SIZE = 10
+
+
+# parse a 4 byte MPEG audio header, returns (frame_length, samples, sample_rate)
+def parse_mp3_frame_header(header: bytes) -> tuple[int, int, int] | None:
+    if len(header) < MP3_HEADER_SIZE:
+        return None
+    if header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+
+    if version == 1 or layer == 0 or sample_rate_index == 3:
+        return None
+    if bitrate_index in (0, 15):
+        return None
+
+    # MPEG 2.5 shares the MPEG 2 bitrate table
+    table_version = MPEG_VERSION_1 if version == MPEG_VERSION_1 else MPEG_VERSION_2
+    bitrate = BITRATES_KBPS[(table_version, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+
+    if layer == LAYER_I:
+        samples = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == LAYER_II or version == MPEG_VERSION_1:
+        samples = 1152
+        frame_length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        frame_length = 72 * bitrate // sample_rate + padding
+
+    return frame_length, samples, sample_rate
+
+
+# counts playback time of an mp3 stream chunk by chunk without decoding it
+class Mp3DurationCounter:
+    def __init__(self):
+        self.frames = 0
+        self.duration_secs = 0.0
+        self._buffer = bytearray()
+        self._skip = 0
+        self._started = False
+
+    def feed(self, chunk: bytes) -> None:
+        # skip the rest of the current frame without buffering it
+        if self._skip:
+            skipped = min(self._skip, len(chunk))
+            self._skip -= skipped
+            chunk = chunk[skipped:]
+        self._buffer.extend(chunk)
+
+        while True:
+            if not self._started and not self._skip_id3_tag():
+                return
+            if len(self._buffer) < MP3_HEADER_SIZE:
+                return
+
+            parsed = parse_mp3_frame_header(self._buffer)
+            if parsed is None:
+                # lost sync, look for the next frame header
+                del self._buffer[0]
+                continue
+
+            frame_length, samples, sample_rate = parsed
+            self.frames += 1
+            self.duration_secs += samples / sample_rate
+
+            if frame_length > len(self._buffer):
+                self._skip = frame_length - len(self._buffer)
+                self._buffer.clear()
+                return
+            del self._buffer[:frame_length]
+
+    # ID3v2 tags can precede the first frame, returns False until enough data
+    def _skip_id3_tag(self) -> bool:
+        if len(self._buffer) < 3:
+            return False
+        if self._buffer[:3] != b"ID3":
+            self._started = True
+            return True
+        if len(self._buffer) < ID3_HEADER_SIZE:
+            return False
+
+        self._started = True
+        # tag size is a 28 bit syncsafe integer
+        size = 0
+        for byte in self._buffer[6:10]:
+            size = (size << 7) | (byte & 0x7F)
+        tag_length = ID3_HEADER_SIZE + size
+        if tag_length > len(self._buffer):
+            self._skip = tag_length - len(self._buffer)
+            self._buffer.clear()
+            return False
+        del self._buffer[:tag_length]
+        return True
+
+
+# uplink decoders turn client audio frames into LINEAR16 PCM for STT and the archive
+UPLINK_SAMPLE_RATE = 16000
+# largest opus frame is 120ms
+OPUS_MAX_FRAME_SIZE = UPLINK_SAMPLE_RATE * 120 // 1000
+
+
+class PcmDecoder:
+    codec = "pcm"
+
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def decode(self, data: bytes) -> bytes:
+        self.bytes_in += len(data)
+        self.bytes_out += len(data)
+        return data
+
+
+# each websocket message carries one raw opus packet from WebCodecs
+class OpusDecoder(PcmDecoder):
+    codec = "opus"
+
+    def __init__(self):
+        super().__init__()
+        self._decoder = opuslib.Decoder(UPLINK_SAMPLE_RATE, 1)
+
+    def decode(self, data: bytes) -> bytes:
+        self.bytes_in += len(data)
+        try:
+            pcm = self._decoder.decode(data, OPUS_MAX_FRAME_SIZE)
+        except opuslib.OpusError as e:
+            print(f"[AUDIO] Dropping undecodable opus packet: {e}")
+            return b""
+        self.bytes_out += len(pcm)
+        return pcm
+
+
+# negotiate the uplink codec, raw PCM is the fallback
+def create_uplink_decoder(requested_codec: str | None) -> PcmDecoder:
+    if requested_codec == OpusDecoder.codec:
+        if opuslib is not None:
+            return OpusDecoder()
+        print("[AUDIO] Opus uplink requested but libopus is unavailable, using PCM")
+    return PcmDecoder()
+
+
+# websocket framing for audio chunks, base64 inside JSON
+def stt_audio_message(pcm: bytes) -> dict:
+    return {"audio_base_64": base64.b64encode(pcm).decode("utf-8")}
+
+
+def tts_audio_message(chunk: bytes) -> dict:
+    return {
+        "type": "question_audio_base_64",
+        "chunk": base64.b64encode(chunk).decode("utf-8"),
+    }
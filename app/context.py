@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+from collections import Counter
+from collections.abc import Awaitable, Callable
+
+from app.models import QAEmotionPair, SessionState, UserProfile
+from app.song_catalog import SongCandidate
+
+# history tokens allowed in the prompt before older turns are folded into a summary
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# most recent turns that always stay verbatim
+CONTEXT_RECENT_TURNS = int(os.getenv("CONTEXT_RECENT_TURNS", "4"))
+# how long the next prompt waits for a summary still being generated
+SUMMARY_WAIT_SECS = float(os.getenv("SUMMARY_WAIT_SECS", "2"))
+# rough tokens per character for English text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+# previous Q&A pairs as the agent sees them
+def qa_pairs_json(qa_pairs: list[QAEmotionPair]) -> str:
+    return json.dumps(
+        [
+            {
+                "question": qa.question,
+                "answer": qa.answer,
+                "emotion": qa.emotion,
+                "confidence": qa.confidence,
+                "is_direct": qa.is_direct,
+            }
+            for qa in qa_pairs
+        ]
+    )
+
+
+# aggregated emotions of turns that are no longer in the prompt verbatim
+def emotion_stats(qa_pairs: list[QAEmotionPair]) -> dict:
+    if not qa_pairs:
+        return {}
+    return {
+        "turns": len(qa_pairs),
+        "emotions": dict(Counter(qa.emotion for qa in qa_pairs).most_common()),
+        "mean_confidence": round(
+            sum(qa.confidence for qa in qa_pairs) / len(qa_pairs), 2
+        ),
+        "direct_questions": sum(1 for qa in qa_pairs if qa.is_direct),
+    }
+
+
+# how many leading turns are left out of the verbatim history
+# turns covered by the summary, or more while a summary is still missing,
+# so the history never exceeds the budget beyond the recent turns
+def folded_turns(
+    state: SessionState,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    recent_turns: int = CONTEXT_RECENT_TURNS,
+) -> int:
+    folded = min(state.summarized_turns, len(state.qa_pairs))
+    verbatim = state.qa_pairs[folded:]
+    if estimate_tokens(qa_pairs_json(verbatim)) > token_budget:
+        folded = max(folded, len(state.qa_pairs) - recent_turns)
+    return folded
+
+
+# prompt for the main agent with the existing context
+def build_agent_prompt(
+    user_input: str,
+    state: SessionState,
+    profile: UserProfile | None = None,
+    song_candidates: list[SongCandidate] | None = None,
+) -> str:
+    profile = profile or UserProfile()
+    folded = folded_turns(state)
+    earlier = ""
+    if folded:
+        earlier = f"""
+                Earlier conversation ({folded} turns, summarized):
+                {state.context_summary or "No summary yet."}
+                Emotions in earlier turns: {json.dumps(emotion_stats(state.qa_pairs[:folded]))}
+"""
+    candidates = ""
+    if song_candidates:
+        candidates = f"""
+                Candidate songs (ranked for the session emotions and preferences):
+                {json.dumps([candidate.song.label for candidate in song_candidates])}
+"""
+
+    return f"""
+                User message: "{user_input}"
+
+                Current context:
+                - Questions asked so far: {len(state.qa_pairs)}
+                - Direct questions used: {state.direct_question_count}/5
+                - High confidence reached: {state.high_confidence_reached}
+                - Music reminder already given: {state.music_reminder_given}
+                - User music preferences: {profile.model_dump_json(exclude={"user_id"})}
+{earlier}{candidates}
+                Previous Q&A pairs:
+                {qa_pairs_json(state.qa_pairs[folded:])}
+
+                Process this user input according to your workflow.
+            """
+
+
+# folds older turns into a running summary in the background between turns
+# summarize(previous_summary, turns) returns the new summary
+class ContextCompactor:
+    def __init__(
+        self,
+        summarize: Callable[[str | None, list[QAEmotionPair]], Awaitable[str]],
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        recent_turns: int = CONTEXT_RECENT_TURNS,
+        wait_secs: float = SUMMARY_WAIT_SECS,
+        task_group: asyncio.TaskGroup | None = None,
+    ):
+        self.summarize = summarize
+        # summaries run in the session's task group so they end with the session
+        self.task_group = task_group
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.wait_secs = wait_secs
+        self.summaries = 0
+        self._task: asyncio.Task | None = None
+        self._upto = 0
+
+    # after a turn: start summarizing when the verbatim history is over budget
+    def maybe_start(self, state: SessionState):
+        if self._task is not None:
+            return
+        verbatim = state.qa_pairs[state.summarized_turns :]
+        if len(verbatim) <= self.recent_turns:
+            return
+        if estimate_tokens(qa_pairs_json(verbatim)) <= self.token_budget:
+            return
+        self._upto = len(state.qa_pairs) - self.recent_turns
+        create_task = (
+            self.task_group.create_task if self.task_group else asyncio.create_task
+        )
+        self._task = create_task(
+            self._summarize(
+                state.context_summary,
+                state.qa_pairs[state.summarized_turns : self._upto],
+            )
+        )
+
+    # a failed summary must not fail the session's task group, None instead
+    async def _summarize(
+        self, previous_summary: str | None, qa_pairs: list[QAEmotionPair]
+    ) -> str | None:
+        try:
+            return await self.summarize(previous_summary, qa_pairs)
+        except Exception as e:
+            print(f"[CONTEXT] Failed to summarize turns: {e}")
+            return None
+
+    # before the next prompt: take the summary if it is ready in time
+    async def apply(self, state: SessionState):
+        if self._task is None:
+            return
+        if not self._task.done():
+            await asyncio.wait([self._task], timeout=self.wait_secs)
+            if not self._task.done():
+                print("[CONTEXT] Summary not ready, folding turns without it")
+                return
+        task, self._task = self._task, None
+        summary = task.result()
+        if summary is None:
+            return
+        state.context_summary = summary
+        state.summarized_turns = self._upto
+        self.summaries += 1
+        print(f"[CONTEXT] Summarized {self._upto} turns")
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
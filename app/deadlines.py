@@ -0,0 +1,37 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+# longest time a session may spend in one stage before it is reaped
+STAGE_DEADLINES_SECS = {
+    # waiting for a committed answer, covers silent users and stuck STT sessions
+    "stt": float(os.getenv("STT_DEADLINE_SECS", "120")),
+    # one main agent run or background summary, including the wait for a slot
+    "llm": float(os.getenv("LLM_DEADLINE_SECS", "90")),
+    # streaming one prompt's audio to the client
+    "tts": float(os.getenv("TTS_DEADLINE_SECS", "30")),
+}
+
+
+class StageTimeout(Exception):
+    def __init__(self, stage: str, deadline_secs: float):
+        super().__init__(f"{stage} exceeded its {deadline_secs:.0f}s deadline")
+        self.stage = stage
+        self.deadline_secs = deadline_secs
+
+
+# cancels the block when the stage runs past its deadline
+# timeouts raised by the block itself pass through unchanged
+@asynccontextmanager
+async def stage_deadline(stage: str, deadline_secs: float | None = None):
+    if deadline_secs is None:
+        deadline_secs = STAGE_DEADLINES_SECS[stage]
+    timeout = asyncio.timeout(deadline_secs)
+    try:
+        async with timeout:
+            yield
+    except TimeoutError as e:
+        if not timeout.expired():
+            raise
+        print(f"[DEADLINE] {stage} stage exceeded {deadline_secs:.0f}s, cancelled")
+        raise StageTimeout(stage, deadline_secs) from e
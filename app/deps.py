@@ -1,38 +1,93 @@
 import os
+from functools import cache
 
+from agents import set_default_openai_client
 from elevenlabs import ElevenLabs
-from google.auth import default
 from google.cloud import firestore, storage
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from app.admission import AdmissionController
+from app.provider_pool import create_async_http_client, create_http_client
+from app.quota import QuotaScheduler
+from app.response_cache import ResponseCache
+from app.session_history import create_session_history
+from app.session_store import create_session_store
+from app.user_profiles import create_user_profile_store
 
 # Clients startup and config
-credentials, project = default()
+# provider clients are created on first use, so modules importing this one
+# (tests, benchmarks, offline tools) don't need credentials
 
 
-firestore_client = firestore.Client()
+@cache
+def get_firestore_client():
+    return firestore.Client()
 
-storage_client = storage.Client()
 
-elevenlabs_client = ElevenLabs(
-    api_key=os.getenv("ELEVENLABS_API_KEY"),  # TODO look for more secure way later
-)
+@cache
+def get_storage_client():
+    return storage.Client()
 
-openai_client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),  # TODO look for more secure way later
-)
 
+# TTS and LLM calls reuse keep-alive HTTP/2 connections across sessions
+@cache
+def get_elevenlabs():
+    return ElevenLabs(
+        api_key=os.getenv("ELEVENLABS_API_KEY"),  # TODO look for more secure way later
+        httpx_client=create_http_client(timeout=240),
+    )
 
-def get_firestore_client():
-    return firestore_client
 
+@cache
+def get_openai_client():
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),  # TODO look for more secure way later
+        http_client=create_http_client(timeout=600),
+    )
 
-def get_storage_client():
-    return storage_client
 
+# client used by the agents runner, called from the app lifespan
+@cache
+def configure_agents_client():
+    set_default_openai_client(
+        AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=create_async_http_client(timeout=600),
+        )
+    )
 
-def get_elevenlabs():
-    return elevenlabs_client
 
+@cache
+def get_session_store():
+    return create_session_store()
 
-def get_openai_client():
-    return openai_client
+
+# USER_PROFILE_STORE=memory keeps profiles in the worker, e.g. for local runs
+@cache
+def get_user_profile_store():
+    if os.getenv("USER_PROFILE_STORE", "firestore") == "memory":
+        return create_user_profile_store()
+    return create_user_profile_store(get_firestore_client())
+
+
+# stored sessions for the history API, behind the worker's read cache
+@cache
+def get_session_history():
+    return create_session_history(get_firestore_client())
+
+
+@cache
+def get_admission_controller():
+    return AdmissionController()
+
+
+# provider rate limits shared by every session of the worker
+@cache
+def get_quota_scheduler():
+    return QuotaScheduler()
+
+
+# first-turn agent results shared by the sessions of the worker
+@cache
+def get_response_cache():
+    return ResponseCache()
@@ -1,5 +1,5 @@
 import asyncio
-import base64
+from typing import NamedTuple
 
 from elevenlabs import (
     AudioFormat,
@@ -8,10 +8,14 @@ from elevenlabs import (
     RealtimeEvents,
     VoiceSettings,
 )
-from fastapi import WebSocket
-from fastapi.websockets import WebSocketState
 
-from app.deps import get_elevenlabs
+from app.audio_utils import Mp3DurationCounter, stt_audio_message, tts_audio_message
+from app.deps import get_elevenlabs, get_quota_scheduler
+from app.events import SessionEventBus, Transcript
+from app.outbound import OutboundWriter
+from app.provider_pool import ConnectionPool
+from app.quota import PRIORITY_BACKGROUND
+from app.trace import current_trace, encode
 
 STT_MODEL_ID = "scribe_v2_realtime"
 STT_AUDIO_FORMAT = AudioFormat.PCM_16000
@@ -20,20 +24,19 @@ VAD_SILENCE_THRESHOLD_SECS = 3.0
 VAD_THRESHOLD = 0.4
 MIN_SPEECH_DURATION_MS = 100
 MIN_SILENCE_DURATION_MS = 100
+# how long a committed answer waits for its word timestamps
+STT_TIMESTAMPS_GRACE_SECS = 0.3
 
 TTS_VOICE_ID = "I3MrSgiotopLY33bjEX7"  # Yaron, Erik: "VWoIQlDpnFjY9kfJ11dz", Adam: "pNInz6obpgDQGcFmaJgB"
 TTS_OUTPUT_FORMAT = "mp3_22050_32"
 TTS_MODEL_ID = "eleven_multilingual_v2"
 
 
-async def stt_elevenlabs_session(
-    audio_queue, res_queue, answer_transcript_container, answer_ready, websocket
-):
-    print("[STT] Starting ElevenLabs STT session")
-    elevenlabs = get_elevenlabs()
-    stop = asyncio.Event()
-
-    connection = await elevenlabs.speech_to_text.realtime.connect(
+# opens a realtime STT connection configured for VAD committed answers
+# every open counts against the STT session quota, warm ones included
+async def open_stt_connection(priority: int | None = None):
+    await get_quota_scheduler().acquire("elevenlabs", "stt_sessions", priority=priority)
+    return await get_elevenlabs().speech_to_text.realtime.connect(
         RealtimeAudioOptions(
             model_id=STT_MODEL_ID,
             audio_format=STT_AUDIO_FORMAT,
@@ -47,36 +50,106 @@ async def stt_elevenlabs_session(
         )
     )
 
+
+# warm connections shared by all sessions of the worker, started in the app lifespan
+stt_pool = ConnectionPool(
+    "stt",
+    open_stt_connection,
+    # warming the pool goes after session traffic
+    background_connect=lambda: open_stt_connection(PRIORITY_BACKGROUND),
+    watch_close=lambda connection, on_close: connection.on(
+        RealtimeEvents.CLOSE, on_close
+    ),
+)
+
+
+async def stt_elevenlabs_session(
+    audio_queue,
+    events: SessionEventBus,
+    outbound: OutboundWriter,
+    speech_detected=None,
+):
+    print("[STT] Starting ElevenLabs STT session")
+    stop = asyncio.Event()
+    answer_ready = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    # archive offset of the first frame sent, word timestamps count from there
+    stream_offset = None
+    committed_text = None
+    finish_timer = None
+    # callbacks run outside the session task, so the recorder is captured here
+    trace = current_trace.get()
+    trace_index = trace.next_index("stt") if trace else None
+
+    def trace_event(event: RealtimeEvents, data: dict | None = None):
+        if trace:
+            trace.record("stt", n=trace_index, event=event.value, data=data)
+
+    connection = await stt_pool.acquire()
+    trace_event(RealtimeEvents.OPEN)
+
     def on_session_started(data):
         print(f"[STT] Session started: {data.get('session_id', 'unknown')}")
 
     def on_partial_transcript(data):
+        trace_event(RealtimeEvents.PARTIAL_TRANSCRIPT, data)
+        text = data.get("text", "")
+        # first words from the user, used for barge-in
+        if speech_detected is not None and text.strip():
+            speech_detected.set()
         transcript_data = {
             "type": "transcript",
-            "transcript": data.get("text", ""),
+            "transcript": text,
             "is_final": False,
         }
-        res_queue.put_nowait(transcript_data)
+        events.transcripts.publish(Transcript(text, is_final=False))
         # send to frontend
-        asyncio.create_task(websocket.send_json(transcript_data))
+        outbound.send_nowait(transcript_data)
 
-    def on_committed_transcript(data):
-        text = data.get("text", "")
-        answer_transcript_container["current"] += text
+    # the answer is published once, with timestamps if they arrive in time
+    def finish_answer(text: str, words: tuple[dict, ...] = ()):
+        if answer_ready.is_set():
+            return
         transcript_data = {
             "type": "transcript",
             "transcript": text,
             "is_final": True,
         }
-        res_queue.put_nowait(transcript_data)
+        events.transcripts.publish(
+            Transcript(text, is_final=True, words=words, audio_offset=stream_offset)
+        )
         # send to frontend
-        asyncio.create_task(websocket.send_json(transcript_data))
+        outbound.send_nowait(transcript_data)
         # signal that answer is ready (VAD detected end of speech)
         print(f"[STT] VAD detected silence, answer complete: {text}")
         answer_ready.set()
+        stop.set()
+
+    def on_committed_transcript(data):
+        nonlocal committed_text, finish_timer
+        trace_event(RealtimeEvents.COMMITTED_TRANSCRIPT, data)
+        text = data.get("text", "")
+        if speech_detected is not None and text.strip():
+            speech_detected.set()
+        committed_text = text
+        if finish_timer is None:
+            finish_timer = loop.call_later(
+                STT_TIMESTAMPS_GRACE_SECS, finish_answer, text
+            )
+
+    def on_committed_transcript_with_timestamps(data):
+        trace_event(RealtimeEvents.COMMITTED_TRANSCRIPT_WITH_TIMESTAMPS, data)
+        text = data.get("text", committed_text or "")
+        if speech_detected is not None and text.strip():
+            speech_detected.set()
+        words = tuple(
+            word for word in data.get("words") or () if isinstance(word, dict)
+        )
+        finish_answer(text, words)
 
     def on_error(error):
         print(f"[STT] Error: {error}")
+        get_quota_scheduler().report_error("elevenlabs", error)
         stop.set()
 
     def on_close():
@@ -86,18 +159,25 @@ async def stt_elevenlabs_session(
     connection.on(RealtimeEvents.SESSION_STARTED, on_session_started)
     connection.on(RealtimeEvents.PARTIAL_TRANSCRIPT, on_partial_transcript)
     connection.on(RealtimeEvents.COMMITTED_TRANSCRIPT, on_committed_transcript)
+    connection.on(
+        RealtimeEvents.COMMITTED_TRANSCRIPT_WITH_TIMESTAMPS,
+        on_committed_transcript_with_timestamps,
+    )
     connection.on(RealtimeEvents.ERROR, on_error)
     connection.on(RealtimeEvents.CLOSE, on_close)
 
     async def send_audio():
+        nonlocal stream_offset
         last_send_time = asyncio.get_event_loop().time()
         min_interval = 0.005  # 5ms between chunks
 
-        while not stop.is_set() and not answer_ready.is_set():
+        while not stop.is_set():
             try:
-                chunk = await asyncio.wait_for(audio_queue.get(), timeout=0.1)
-                if chunk is None:
+                frame = await asyncio.wait_for(audio_queue.get(), timeout=0.1)
+                if frame is None:
                     break
+                if stream_offset is None:
+                    stream_offset = frame.offset
 
                 # rate limit to prevent elevenlabs error
                 current_time = asyncio.get_event_loop().time()
@@ -105,34 +185,56 @@ async def stt_elevenlabs_session(
                 if time_since_last < min_interval:
                     await asyncio.sleep(min_interval - time_since_last)
 
-                audio_base64 = base64.b64encode(chunk).decode("utf-8")
-                await connection.send({"audio_base_64": audio_base64})
+                await connection.send(stt_audio_message(frame.pcm))
                 last_send_time = asyncio.get_event_loop().time()
             except asyncio.TimeoutError:
                 continue
+            except Exception as e:
+                # a dead connection ends the session instead of waiting on it
+                print(f"[STT] Failed to send audio: {e}")
+                stop.set()
 
-    sender = asyncio.create_task(send_audio())
     try:
-        # wait for either answer_ready or stop event
-        await asyncio.wait(
-            [
-                asyncio.create_task(answer_ready.wait()),
-                asyncio.create_task(stop.wait()),
-            ],
-            return_when=asyncio.FIRST_COMPLETED,
-        )
+        # the sender lives in the session's task group, cancelling the session
+        # stops it before the connection is closed
+        async with asyncio.TaskGroup() as stt_tasks:
+            sender = stt_tasks.create_task(send_audio())
+            # set by the answer, an error or the server closing the connection
+            await stop.wait()
+            sender.cancel()
     finally:
         print("[STT] Closing session")
+        if finish_timer is not None:
+            finish_timer.cancel()
         await connection.close()
-        sender.cancel()
-        try:
-            await sender
-        except asyncio.CancelledError:
-            pass
 
 
-async def tts_elevenlabs_session(text: str, websocket: WebSocket):
+# client playback starts at the first chunk and lasts duration_secs
+class TtsPlayback(NamedTuple):
+    duration_secs: float
+    first_chunk_at: float | None
+
+
+# question audio for the response cache: played from its chunks when it has
+# any, otherwise filled with the synthesized audio once it streamed completely
+class PromptAudio:
+    def __init__(self, chunks: tuple[bytes, ...] = (), duration_secs: float = 0.0):
+        self.chunks = list(chunks)
+        self.duration_secs = duration_secs
+
+
+# streams question audio to the client, the client plays it as it arrives
+async def tts_elevenlabs_session(
+    text: str, outbound: OutboundWriter, recording: PromptAudio | None = None
+) -> TtsPlayback:
     print(f"[TTS] Sending text to ElevenLabs TTS: {text}")
+    duration_counter = Mp3DurationCounter()
+    chunks = []
+    first_chunk_at = None
+    response = None
+    trace = current_trace.get()
+    trace_index = trace.next_index("tts") if trace else None
+    started = trace.now() if trace else None
     try:
         response = get_elevenlabs().text_to_speech.stream(
             voice_id=TTS_VOICE_ID,
@@ -150,11 +252,41 @@ async def tts_elevenlabs_session(text: str, websocket: WebSocket):
 
         # send question audio to client
         for chunk in response:
-            if chunk and websocket.application_state == WebSocketState.CONNECTED:
-                audio_base64 = base64.b64encode(chunk).decode("utf-8")
-                await websocket.send_json(
-                    {"type": "question_audio_base_64", "chunk": audio_base64}
-                )
+            if chunk and not outbound.closed:
+                if first_chunk_at is None:
+                    first_chunk_at = asyncio.get_running_loop().time()
+                    if trace:
+                        trace.record_span("tts_first_chunk", started)
+                if trace:
+                    trace.record("tts", n=trace_index, b64=encode(chunk))
+                duration_counter.feed(chunk)
+                if recording is not None:
+                    chunks.append(chunk)
+                await outbound.send(tts_audio_message(chunk))
+        get_quota_scheduler().report_success("elevenlabs")
+        if chunks and not outbound.closed:
+            recording.chunks = chunks
+            recording.duration_secs = duration_counter.duration_secs
     except Exception as e:
         print(f"[TTS] Error during ElevenLabs TTS: {e}")
+        get_quota_scheduler().report_error("elevenlabs", e)
+    finally:
+        # closing the generator aborts the HTTP stream, e.g. when barge-in cancels us
+        if response is not None and hasattr(response, "close"):
+            response.close()
+        if trace:
+            trace.record_span("tts", started)
     await asyncio.sleep(0.1)
+    print(f"[TTS] Streamed {duration_counter.duration_secs:.2f}s of audio")
+    return TtsPlayback(duration_counter.duration_secs, first_chunk_at)
+
+
+# plays cached question audio without calling the provider
+async def replay_tts_audio(audio: PromptAudio, outbound: OutboundWriter) -> TtsPlayback:
+    first_chunk_at = asyncio.get_running_loop().time()
+    for chunk in audio.chunks:
+        if outbound.closed:
+            break
+        await outbound.send(tts_audio_message(chunk))
+    print(f"[TTS] Played {audio.duration_secs:.2f}s of cached audio")
+    return TtsPlayback(audio.duration_secs, first_chunk_at)
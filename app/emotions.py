@@ -0,0 +1,236 @@
+import os
+
+import numpy as np
+from pydantic_core import core_schema
+
+# emotion labels the conversation agent detects, in canonical order
+POSITIVE_EMOTIONS = ["Happy", "Motivated", "Calm", "Relaxed", "Focused"]
+NEGATIVE_EMOTIONS = [
+    "Depressed",
+    "Sad",
+    "Stressed",
+    "Anxious",
+    "Angry",
+    "Frustrated",
+    "Unfocused",
+    "Confused",
+]
+EMOTIONS = POSITIVE_EMOTIONS + NEGATIVE_EMOTIONS
+
+EMOTION_INDEX = {emotion.lower(): i for i, emotion in enumerate(EMOTIONS)}
+NEGATIVE_SLICE = slice(len(POSITIVE_EMOTIONS), len(EMOTIONS))
+
+# weight of a fully confident turn against the session history
+EMOTION_SMOOTHING_ALPHA = float(os.getenv("EMOTION_SMOOTHING_ALPHA", "0.5"))
+
+
+# session-level emotion distribution, confidence-weighted exponential smoothing
+class EmotionTrajectory:
+    def __init__(
+        self,
+        alpha: float = EMOTION_SMOOTHING_ALPHA,
+        trajectory: list[dict[str, float]] | None = None,
+    ):
+        self.alpha = alpha
+        # shares the caller's list so session state sees every appended point
+        self.trajectory = trajectory if trajectory is not None else []
+        # resume from the last stored point
+        self.distribution = np.zeros(len(EMOTIONS))
+        if self.trajectory:
+            last = self.trajectory[-1]
+            self.distribution[:] = [last.get(emotion, 0.0) for emotion in EMOTIONS]
+
+    @property
+    def turns(self) -> int:
+        return len(self.trajectory)
+
+    # one turn's analysis as a distribution over EMOTIONS, None for unknown labels
+    @staticmethod
+    def observation(
+        emotion: str,
+        negative_emotion_percentages: "EmotionVector | dict[str, float] | None" = None,
+    ) -> np.ndarray | None:
+        observed = np.zeros(len(EMOTIONS))
+        index = EMOTION_INDEX.get(emotion.lower()) if emotion else None
+
+        # negative turns spread over the reported breakdown
+        if isinstance(negative_emotion_percentages, EmotionVector):
+            if index is None or index >= NEGATIVE_SLICE.start:
+                observed[NEGATIVE_SLICE] = negative_emotion_percentages.values
+        elif negative_emotion_percentages and (
+            index is None or index >= NEGATIVE_SLICE.start
+        ):
+            for label, percentage in negative_emotion_percentages.items():
+                label_index = EMOTION_INDEX.get(label.lower())
+                if label_index is not None and label_index >= NEGATIVE_SLICE.start:
+                    observed[label_index] = max(percentage, 0.0)
+
+        if observed.sum() <= 0:
+            if index is None:
+                return None
+            observed[index] = 1.0
+        return observed / observed.sum()
+
+    # O(1) update, returns the new distribution
+    def update(
+        self,
+        emotion: str,
+        confidence: float,
+        negative_emotion_percentages: "EmotionVector | dict[str, float] | None" = None,
+    ) -> dict[str, float]:
+        observed = self.observation(emotion, negative_emotion_percentages)
+        if observed is not None:
+            # the first recognized turn seeds the distribution
+            weight = 1.0 if not self.distribution.any() else self.alpha * confidence
+            self.distribution *= 1.0 - weight
+            self.distribution += weight * observed
+
+        point = self.as_dict()
+        self.trajectory.append(point)
+        return point
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            emotion: round(float(value), 4)
+            for emotion, value in zip(EMOTIONS, self.distribution, strict=True)
+        }
+
+    # dominant emotion and its share of the distribution
+    def dominant(self) -> tuple[str, float] | None:
+        if not self.distribution.any():
+            return None
+        index = int(self.distribution.argmax())
+        return EMOTIONS[index], float(self.distribution[index])
+
+
+# alternative spellings the agent sometimes returns for the negative labels
+NEGATIVE_EMOTION_ALIASES = {
+    "depression": "Depressed",
+    "sadness": "Sad",
+    "stress": "Stressed",
+    "anxiety": "Anxious",
+    "anger": "Angry",
+    "frustration": "Frustrated",
+    "distracted": "Unfocused",
+    "confusion": "Confused",
+}
+NEGATIVE_EMOTION_INDEX = {
+    **{alias: NEGATIVE_EMOTIONS.index(label) for alias, label in NEGATIVE_EMOTION_ALIASES.items()},
+    **{emotion.lower(): i for i, emotion in enumerate(NEGATIVE_EMOTIONS)},
+}  # fmt: skip
+
+EMOTION_VECTOR_DTYPE = np.dtype("<f4")
+EMOTION_VECTOR_SIZE = len(NEGATIVE_EMOTIONS) * EMOTION_VECTOR_DTYPE.itemsize
+
+
+# negative emotion breakdown as float32 slots in NEGATIVE_EMOTIONS order, summing to 100
+class EmotionVector:
+    __slots__ = ("values",)
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+
+    @classmethod
+    def from_values(cls, values) -> "EmotionVector":
+        array = np.asarray(values, dtype=EMOTION_VECTOR_DTYPE)
+        if array.shape != (len(NEGATIVE_EMOTIONS),):
+            raise ValueError(
+                f"Emotion vector needs {len(NEGATIVE_EMOTIONS)} values, got {array.shape}"
+            )
+        if not np.isfinite(array).all() or (array < 0).any():
+            raise ValueError("Emotion percentages must be finite and non-negative")
+        total = array.sum()
+        if total <= 0:
+            raise ValueError("Emotion percentages must not all be zero")
+        return cls(array * np.float32(100.0 / total))
+
+    # unknown labels are dropped, known ones are renormalized to 100
+    @classmethod
+    def from_dict(cls, percentages: dict[str, float]) -> "EmotionVector":
+        values = np.zeros(len(NEGATIVE_EMOTIONS), dtype=EMOTION_VECTOR_DTYPE)
+        for label, percentage in percentages.items():
+            index = NEGATIVE_EMOTION_INDEX.get(label.lower())
+            if index is not None:
+                values[index] += percentage
+        return cls.from_values(values)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "EmotionVector":
+        if len(data) != EMOTION_VECTOR_SIZE:
+            raise ValueError(
+                f"Emotion vector needs {EMOTION_VECTOR_SIZE} bytes, got {len(data)}"
+            )
+        return cls(np.frombuffer(data, dtype=EMOTION_VECTOR_DTYPE).copy())
+
+    def to_dict(self) -> dict[str, float]:
+        return dict(zip(NEGATIVE_EMOTIONS, self.values.tolist(), strict=True))
+
+    # 32 byte little-endian form for storage
+    def to_bytes(self) -> bytes:
+        return self.values.tobytes()
+
+    # helper to spot breakdowns with nothing to normalize
+    @staticmethod
+    def is_empty(percentages: dict) -> bool:
+        return not any(
+            isinstance(label, str)
+            and label.lower() in NEGATIVE_EMOTION_INDEX
+            and percentage
+            for label, percentage in percentages.items()
+        )
+
+    # empty or all-unknown breakdowns become None rather than a zero vector
+    # dicts come from the agent, a bad breakdown is missing data and mustn't
+    # end the session
+    @classmethod
+    def validate(cls, value) -> "EmotionVector | None":
+        if value is None or isinstance(value, EmotionVector):
+            return value
+        if isinstance(value, dict):
+            if cls.is_empty(value):
+                return None
+            try:
+                return cls.from_dict(value)
+            except (AttributeError, TypeError, ValueError) as e:
+                print(f"[EMOTIONS] Dropping invalid emotion breakdown {value}: {e}")
+                return None
+        if isinstance(value, bytes | bytearray):
+            return cls.from_bytes(bytes(value))
+        if isinstance(value, list | tuple | np.ndarray):
+            return cls.from_values(value)
+        raise ValueError(f"Can't build an emotion vector from {type(value).__name__}")
+
+    # dicts for JSON and the websocket, bytes when dumped with context={"emotion_vector": "bytes"}
+    def serialize(self, info: core_schema.SerializationInfo):
+        if (
+            info.mode == "python"
+            and (info.context or {}).get("emotion_vector") == "bytes"
+        ):
+            return self.to_bytes()
+        return self.to_dict()
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls.validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls.serialize, info_arg=True
+            ),
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema, handler) -> dict:
+        return {
+            "type": "object",
+            "properties": {
+                emotion: {"type": "number"} for emotion in NEGATIVE_EMOTIONS
+            },
+        }
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, EmotionVector):
+            return NotImplemented
+        return np.array_equal(self.values, other.values)
+
+    def __repr__(self) -> str:
+        return f"EmotionVector({self.to_dict()})"
@@ -0,0 +1,124 @@
+import asyncio
+import math
+import os
+from collections import deque
+from collections.abc import Callable
+from typing import Generic, NamedTuple, TypeVar
+
+CONTROL_CHANNEL_SIZE = int(os.getenv("CONTROL_CHANNEL_SIZE", "16"))
+TRANSCRIPT_CHANNEL_SIZE = int(os.getenv("TRANSCRIPT_CHANNEL_SIZE", "8"))
+
+
+# control: client playback acks and playhead reports
+class PlaybackFinished(NamedTuple):
+    pass
+
+
+class PlaybackProgress(NamedTuple):
+    position: float
+
+
+ControlEvent = PlaybackFinished | PlaybackProgress
+
+
+# helper to validate the playhead a client reports, None for anything unusable
+def parse_playback_position(value) -> float | None:
+    if isinstance(value, bool) or not isinstance(value, int | float):
+        return None
+    if not math.isfinite(value) or value < 0:
+        return None
+    return float(value)
+
+
+# uplink audio for STT, offset is where the pcm starts in the session audio archive
+class AudioFrame(NamedTuple):
+    offset: int
+    pcm: bytes
+
+
+# transcripts: STT partial and committed text
+# committed answers carry word timestamps relative to the STT stream,
+# which starts at audio_offset in the session audio archive
+class Transcript(NamedTuple):
+    text: str
+    is_final: bool
+    words: tuple[dict, ...] = ()
+    audio_offset: int | None = None
+
+
+T = TypeVar("T")
+
+
+# bounded queue that never blocks producers
+# when full, the oldest droppable event (a partial or progress report) makes room,
+# events that can't be dropped (acks, committed text) are always kept
+class Channel(Generic[T]):
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        droppable: Callable[[T], bool] = lambda event: True,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.droppable = droppable
+        self.dropped = 0
+        self._events: deque[T] = deque()
+        self._ready = asyncio.Event()
+
+    def publish(self, event: T):
+        if len(self._events) >= self.maxsize:
+            victim = next(
+                (i for i, queued in enumerate(self._events) if self.droppable(queued)),
+                None,
+            )
+            if victim is not None:
+                del self._events[victim]
+                self.dropped += 1
+            elif self.droppable(event):
+                self.dropped += 1
+                return
+        self._events.append(event)
+        self._ready.set()
+
+    async def get(self) -> T:
+        while not self._events:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._events.popleft()
+
+    # helper to throw away events left over from an earlier turn
+    def drain(self) -> int:
+        drained = len(self._events)
+        self._events.clear()
+        return drained
+
+    def qsize(self) -> int:
+        return len(self._events)
+
+
+# per-session events between the websocket reader, STT and the conversation loop
+# control is read by wait_for_playback_finished, transcripts by listen_for_answer
+class SessionEventBus:
+    def __init__(
+        self,
+        control_size: int = CONTROL_CHANNEL_SIZE,
+        transcript_size: int = TRANSCRIPT_CHANNEL_SIZE,
+    ):
+        self.control: Channel[ControlEvent] = Channel(
+            "control",
+            control_size,
+            droppable=lambda event: isinstance(event, PlaybackProgress),
+        )
+        self.transcripts: Channel[Transcript] = Channel(
+            "transcripts", transcript_size, droppable=lambda event: not event.is_final
+        )
+
+    def channels(self) -> tuple[Channel, ...]:
+        return (self.control, self.transcripts)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            channel.name: {"queued": channel.qsize(), "dropped": channel.dropped}
+            for channel in self.channels()
+        }
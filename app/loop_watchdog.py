@@ -0,0 +1,149 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar
+
+# opt-in, the heartbeat and the sampler thread cost well under 1% of a core
+LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG_ENABLED", "false").lower() == "true"
+# lag above this counts as a stall and gets its stack reported
+LOOP_LAG_THRESHOLD_SECS = float(os.getenv("LOOP_LAG_THRESHOLD_SECS", "0.1"))
+# how often the loop is expected to run the heartbeat
+LOOP_HEARTBEAT_SECS = float(os.getenv("LOOP_HEARTBEAT_SECS", "0.05"))
+# innermost frames kept from a blocking call's stack
+LOOP_STACK_DEPTH = 12
+# recent stall reports kept for stats()
+LOOP_MAX_REPORTS = 50
+
+# session the running code belongs to, tasks a session creates inherit it
+current_session_id: ContextVar[str | None] = ContextVar(
+    "current_session_id", default=None
+)
+
+
+# measures event-loop lag with a heartbeat scheduled on the loop, a sampler
+# thread grabs the loop thread's stack while the heartbeat is overdue so the
+# blocking call is caught in the act
+class LoopWatchdog:
+    def __init__(
+        self,
+        threshold_secs: float = LOOP_LAG_THRESHOLD_SECS,
+        heartbeat_secs: float = LOOP_HEARTBEAT_SECS,
+        max_reports: int = LOOP_MAX_REPORTS,
+    ):
+        self.threshold_secs = threshold_secs
+        self.heartbeat_secs = heartbeat_secs
+        self.beats = 0
+        self.stalls = 0
+        self.max_lag_secs = 0.0
+        self.stalled_secs = 0.0
+        self.reports: deque[dict] = deque(maxlen=max_reports)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._handle: asyncio.TimerHandle | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._last_beat = 0.0
+        self._reported_beat = -1
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._last_beat = time.monotonic()
+        self._schedule()
+        self._thread = threading.Thread(
+            target=self._sample, name="loop-watchdog", daemon=True
+        )
+        self._thread.start()
+        print(f"[LOOP] Watchdog started, threshold {self.threshold_secs * 1000:.0f}ms")
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._thread.join()
+        self._thread = None
+
+    def _schedule(self):
+        self._handle = self._loop.call_later(
+            self.heartbeat_secs, self._heartbeat, time.monotonic()
+        )
+
+    # runs on the loop, any delay past its due time is lag
+    def _heartbeat(self, scheduled: float):
+        now = time.monotonic()
+        lag = max(0.0, now - scheduled - self.heartbeat_secs)
+        self.beats += 1
+        self._last_beat = now
+        self.max_lag_secs = max(self.max_lag_secs, lag)
+        if lag >= self.threshold_secs:
+            self.stalls += 1
+            self.stalled_secs += lag
+        self._schedule()
+
+    # runs in its own thread, the loop can't watch itself while it's blocked
+    def _sample(self):
+        interval = min(self.heartbeat_secs, self.threshold_secs) / 2
+        while not self._stop.wait(interval):
+            overdue = time.monotonic() - self._last_beat - self.heartbeat_secs
+            if overdue < self.threshold_secs or self._reported_beat == self.beats:
+                continue
+            # one report per stall
+            self._reported_beat = self.beats
+            self._report(overdue)
+
+    def _report(self, blocked_secs: float):
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return
+        stack = traceback.format_stack(frame, limit=LOOP_STACK_DEPTH)
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        # read from the task's own context, the sampler thread has none
+        session_id = (
+            task.get_context().get(current_session_id) if task is not None else None
+        )
+        report = {
+            "session_id": session_id,
+            "task": task.get_name() if task is not None else None,
+            "blocked_secs": round(blocked_secs, 3),
+            "stack": stack,
+        }
+        self.reports.append(report)
+        print(
+            f"[LOOP] Event loop blocked for {blocked_secs * 1000:.0f}ms+ "
+            f"(session {session_id}, task {report['task']}):\n{''.join(stack)}"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "beats": self.beats,
+            "stalls": self.stalls,
+            "max_lag_ms": round(self.max_lag_secs * 1000, 1),
+            "stalled_ms": round(self.stalled_secs * 1000, 1),
+            "reported": len(self.reports),
+        }
+
+
+loop_watchdog = LoopWatchdog()
+
+
+# stalls in the current task and the tasks it creates from now on are
+# attributed to the session
+def tag_session(session_id: str):
+    current_session_id.set(session_id)
@@ -2,18 +2,41 @@ from dotenv import load_dotenv
 
 load_dotenv(".env")
 
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
-from app.routes import ws_router
+from app.deps import configure_agents_client
+from app.elevenlabs import stt_pool
+from app.loop_watchdog import LOOP_WATCHDOG_ENABLED, loop_watchdog
+from app.routes import sessions_router, ws_router
+from app.song_catalog import get_song_catalog
+
+
+# warm provider connections before the first session and close them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_agents_client()
+    get_song_catalog()
+    await stt_pool.start()
+    if LOOP_WATCHDOG_ENABLED:
+        loop_watchdog.start()
+    yield
+    if loop_watchdog.running:
+        print(f"[LOOP] Event loop lag: {loop_watchdog.stats()}")
+        loop_watchdog.stop()
+    print(f"[POOL] STT pool: {stt_pool.stats()}")
+    await stt_pool.close()
+
 
 # FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Include routers
 app.include_router(ws_router)
+app.include_router(sessions_router)
 
 # Mount static files
 # https://fastapi.tiangolo.com/tutorial/static-files/
@@ -2,6 +2,7 @@ from agents import Agent, function_tool
 
 from app.conversation_agent import conversation_agent
 from app.music_agent import music_agent
+from app.song_catalog import is_music_request
 
 instructions = """
     You are the main conversation orchestrator for an emotional support chatbot.
@@ -16,7 +17,7 @@ instructions = """
 @function_tool
 def check_music_request(user_message: str) -> bool:
     """Check if the user's message contains a music request."""
-    return "play me some music" in user_message.lower()
+    return is_music_request(user_message)
 
 
 main_agent = Agent(
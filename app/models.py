@@ -3,16 +3,53 @@ from typing import Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
+from app.emotions import EmotionVector
+
+
+# where an answer sits in the session audio, offsets index the LINEAR16 archive
+class AnswerSegment(BaseModel):
+    start_byte: int = Field(ge=0)
+    end_byte: int = Field(ge=0)
+    start_secs: float = Field(ge=0.0)
+    end_secs: float = Field(ge=0.0)
+    audio_url: Optional[str] = Field(
+        default=None, description="Answer audio stored on its own, set on upload"
+    )
+
+
+# latency of one turn in seconds, None for stages that didn't run
+class TurnTiming(BaseModel):
+    tts_first_byte_secs: Optional[float] = Field(
+        default=None, ge=0.0, description="Question TTS request to first audio chunk"
+    )
+    playback_secs: Optional[float] = Field(
+        default=None, ge=0.0, description="Waiting for the client to play the question"
+    )
+    stt_commit_secs: Optional[float] = Field(
+        default=None, ge=0.0, description="Listening start to committed answer"
+    )
+    router_secs: Optional[float] = Field(
+        default=None, ge=0.0, description="Agent run start to first handoff"
+    )
+    agent_first_token_secs: Optional[float] = Field(
+        default=None, ge=0.0, description="Agent run start to first streamed token"
+    )
+    run_secs: Optional[float] = Field(
+        default=None, ge=0.0, description="Whole agent run"
+    )
+
 
 class QAEmotionPair(BaseModel):
     question: str
     answer: str
     emotion: str
     confidence: float = Field(ge=0.0, le=1.0, description="Confidence score 0-1")
-    negative_emotion_percentages: Optional[dict[str, float]] = Field(default=None)
+    negative_emotion_percentages: Optional[EmotionVector] = Field(default=None)
     is_direct: bool = Field(
         default=False, description="Whether the question was direct or indirect"
     )
+    audio_segment: Optional[AnswerSegment] = Field(default=None)
+    timing: Optional[TurnTiming] = Field(default=None)
 
 
 class AgentSession(BaseModel):
@@ -25,6 +62,15 @@ class AgentSession(BaseModel):
     total_question_count: int = Field(ge=1)
     direct_question_count: int = Field(ge=0, le=5)
     audio_url: str
+    emotion_trajectory: list[dict[str, float]] = Field(
+        default_factory=list,
+        description="Smoothed emotion distribution after each analyzed turn",
+    )
+    emotion_distribution: Optional[dict[str, float]] = Field(default=None)
+    updated_at: Optional[datetime] = Field(
+        default=None,
+        description="When this document was last written, resumed sessions rewrite it",
+    )
 
 
 class ConversationAgentResult(BaseModel):
@@ -37,3 +83,35 @@ class ConversationAgentResult(BaseModel):
 
 class MusicAgentResult(BaseModel):
     song: str = Field(min_length=1)
+
+
+# genres used until a user has preferences of their own
+DEFAULT_MUSIC_GENRES = ["metal", "rock"]
+
+
+class UserProfile(BaseModel):
+    user_id: Optional[str] = None
+    music_genres: list[str] = Field(default_factory=lambda: list(DEFAULT_MUSIC_GENRES))
+    favorite_artists: list[str] = Field(default_factory=list)
+
+
+class SessionState(BaseModel):
+    session_id: str
+    session_timestamp: str
+    user_id: Optional[str] = None
+    qa_pairs: list[QAEmotionPair] = Field(default_factory=list)
+    current_question: Optional[str] = None
+    current_is_direct: bool = False
+    high_confidence_reached: bool = False
+    music_reminder_given: bool = False
+    direct_question_count: int = Field(default=0, ge=0)
+    emotion_trajectory: list[dict[str, float]] = Field(default_factory=list)
+    audio_length: int = Field(
+        default=0, ge=0, description="Bytes of session audio already persisted"
+    )
+    context_summary: Optional[str] = Field(
+        default=None, description="Running summary of turns folded out of the prompt"
+    )
+    summarized_turns: int = Field(
+        default=0, ge=0, description="Leading QA pairs covered by context_summary"
+    )
@@ -1,4 +1,4 @@
-from agents import Agent, AgentOutputSchema, function_tool
+from agents import Agent, AgentOutputSchema
 
 from app.models import MusicAgentResult
 
@@ -7,9 +7,11 @@ instructions = """
     Based on the conversation history and detected emotions, suggest ONE specific song for the user.
     
     TASK:
-    1. Call get_user_preferences() to fetch their music taste
+    1. Read the user's music preferences from the context (genres and favorite artists)
     2. Consider the emotions detected throughout the conversation
     3. Recommend a song that matches their preferences AND helps regulate their emotional state
+    4. If the context lists candidate songs, choose ONE of them exactly as written,
+       they are already ranked for the session emotions and preferences
     
     OUTPUT FORMAT:
     Return MusicRecommendationResult with:
@@ -19,18 +21,11 @@ instructions = """
 """
 
 
-@function_tool
-def get_user_preferences():
-    """Fetches the user's music preferences based on their input and detected emotions."""
-    user_preferences = ["metal", "rock"]
-    return user_preferences
-
-
 music_agent = Agent(
     name="Music Agent",
     instructions=instructions,
     model="gpt-5.2",
     output_type=AgentOutputSchema(MusicAgentResult, strict_json_schema=False),
-    tools=[get_user_preferences],
+    tools=[],
     handoff_description="Transfer to this agent when the user explicitly requests music by saying 'play me some music'.",
 )
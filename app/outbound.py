@@ -0,0 +1,152 @@
+import asyncio
+import os
+from collections import deque
+
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect
+
+from app.trace import TraceRecorder
+
+# messages waiting for the socket before senders are held back
+OUTBOX_MAX_SIZE = int(os.getenv("OUTBOX_MAX_SIZE", "256"))
+# bursts of stream deltas and partial transcripts within this window go out as one message
+COALESCE_WINDOW_SECS = float(os.getenv("OUTBOUND_COALESCE_MS", "15")) / 1000
+
+# close code used when the writer gives up on a broken socket
+ABNORMAL_CLOSURE = 1006
+
+
+# helper to tell which messages can be merged, returns None for the rest
+def coalesce_key(payload: dict) -> str | None:
+    if payload.get("type") == "agent_stream_delta":
+        return "agent_stream_delta"
+    if payload.get("type") == "transcript" and not payload.get("is_final"):
+        return "partial_transcript"
+    return None
+
+
+# merge a newer message into the queued one, deltas append and partials replace
+def merge(queued: dict, payload: dict, key: str) -> None:
+    if key == "agent_stream_delta":
+        queued["delta"] += payload.get("delta", "")
+    else:
+        queued.update(payload)
+
+
+# single ordered writer per connection, everything sent to the client goes through it
+class OutboundWriter:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_size: int = OUTBOX_MAX_SIZE,
+        coalesce_window: float = COALESCE_WINDOW_SECS,
+    ):
+        self.websocket = websocket
+        self.max_size = max_size
+        self.coalesce_window = coalesce_window
+        self.closed = False
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        # set by the session when it is recorded
+        self.trace: TraceRecorder | None = None
+        self._outbox: deque[tuple[str | None, dict]] = deque()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    # queue a message, waits while the outbox is full
+    async def send(self, payload: dict):
+        while not self.closed and len(self._outbox) >= self.max_size:
+            self._space.clear()
+            await self._space.wait()
+        if self.closed:
+            raise WebSocketDisconnect(code=ABNORMAL_CLOSURE)
+        self._enqueue(payload)
+
+    # for sync callbacks, mergeable messages are dropped rather than blocking
+    def send_nowait(self, payload: dict):
+        if self.closed:
+            return
+        key = coalesce_key(payload)
+        if (
+            key
+            and len(self._outbox) >= self.max_size
+            and not self._merge_tail(key, payload)
+        ):
+            self.dropped += 1
+            return
+        self._enqueue(payload)
+
+    # flush what is queued and stop the writer task
+    async def close(self, timeout: float = 1.0):
+        if self._task is None:
+            self.closed = True
+            return
+        self._ready.set()
+        self._enqueue_stop()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            print("[OUTBOUND] Timed out flushing outbox")
+        self._shutdown()
+
+    def _enqueue(self, payload: dict):
+        if self.trace:
+            self.trace.record_outbound(payload)
+        key = coalesce_key(payload)
+        if key and self._merge_tail(key, payload):
+            return
+        # copy so merging never touches the caller's dict
+        self._outbox.append((key, dict(payload)))
+        self._ready.set()
+
+    # only the newest queued message is merged into, so ordering is preserved
+    def _merge_tail(self, key: str, payload: dict) -> bool:
+        if not self._outbox or self._outbox[-1][0] != key:
+            return False
+        merge(self._outbox[-1][1], payload, key)
+        self.coalesced += 1
+        return True
+
+    def _enqueue_stop(self):
+        self._outbox.append((None, None))
+
+    async def _run(self):
+        try:
+            while True:
+                while not self._outbox:
+                    self._ready.clear()
+                    await self._ready.wait()
+
+                key, payload = self._outbox[0]
+                if payload is None:
+                    return
+                # give a burst a moment to collapse into the queued message
+                if key and len(self._outbox) == 1 and self.coalesce_window > 0:
+                    await asyncio.sleep(self.coalesce_window)
+
+                self._outbox.popleft()
+                if len(self._outbox) < self.max_size:
+                    self._space.set()
+                await self.websocket.send_text(orjson.dumps(payload).decode())
+                self.sent += 1
+        except Exception as e:
+            if not isinstance(e, WebSocketDisconnect | RuntimeError):
+                print(f"[OUTBOUND] Error sending to client: {e}")
+            self._shutdown()
+
+    # a closed socket fails every queued and future send
+    def _shutdown(self):
+        if not self.closed:
+            print(
+                f"[OUTBOUND] Writer closed: {self.sent} sent, {self.coalesced} coalesced, {self.dropped} dropped"
+            )
+        self.closed = True
+        self._outbox.clear()
+        self._space.set()
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+import httpx
+
+# idle realtime STT connections kept open for new answers, 0 disables the pool
+STT_POOL_SIZE = int(os.getenv("STT_POOL_SIZE", "2"))
+# idle connections are replaced before the provider closes them
+STT_POOL_MAX_IDLE_SECS = float(os.getenv("STT_POOL_MAX_IDLE_SECS", "15"))
+STT_POOL_REFRESH_INTERVAL_SECS = 1.0
+# failed connects back off exponentially up to this delay
+STT_POOL_MAX_BACKOFF_SECS = float(os.getenv("STT_POOL_MAX_BACKOFF_SECS", "60"))
+# without acquires for this long the pool lets its connections lapse until the
+# next acquire, so an idle worker doesn't keep reopening them
+STT_POOL_DORMANT_AFTER_SECS = float(os.getenv("STT_POOL_DORMANT_AFTER_SECS", "300"))
+
+# keep-alive HTTP/2 connections shared by every session for TTS and LLM calls
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_KEEPALIVE_EXPIRY_SECS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECS", "120"))
+HTTP_LIMITS = httpx.Limits(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECS,
+)
+
+
+def create_http_client(timeout: float) -> httpx.Client:
+    return httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=timeout)
+
+
+def create_async_http_client(timeout: float) -> httpx.AsyncClient:
+    return httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=timeout)
+
+
+class IdleConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.opened_at = time.monotonic()
+        self.closed = False
+
+
+# process-wide pool of opened connections, handed out once and never returned
+class ConnectionPool:
+    def __init__(
+        self,
+        name: str,
+        connect: Callable[[], Awaitable],
+        size: int = STT_POOL_SIZE,
+        max_idle_secs: float = STT_POOL_MAX_IDLE_SECS,
+        refresh_interval: float = STT_POOL_REFRESH_INTERVAL_SECS,
+        max_backoff_secs: float = STT_POOL_MAX_BACKOFF_SECS,
+        watch_close: Callable[[object, Callable[[], None]], None] | None = None,
+        dormant_after_secs: float = STT_POOL_DORMANT_AFTER_SECS,
+        background_connect: Callable[[], Awaitable] | None = None,
+    ):
+        self.name = name
+        self.connect = connect
+        # opens warm connections, e.g. at a lower quota priority than connect
+        self.background_connect = background_connect or connect
+        self.dormant_after_secs = dormant_after_secs
+        self.size = size
+        self.max_idle_secs = max_idle_secs
+        self.refresh_interval = refresh_interval
+        self.max_backoff_secs = max_backoff_secs
+        # registers a callback for when the provider closes an idle connection
+        self.watch_close = watch_close
+        self.hits = 0
+        self.misses = 0
+        self.refreshed = 0
+        self.connect_failures = 0
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+        self._stopping = False
+        self._last_acquire = time.monotonic()
+        self.dormant = False
+        self.acquire_secs: deque[float] = deque(maxlen=500)
+        self._idle: deque[IdleConnection] = deque()
+        self._opening = 0
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self.size > 0 and self._task is None:
+            self._stopping = False
+            self._last_acquire = time.monotonic()
+            self._task = asyncio.create_task(self._maintain())
+            print(f"[POOL] Warming {self.size} {self.name} connections")
+
+    async def close(self, timeout: float = 5.0):
+        if self._task:
+            # the maintainer checks the flag, cancel is only the fallback
+            self._stopping = True
+            self._wake.set()
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._idle:
+            await self._discard(self._idle.popleft())
+
+    # an idle warm connection if there is one, otherwise a new one
+    async def acquire(self):
+        started = time.perf_counter()
+        self._last_acquire = time.monotonic()
+        connection = None
+        while self._idle:
+            idle = self._idle.popleft()
+            if idle.closed or self._expired(idle):
+                await self._discard(idle)
+                continue
+            connection = idle.connection
+            break
+
+        if connection is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            connection = await self.connect()
+        self.acquire_secs.append(time.perf_counter() - started)
+        # top the pool back up in the background
+        self._wake.set()
+        return connection
+
+    def _expired(self, idle: IdleConnection) -> bool:
+        return time.monotonic() - idle.opened_at >= self.max_idle_secs
+
+    async def _discard(self, idle: IdleConnection):
+        idle.closed = True
+        try:
+            await idle.connection.close()
+        except Exception as e:
+            print(f"[POOL] Error closing idle {self.name} connection: {e}")
+
+    async def _open(self):
+        self._opening += 1
+        try:
+            idle = IdleConnection(await self.background_connect())
+            if self.watch_close:
+                self.watch_close(idle.connection, lambda: setattr(idle, "closed", True))
+            self._idle.append(idle)
+            self._consecutive_failures = 0
+        except Exception as e:
+            self.connect_failures += 1
+            self._consecutive_failures += 1
+            backoff = min(
+                self.refresh_interval * 2**self._consecutive_failures,
+                self.max_backoff_secs,
+            )
+            self._retry_at = time.monotonic() + backoff
+            print(
+                f"[POOL] Failed to open {self.name} connection, retrying in {backoff:.1f}s: {e}"
+            )
+        finally:
+            self._opening -= 1
+
+    async def _maintain(self):
+        while not self._stopping:
+            # replace connections that closed or are about to time out
+            for idle in list(self._idle):
+                if idle.closed or self._expired(idle):
+                    self._idle.remove(idle)
+                    if not idle.closed:
+                        self.refreshed += 1
+                    await self._discard(idle)
+
+            if time.monotonic() - self._last_acquire >= self.dormant_after_secs:
+                await self._sleep_until_acquired()
+                continue
+
+            missing = self.size - len(self._idle) - self._opening
+            if missing > 0 and time.monotonic() >= self._retry_at:
+                await asyncio.gather(*(self._open() for _ in range(missing)))
+            if self._stopping:
+                break
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # closes the warm connections and waits for the next acquire to wake us
+    async def _sleep_until_acquired(self):
+        self.dormant = True
+        print(
+            f"[POOL] No {self.name} acquires for {self.dormant_after_secs:.0f}s, "
+            "closing warm connections"
+        )
+        while self._idle:
+            await self._discard(self._idle.popleft())
+        while (
+            not self._stopping
+            and time.monotonic() - self._last_acquire >= self.dormant_after_secs
+        ):
+            self._wake.clear()
+            await self._wake.wait()
+        self.dormant = False
+
+    def stats(self) -> dict:
+        acquired = self.hits + self.misses
+        latencies = sorted(self.acquire_secs)
+        return {
+            "idle": len(self._idle),
+            "dormant": self.dormant,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / acquired, 3) if acquired else None,
+            "refreshed": self.refreshed,
+            "connect_failures": self.connect_failures,
+            "acquire_ms_p50": (
+                round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None
+            ),
+            "acquire_ms_max": round(latencies[-1] * 1000, 1) if latencies else None,
+        }
@@ -0,0 +1,225 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextvars import ContextVar
+
+# provider quotas shared by all sessions of the worker, in units per minute
+# 0 turns a quota off
+PROVIDER_QUOTAS = {
+    ("openai", "requests"): float(os.getenv("QUOTA_OPENAI_REQUESTS_PER_MIN", "500")),
+    ("openai", "tokens"): float(os.getenv("QUOTA_OPENAI_TOKENS_PER_MIN", "200000")),
+    ("elevenlabs", "tts_chars"): float(os.getenv("QUOTA_TTS_CHARS_PER_MIN", "20000")),
+    ("elevenlabs", "stt_sessions"): float(
+        os.getenv("QUOTA_STT_SESSIONS_PER_MIN", "300")
+    ),
+}
+# bucket capacity, in seconds of the rate
+QUOTA_BURST_SECS = float(os.getenv("QUOTA_BURST_SECS", "10"))
+# longest a call waits in the queue before it fails
+QUOTA_WAIT_SECS = float(os.getenv("QUOTA_WAIT_SECS", "20"))
+# AIMD: a 429 halves the rate, every success adds back a share of the quota
+RATE_LIMIT_BACKOFF = 0.5
+RATE_RECOVERY_STEP = 0.05
+MIN_RATE_FRACTION = 0.1
+# pause after a 429 that came without a retry-after
+RATE_LIMIT_PAUSE_SECS = 1.0
+
+# lower runs first: answers in progress, then new sessions, then summaries
+PRIORITY_TURN = 0
+PRIORITY_NEW_SESSION = 1
+PRIORITY_BACKGROUND = 2
+
+# priority of the calls made by the current session
+current_priority: ContextVar[int] = ContextVar(
+    "quota_priority", default=PRIORITY_NEW_SESSION
+)
+
+# realtime STT error messages that mean we're sending too much
+STT_RATE_LIMIT_ERRORS = {
+    "rate_limited",
+    "queue_overflow",
+    "resource_exhausted",
+    "commit_throttled",
+}
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, bucket: str, waited_secs: float):
+        super().__init__(f"{bucket} quota still exhausted after {waited_secs:.0f}s")
+        self.bucket = bucket
+        self.waited_secs = waited_secs
+
+
+def is_rate_limited(error) -> bool:
+    if isinstance(error, dict):
+        return error.get("message_type") in STT_RATE_LIMIT_ERRORS
+    return getattr(error, "status_code", None) == 429
+
+
+# seconds from a retry-after header, on the error or its HTTP response
+def retry_after_secs(error) -> float | None:
+    headers = getattr(error, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return max(float(headers.get("retry-after")), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+# token bucket with a priority queue, waiters are served strictly in
+# (priority, arrival) order so a large request can't be starved
+class TokenBucket:
+    def __init__(self, name: str, rate_per_min: float, burst_secs: float):
+        self.name = name
+        self.max_rate = rate_per_min / 60
+        self.rate = self.max_rate
+        self.capacity = max(self.max_rate * burst_secs, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.granted = 0
+        self.timeouts = 0
+        self.rate_limited = 0
+        self._waiters: list[list] = []
+        self._arrivals = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+
+    def _refill(self, now: float):
+        # updated lies in the future while paused after a 429
+        if now > self.updated:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+    async def acquire(self, amount: float, priority: int, timeout: float):
+        # requests larger than the bucket would never fit
+        amount = min(amount, self.capacity)
+        now = time.monotonic()
+        self._refill(now)
+        if not self._waiters and now >= self.updated and self.tokens >= amount:
+            self.tokens -= amount
+            self.granted += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._arrivals), amount, waiter])
+        self._schedule(0)
+        try:
+            async with asyncio.timeout(timeout):
+                await waiter
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # granted in the same tick the wait ended, give the tokens back
+                self.tokens += amount
+            waiter.cancel()
+            # the next waiter may fit now
+            self._schedule(0)
+            if isinstance(e, TimeoutError):
+                self.timeouts += 1
+                raise QuotaExceeded(self.name, timeout) from None
+            raise
+
+    def _schedule(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _dispatch(self):
+        self._timer = None
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters:
+            _, _, amount, waiter = self._waiters[0]
+            if waiter.done():
+                heapq.heappop(self._waiters)
+                continue
+            if now < self.updated or self.tokens < amount:
+                delay = max(self.updated - now, 0) + max(
+                    (amount - self.tokens) / self.rate, 0
+                )
+                self._schedule(delay)
+                return
+            heapq.heappop(self._waiters)
+            self.tokens -= amount
+            self.granted += 1
+            waiter.set_result(None)
+
+    def on_rate_limited(self, retry_after: float | None):
+        self.rate_limited += 1
+        self.rate = max(
+            self.rate * RATE_LIMIT_BACKOFF, self.max_rate * MIN_RATE_FRACTION
+        )
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = 0.0
+        self.updated = now + (retry_after or RATE_LIMIT_PAUSE_SECS)
+
+    def on_success(self):
+        self.rate = min(self.rate + self.max_rate * RATE_RECOVERY_STEP, self.max_rate)
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_min": round(self.rate * 60),
+            "tokens": round(self.tokens),
+            "waiting": sum(1 for w in self._waiters if not w[3].done()),
+            "granted": self.granted,
+            "timeouts": self.timeouts,
+            "rate_limited": self.rate_limited,
+        }
+
+
+# process-wide rate limits per provider and resource, fed back by 429s
+class QuotaScheduler:
+    def __init__(
+        self,
+        quotas: dict[tuple[str, str], float] | None = None,
+        burst_secs: float = QUOTA_BURST_SECS,
+        wait_secs: float = QUOTA_WAIT_SECS,
+    ):
+        quotas = PROVIDER_QUOTAS if quotas is None else quotas
+        self.wait_secs = wait_secs
+        self.buckets = {
+            key: TokenBucket("/".join(key), rate, burst_secs)
+            for key, rate in quotas.items()
+            if rate > 0
+        }
+
+    # waits until the provider has capacity for the call
+    async def acquire(
+        self,
+        provider: str,
+        resource: str,
+        amount: float = 1,
+        priority: int | None = None,
+    ):
+        bucket = self.buckets.get((provider, resource))
+        if bucket is None:
+            return
+        if priority is None:
+            priority = current_priority.get()
+        await bucket.acquire(amount, priority, self.wait_secs)
+
+    # a 429 doesn't say which quota was hit, so all of the provider's slow down
+    def report_rate_limited(self, provider: str, retry_after: float | None = None):
+        print(f"[QUOTA] {provider} rate limited, retry after {retry_after}")
+        for (name, _), bucket in self.buckets.items():
+            if name == provider:
+                bucket.on_rate_limited(retry_after)
+
+    def report_success(self, provider: str):
+        for (name, _), bucket in self.buckets.items():
+            if name == provider:
+                bucket.on_success()
+
+    # helper for call sites, 429s slow the provider down and other errors pass
+    def report_error(self, provider: str, error):
+        if is_rate_limited(error):
+            self.report_rate_limited(provider, retry_after_secs(error))
+
+    def stats(self) -> dict:
+        return {"/".join(key): bucket.stats() for key, bucket in self.buckets.items()}
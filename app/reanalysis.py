@@ -0,0 +1,465 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from pathlib import Path
+
+from agents import Agent, Runner
+
+from app.analytics_export import (
+    DEFAULT_PAGE_SIZE,
+    SESSIONS_COLLECTION,
+    document_updated_at,
+    iter_firestore_sessions,
+    iter_json_sessions,
+)
+from app.context import build_agent_prompt, estimate_tokens
+from app.conversation_agent import conversation_agent
+from app.emotions import EMOTIONS
+from app.models import ConversationAgentResult, QAEmotionPair, SessionState
+from app.quota import PRIORITY_BACKGROUND, QuotaScheduler
+from app.song_catalog import is_music_request
+
+ANALYSES_COLLECTION = "analyses"
+# answers analyzed at the same time, across sessions
+REANALYSIS_CONCURRENCY = int(os.getenv("REANALYSIS_CONCURRENCY", "32"))
+REANALYSIS_ATTEMPTS = 3
+# completion tokens reserved in the quota per analyzed answer
+REANALYSIS_OUTPUT_TOKENS = 300
+BATCH_ENDPOINT = "/v1/responses"
+
+
+# results of different instructions or models never overwrite each other
+def analysis_version(agent: Agent = conversation_agent) -> str:
+    digest = hashlib.sha1(str(agent.instructions).encode()).hexdigest()[:8]
+    return f"{agent.model}-{digest}"
+
+
+# prompt for one stored answer, with the context the agent had at that turn
+def answer_prompt(qa_pairs: list[QAEmotionPair], turn_index: int) -> str:
+    previous = qa_pairs[:turn_index]
+    state = SessionState(
+        session_id="",
+        session_timestamp="",
+        qa_pairs=previous,
+        direct_question_count=sum(1 for qa in previous if qa.is_direct),
+        high_confidence_reached=any(qa.confidence >= 0.8 for qa in previous),
+        music_reminder_given=any(is_music_request(qa.question) for qa in previous),
+    )
+    return build_agent_prompt(qa_pairs[turn_index].answer, state)
+
+
+# turns to re-analyze, the music request that ends a session isn't an answer
+def analyzed_turns(qa_pairs: list[QAEmotionPair]) -> list[int]:
+    return [i for i, qa in enumerate(qa_pairs) if not is_music_request(qa.answer)]
+
+
+def session_result(
+    document: dict,
+    qa_pairs: list[QAEmotionPair],
+    analyses: dict[int, ConversationAgentResult],
+    version: str,
+) -> dict:
+    return {
+        "session_id": document["session_id"],
+        "version": version,
+        "analyzed_at": datetime.now(UTC).isoformat(),
+        "source_updated_at": document_updated_at(document).isoformat(),
+        "qa_pairs": [
+            {
+                "turn_index": turn_index,
+                "emotion": analysis.emotion,
+                "confidence": analysis.confidence,
+                "negative_emotion_percentages": analysis.negative_emotion_percentages,
+                "previous_emotion": qa_pairs[turn_index].emotion,
+                "previous_confidence": qa_pairs[turn_index].confidence,
+            }
+            for turn_index, analysis in sorted(analyses.items())
+        ],
+    }
+
+
+# the conversation agent as it is configured now
+class AgentAnalysisBackend:
+    def __init__(self, agent: Agent = conversation_agent):
+        self.agent = agent
+
+    async def analyze(self, prompt: str) -> ConversationAgentResult:
+        result = await Runner.run(self.agent, prompt)
+        return ConversationAgentResult.model_validate(result.final_output)
+
+
+# deterministic stand-in for tests and dry runs: the first emotion named in
+# the answer, Calm otherwise
+class FakeAnalysisBackend:
+    def __init__(self, delay_secs: float = 0.0):
+        self.delay_secs = delay_secs
+        self.calls = 0
+
+    async def analyze(self, prompt: str) -> ConversationAgentResult:
+        self.calls += 1
+        if self.delay_secs:
+            await asyncio.sleep(self.delay_secs)
+        match = re.search(r'User message: "(.*)"', prompt)
+        answer = match.group(1).lower() if match else ""
+        emotion = next((e for e in EMOTIONS if e.lower() in answer), "Calm")
+        return ConversationAgentResult(
+            question="How does that feel?",
+            is_direct=False,
+            emotion=emotion,
+            confidence=0.9 if emotion != "Calm" else 0.5,
+            negative_emotion_percentages=None,
+        )
+
+
+# results next to the input dump, one JSON line per session
+# the file is also the checkpoint: sessions already in it are skipped
+class JsonlResultSink:
+    def __init__(self, path: Path):
+        self.path = path
+
+    def completed(self) -> set[str]:
+        if not self.path.exists():
+            return set()
+        with self.path.open() as f:
+            return {json.loads(line)["session_id"] for line in f if line.strip()}
+
+    def write(self, result: dict):
+        with self.path.open("a") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+# results as sessions/<id>/analyses/<version>, next to the session document
+class FirestoreResultSink:
+    def __init__(self, client, version: str):
+        self.client = client
+        self.version = version
+
+    def completed(self) -> set[str]:
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        query = (
+            self.client.collection_group(ANALYSES_COLLECTION)
+            .where(filter=FieldFilter("version", "==", self.version))
+            .select(["session_id"])
+        )
+        return {snapshot.get("session_id") for snapshot in query.stream()}
+
+    def write(self, result: dict):
+        (
+            self.client.collection(SESSIONS_COLLECTION)
+            .document(result["session_id"])
+            .collection(ANALYSES_COLLECTION)
+            .document(self.version)
+            .set(result)
+        )
+
+
+# one answer with retries, rate limited through the quota scheduler
+async def analyze_answer(
+    backend, prompt: str, calls: asyncio.Semaphore, quota: QuotaScheduler
+) -> ConversationAgentResult:
+    for attempt in range(REANALYSIS_ATTEMPTS):
+        await quota.acquire("openai", "requests", priority=PRIORITY_BACKGROUND)
+        await quota.acquire(
+            "openai",
+            "tokens",
+            estimate_tokens(prompt) + REANALYSIS_OUTPUT_TOKENS,
+            priority=PRIORITY_BACKGROUND,
+        )
+        async with calls:
+            try:
+                result = await backend.analyze(prompt)
+                quota.report_success("openai")
+                return result
+            except Exception as e:
+                quota.report_error("openai", e)
+                if attempt == REANALYSIS_ATTEMPTS - 1:
+                    raise
+                print(f"[REANALYSIS] Attempt {attempt + 1} failed: {e}")
+        await asyncio.sleep(2**attempt)
+
+
+# all answers of a session in parallel, None when one of them failed
+async def reanalyze_session(
+    document: dict,
+    backend,
+    version: str,
+    calls: asyncio.Semaphore,
+    quota: QuotaScheduler,
+) -> dict | None:
+    qa_pairs = [QAEmotionPair.model_validate(p) for p in document.get("qa_pairs") or []]
+    try:
+        async with asyncio.TaskGroup() as answers:
+            tasks = {
+                turn_index: answers.create_task(
+                    analyze_answer(
+                        backend, answer_prompt(qa_pairs, turn_index), calls, quota
+                    )
+                )
+                for turn_index in analyzed_turns(qa_pairs)
+            }
+    except* Exception as errors:
+        # return isn't allowed inside except*
+        print(
+            f"[REANALYSIS] Session {document['session_id']} failed: {errors.exceptions[0]}"
+        )
+        tasks = None
+    if tasks is None:
+        return None
+    analyses = {turn_index: task.result() for turn_index, task in tasks.items()}
+    return session_result(document, qa_pairs, analyses, version)
+
+
+# bounded pool: a reader feeds sessions to workers through a small queue, so
+# memory stays flat however many sessions are read
+async def reanalyze_sessions(
+    pages: Iterable[list[dict]],
+    sink,
+    backend,
+    version: str,
+    concurrency: int = REANALYSIS_CONCURRENCY,
+    quota: QuotaScheduler | None = None,
+) -> Counter:
+    quota = quota or QuotaScheduler()
+    done = await asyncio.to_thread(sink.completed)
+    calls = asyncio.Semaphore(concurrency)
+    sessions: asyncio.Queue[dict | None] = asyncio.Queue(maxsize=concurrency)
+    stats = Counter()
+    started = asyncio.get_running_loop().time()
+
+    async def read():
+        iterator = iter(pages)
+        while (page := await asyncio.to_thread(next, iterator, None)) is not None:
+            for document in page:
+                if document["session_id"] in done:
+                    stats["skipped"] += 1
+                    continue
+                await sessions.put(document)
+        for _ in range(concurrency):
+            await sessions.put(None)
+
+    async def work():
+        while (document := await sessions.get()) is not None:
+            result = await reanalyze_session(document, backend, version, calls, quota)
+            if result is None:
+                stats["failed"] += 1
+                continue
+            # checkpoint: the session counts as done once its result is written
+            await asyncio.to_thread(sink.write, result)
+            stats["sessions"] += 1
+            stats["answers"] += len(result["qa_pairs"])
+            if stats["sessions"] % 100 == 0:
+                elapsed = asyncio.get_running_loop().time() - started
+                print(f"[REANALYSIS] {stats['sessions']} sessions in {elapsed:.0f}s")
+
+    async with asyncio.TaskGroup() as pool:
+        pool.create_task(read())
+        for _ in range(concurrency):
+            pool.create_task(work())
+
+    print(f"[REANALYSIS] Version {version}: {dict(stats)}, quotas {quota.stats()}")
+    return stats
+
+
+# provider batch API: half the price, results within a day
+
+
+def batch_request(
+    custom_id: str, prompt: str, agent: Agent = conversation_agent
+) -> dict:
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": agent.model,
+            "instructions": agent.instructions,
+            "input": prompt,
+            "text": {
+                "format": {
+                    "type": "json_schema",
+                    "name": "ConversationAgentResult",
+                    "schema": ConversationAgentResult.model_json_schema(),
+                    "strict": False,
+                }
+            },
+        },
+    }
+
+
+# output text of a responses API body
+def response_text(body: dict) -> str:
+    for item in body.get("output") or []:
+        if item.get("type") != "message":
+            continue
+        for content in item.get("content") or []:
+            if content.get("type") == "output_text":
+                return content["text"]
+    raise ValueError("response has no output text")
+
+
+# writes the requests for all pending answers and starts a batch
+# the state file keeps what collect_batch needs to build the results
+def submit_batch(
+    pages: Iterable[list[dict]], sink, version: str, client, state_path: Path
+) -> str | None:
+    done = sink.completed()
+    requests_path = state_path.with_suffix(".requests.jsonl")
+    sessions = {}
+    with requests_path.open("w") as f:
+        for page in pages:
+            for document in page:
+                if document["session_id"] in done:
+                    continue
+                qa_pairs = [
+                    QAEmotionPair.model_validate(p)
+                    for p in document.get("qa_pairs") or []
+                ]
+                for turn_index in analyzed_turns(qa_pairs):
+                    custom_id = f"{document['session_id']}:{turn_index}"
+                    prompt = answer_prompt(qa_pairs, turn_index)
+                    f.write(json.dumps(batch_request(custom_id, prompt)) + "\n")
+                # stored documents hold timestamps and bytes, keep a JSON copy
+                sessions[document["session_id"]] = {
+                    "session_id": document["session_id"],
+                    "updated_at": document_updated_at(document).isoformat(),
+                    "qa_pairs": [qa.model_dump(mode="json") for qa in qa_pairs],
+                }
+    if not sessions:
+        print("[REANALYSIS] Nothing to submit")
+        return None
+
+    with requests_path.open("rb") as f:
+        batch_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+    )
+    state_path.write_text(
+        json.dumps({"batch_id": batch.id, "version": version, "sessions": sessions})
+    )
+    print(f"[REANALYSIS] Submitted batch {batch.id} for {len(sessions)} sessions")
+    return batch.id
+
+
+# writes the results of a finished batch, sessions with a failed answer are
+# left out so the next run picks them up again
+def collect_batch(sink, client, state_path: Path) -> Counter:
+    state = json.loads(state_path.read_text())
+    batch = client.batches.retrieve(state["batch_id"])
+    stats = Counter()
+    if batch.status != "completed":
+        print(f"[REANALYSIS] Batch {batch.id} is {batch.status}")
+        return stats
+
+    analyses: dict[str, dict[int, ConversationAgentResult]] = defaultdict(dict)
+    failed = set()
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        output = json.loads(line)
+        session_id, turn_index = output["custom_id"].rsplit(":", 1)
+        response = output.get("response") or {}
+        try:
+            if response.get("status_code") != 200:
+                raise ValueError(f"status {response.get('status_code')}")
+            analyses[session_id][int(turn_index)] = (
+                ConversationAgentResult.model_validate_json(
+                    response_text(response["body"])
+                )
+            )
+        except Exception as e:
+            print(f"[REANALYSIS] Answer {output['custom_id']} failed: {e}")
+            failed.add(session_id)
+
+    for session_id, document in state["sessions"].items():
+        qa_pairs = [
+            QAEmotionPair.model_validate(p) for p in document.get("qa_pairs") or []
+        ]
+        turns = set(analyzed_turns(qa_pairs))
+        if session_id in failed or turns - set(analyses[session_id]):
+            stats["failed"] += 1
+            continue
+        sink.write(
+            session_result(document, qa_pairs, analyses[session_id], state["version"])
+        )
+        stats["sessions"] += 1
+    print(f"[REANALYSIS] Collected batch {batch.id}: {dict(stats)}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-run emotion analysis on stored sessions"
+    )
+    parser.add_argument("--source", choices=["firestore", "json"], default="firestore")
+    parser.add_argument("--input", type=Path, help="JSON dump when --source=json")
+    parser.add_argument(
+        "--out",
+        type=Path,
+        help="results file for --source=json, defaults to next to the input",
+    )
+    parser.add_argument(
+        "--version", default=None, help="defaults to the agent model and instructions"
+    )
+    parser.add_argument("--concurrency", type=int, default=REANALYSIS_CONCURRENCY)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument(
+        "--backend",
+        choices=["agent", "fake"],
+        default="agent",
+        help="fake analyzes without calling the provider",
+    )
+    parser.add_argument(
+        "--batch",
+        choices=["submit", "collect"],
+        help="use the provider batch API instead of live calls",
+    )
+    args = parser.parse_args()
+
+    version = args.version or analysis_version()
+    if args.source == "json":
+        if args.input is None:
+            parser.error("--input is required when --source=json")
+        out = args.out or args.input.with_name(
+            f"{args.input.stem}.reanalysis-{version}.jsonl"
+        )
+        sink = JsonlResultSink(out)
+        pages = iter_json_sessions(args.input, page_size=args.page_size)
+        state_path = out.with_suffix(".batch.json")
+    else:
+        from app.deps import get_firestore_client
+
+        client = get_firestore_client()
+        sink = FirestoreResultSink(client, version)
+        pages = iter_firestore_sessions(client, page_size=args.page_size)
+        state_path = Path(f"reanalysis-{version}.batch.json")
+
+    if args.batch:
+        from app.deps import get_openai_client
+
+        if args.batch == "submit":
+            submit_batch(pages, sink, version, get_openai_client(), state_path)
+        else:
+            collect_batch(sink, get_openai_client(), state_path)
+        return
+
+    if args.backend == "fake":
+        backend = FakeAnalysisBackend()
+    else:
+        from app.deps import configure_agents_client
+
+        configure_agents_client()
+        backend = AgentAnalysisBackend()
+    asyncio.run(reanalyze_sessions(pages, sink, backend, version, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
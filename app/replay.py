@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import json
+from collections import defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from elevenlabs import RealtimeEvents
+from openai.types.responses import ResponseTextDeltaEvent
+from starlette.datastructures import QueryParams
+
+from app.trace import (
+    TraceRecorder,
+    current_trace,
+    decode,
+    latency_breakdown,
+    load_trace,
+)
+
+
+# helper to wait for an offset on the trace clock, speed None means no waiting
+async def wait_until(started: float, offset: float, speed: float | None):
+    if not speed:
+        return
+    loop = asyncio.get_running_loop()
+    delay = started + offset / speed - loop.time()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+# stands in for the client: replays recorded messages once the server has sent
+# as many milestone messages as it had when the client sent them
+class ReplayWebSocket:
+    def __init__(self, events: list[dict], recorder: TraceRecorder, speed):
+        opened = next((e for e in events if e["kind"] == "open"), {})
+        query = {k: v for k, v in opened.get("query", {}).items() if v is not None}
+        self.query_params = QueryParams(query)
+        self.inbound = [e for e in events if e["kind"] == "in"]
+        self.recorder = recorder
+        self.speed = speed
+        self.sent: list[dict] = []
+        self._milestone = asyncio.Event()
+        recorder.on_milestone = self._milestone.set
+        self._position = 0
+        self._started = None
+
+    async def accept(self):
+        self._started = asyncio.get_running_loop().time()
+
+    async def close(self, code: int = 1000, reason: str | None = None):
+        pass
+
+    async def send_text(self, text: str):
+        self.sent.append(json.loads(text))
+
+    async def receive(self) -> dict:
+        if self._position >= len(self.inbound):
+            # the recorded client stayed connected, the server ends the session
+            await asyncio.Event().wait()
+        event = self.inbound[self._position]
+        self._position += 1
+
+        while self.recorder.milestones < event["after"]:
+            self._milestone.clear()
+            await self._milestone.wait()
+        await wait_until(self._started, event["t"], self.speed)
+
+        if event.get("disconnect"):
+            return {"type": "websocket.disconnect", "code": 1000}
+        if "text" in event:
+            return {"type": "websocket.receive", "text": event["text"]}
+        return {"type": "websocket.receive", "bytes": decode(event["b64"])}
+
+
+# realtime STT connection emitting the events recorded for one STT session
+class ReplaySttConnection:
+    def __init__(self, events: list[dict], speed):
+        self.events = events
+        self.speed = speed
+        self.handlers = defaultdict(list)
+        self.sent = 0
+        # handlers are registered right after acquire, before the task runs
+        self._task = asyncio.create_task(self._emit())
+
+    def on(self, event: RealtimeEvents, handler):
+        self.handlers[event].append(handler)
+
+    async def send(self, data: dict):
+        self.sent += 1
+
+    async def close(self):
+        self._task.cancel()
+
+    async def _emit(self):
+        started = asyncio.get_running_loop().time()
+        opened_at = self.events[0]["t"] if self.events else 0
+        for event in self.events:
+            if event["event"] == RealtimeEvents.OPEN.value:
+                continue
+            await wait_until(started, event["t"] - opened_at, self.speed)
+            for handler in self.handlers[RealtimeEvents(event["event"])]:
+                handler(event["data"])
+
+
+class ReplaySttPool:
+    def __init__(self, sessions: dict[int, list[dict]], speed):
+        self.sessions = sessions
+        self.speed = speed
+        self.acquired = 0
+
+    async def acquire(self):
+        events = self.sessions.get(self.acquired, [])
+        self.acquired += 1
+        return ReplaySttConnection(events, self.speed)
+
+    def stats(self) -> dict:
+        return {"replayed": self.acquired}
+
+
+# streamed agent run rebuilt from the recorded deltas and handoffs
+class ReplayRunResult:
+    def __init__(self, events: list[dict], speed):
+        self.events = events
+        self.speed = speed
+        self.final_output = None
+
+    async def stream_events(self):
+        started = asyncio.get_running_loop().time()
+        run_start = self.events[0]["t"] if self.events else 0
+        for event in self.events:
+            await wait_until(started, event["t"] - run_start, self.speed)
+            if event["event"] == "delta":
+                yield SimpleNamespace(
+                    type="raw_response_event",
+                    data=ResponseTextDeltaEvent.model_construct(
+                        type="response.output_text.delta", delta=event["delta"]
+                    ),
+                )
+            elif event["event"] == "agent_updated":
+                yield SimpleNamespace(
+                    type="agent_updated_stream_event",
+                    new_agent=SimpleNamespace(name=event["name"]),
+                )
+            elif event["event"] == "final":
+                self.final_output = event["output"]
+
+
+class ReplayRunner:
+    def __init__(self, runs: dict[int, list[dict]], speed):
+        self.runs = runs
+        self.speed = speed
+        self.started = 0
+
+    def run_streamed(self, agent, prompt):
+        events = self.runs.get(self.started, [])
+        self.started += 1
+        return ReplayRunResult(events, self.speed)
+
+
+# TTS client returning the recorded chunks of each call in order
+class ReplayTextToSpeech:
+    def __init__(self, calls: dict[int, list[dict]]):
+        self.calls = calls
+        self.streamed = 0
+
+    def stream(self, **kwargs):
+        events = self.calls.get(self.streamed, [])
+        self.streamed += 1
+        return iter([decode(event["b64"]) for event in events])
+
+
+async def replay_summary(previous_summary, qa_pairs) -> str:
+    return f"{previous_summary or ''} {len(qa_pairs)} earlier turns.".strip()
+
+
+def group_by_index(events: list[dict], kind: str) -> dict[int, list[dict]]:
+    grouped = defaultdict(list)
+    for event in events:
+        if event["kind"] == kind:
+            grouped[event["n"]].append(event)
+    return dict(grouped)
+
+
+# run websocket_agent against a recorded session, speed 1.0 is real time and
+# None is as fast as possible, returns the trace of the replayed run
+async def replay(events: list[dict], speed: float | None = None) -> TraceRecorder:
+    from app.routes import routes_ws
+
+    recorder = TraceRecorder()
+    websocket = ReplayWebSocket(events, recorder, speed)
+    stt_pool = ReplaySttPool(group_by_index(events, "stt"), speed)
+    tts_client = SimpleNamespace(
+        text_to_speech=ReplayTextToSpeech(group_by_index(events, "tts"))
+    )
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch("app.elevenlabs.stt_pool", stt_pool))
+        stack.enter_context(mock.patch.object(routes_ws, "stt_pool", stt_pool))
+        stack.enter_context(
+            mock.patch("app.elevenlabs.get_elevenlabs", lambda: tts_client)
+        )
+        stack.enter_context(
+            mock.patch.object(
+                routes_ws,
+                "Runner",
+                ReplayRunner(group_by_index(events, "agent"), speed),
+            )
+        )
+        # summaries aren't recorded, long replays fold turns with a placeholder
+        stack.enter_context(
+            mock.patch.object(routes_ws, "summarize_turns", replay_summary)
+        )
+        # replays never write to the bucket or Firestore
+        stack.enter_context(
+            mock.patch.object(
+                routes_ws, "upload_session_in_background", lambda *a: None
+            )
+        )
+        token = current_trace.set(recorder)
+        try:
+            await routes_ws.websocket_agent(websocket)
+        finally:
+            current_trace.reset(token)
+    return recorder
+
+
+# helper to print recorded and replayed stage latencies side by side
+def format_breakdown(before: dict, after: dict) -> str:
+    lines = [
+        f"{'stage':<20}{'count':>7}{'p50 before':>12}{'p50 after':>11}{'delta':>9}"
+    ]
+    for stage in sorted(set(before) | set(after)):
+        b, a = before.get(stage, {}), after.get(stage, {})
+        p50_before, p50_after = b.get("p50"), a.get("p50")
+        delta = (
+            f"{p50_after - p50_before:+.3f}"
+            if p50_before is not None and p50_after is not None
+            else "-"
+        )
+        lines.append(
+            f"{stage:<20}{a.get('count', b.get('count', 0)):>7}"
+            f"{p50_before if p50_before is not None else '-':>12}"
+            f"{p50_after if p50_after is not None else '-':>11}{delta:>9}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded session trace against fake providers"
+    )
+    parser.add_argument("trace", type=Path)
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=None,
+        help="1.0 replays in real time, default is as fast as possible",
+    )
+    parser.add_argument("--out", type=Path, help="save the replayed trace here")
+    args = parser.parse_args()
+
+    events = load_trace(args.trace)
+    replayed = asyncio.run(replay(events, args.speed))
+    if args.out:
+        replayed.save(args.out)
+    print(
+        format_breakdown(latency_breakdown(events), latency_breakdown(replayed.events))
+    )
+
+
+if __name__ == "__main__":
+    main()
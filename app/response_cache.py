@@ -0,0 +1,204 @@
+import os
+import random
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from app.models import ConversationAgentResult
+from app.song_catalog import is_music_request
+
+# answers to the opening question are served from the cache, opt-in
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_TTL_SECS = float(os.getenv("RESPONSE_CACHE_TTL_SECS", "21600"))
+# distinct answers kept per worker
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "500"))
+# agent responses collected per answer before it is served from the cache,
+# hits pick one at random so users don't all get the same follow-up
+RESPONSE_CACHE_VARIANTS = int(os.getenv("RESPONSE_CACHE_VARIANTS", "3"))
+# less confident analyses are never cached
+RESPONSE_CACHE_MIN_CONFIDENCE = float(os.getenv("RESPONSE_CACHE_MIN_CONFIDENCE", "0.6"))
+# cosine similarity for near matches, 0 only serves exact matches
+# trigrams can't tell "happy" from "unhappy", so near matches are opt-in
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+# longer answers say something specific and go to the agent
+RESPONSE_CACHE_MAX_WORDS = 6
+# shorter keys ("im" from "I am very very") say too little to share a response
+RESPONSE_CACHE_MIN_WORDS = 2
+
+EMBEDDING_DIMS = 256
+# fillers, pleasantries and intensifiers don't change the follow-up question
+FILLER_WORDS = {
+    "um", "uh", "uhm", "er", "erm", "hmm", "oh", "yeah", "thanks", "thank",
+    "you", "and", "pretty", "really", "very", "quite", "kinda", "just",
+    "honestly", "actually",
+}  # fmt: skip
+# spellings of the same word
+WORD_FORMS = {"okay": "ok", "alright": "ok", "allright": "ok", "cant": "cannot"}
+# near matches must agree on these, "not good" is no match for "good"
+NEGATIONS = {"not", "no", "never", "dont", "isnt", "arent", "cannot", "nothing"}
+
+
+class CachedResponse(NamedTuple):
+    result: ConversationAgentResult
+    # the question's TTS audio as streamed to the client
+    audio: tuple[bytes, ...]
+    duration_secs: float
+    expires_at: float
+
+
+# cache key for a transcript: lowercase words without punctuation and fillers
+def normalize_transcript(text: str) -> str:
+    text = re.sub(r"\bi am\b", "im", text.lower())
+    words = (word.replace("'", "") for word in re.findall(r"[a-z0-9']+", text))
+    return " ".join(
+        WORD_FORMS.get(word, word) for word in words if word not in FILLER_WORDS
+    )
+
+
+# local embedding of a normalized transcript: hashed character trigrams,
+# unit length so a dot product is the cosine similarity
+def embed(key: str) -> np.ndarray:
+    vector = np.zeros(EMBEDDING_DIMS, dtype=np.float32)
+    padded = f" {key} "
+    for i in range(len(padded) - 2):
+        vector[zlib.crc32(padded[i : i + 3].encode()) % EMBEDDING_DIMS] += 1
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def negations(key: str) -> frozenset[str]:
+    return frozenset(word for word in key.split() if word in NEGATIONS)
+
+
+# first-turn agent results with their question audio, keyed on the answer
+# entries are LRU-evicted and expire after the TTL
+class ResponseCache:
+    def __init__(
+        self,
+        max_size: int = RESPONSE_CACHE_SIZE,
+        ttl_secs: float = RESPONSE_CACHE_TTL_SECS,
+        variants: int = RESPONSE_CACHE_VARIANTS,
+        min_confidence: float = RESPONSE_CACHE_MIN_CONFIDENCE,
+        similarity: float = RESPONSE_CACHE_SIMILARITY,
+    ):
+        self.max_size = max_size
+        self.ttl_secs = ttl_secs
+        self.variants = max(variants, 1)
+        self.min_confidence = min_confidence
+        self.similarity = similarity
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, list[CachedResponse]] = OrderedDict()
+        self._vectors: dict[str, np.ndarray] = {}
+        self._random = random.Random()
+
+    # cache key of an answer, None when it can't be served from the cache
+    def key(self, answer: str) -> str | None:
+        key = normalize_transcript(answer)
+        words = len(key.split())
+        if not RESPONSE_CACHE_MIN_WORDS <= words <= RESPONSE_CACHE_MAX_WORDS:
+            return None
+        if is_music_request(answer):
+            return None
+        return key
+
+    def get(self, answer: str) -> CachedResponse | None:
+        key = self.key(answer)
+        if key is None:
+            return None
+        responses = self._ready(key)
+        if responses:
+            self.hits += 1
+            return self._random.choice(responses)
+        near = self._nearest(key) if self.similarity > 0 else None
+        responses = self._ready(near) if near is not None else None
+        if responses:
+            self.near_hits += 1
+            print(f"[RESPONSE_CACHE] '{key}' matched '{near}'")
+            return self._random.choice(responses)
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        answer: str,
+        result: ConversationAgentResult,
+        audio: list[bytes],
+        duration_secs: float,
+    ) -> bool:
+        key = self.key(answer)
+        if key is None or not audio or result.confidence < self.min_confidence:
+            return False
+        responses = self._live(key) or []
+        if len(responses) >= self.variants or any(
+            cached.result.question == result.question for cached in responses
+        ):
+            return False
+        responses.append(
+            CachedResponse(
+                result,
+                tuple(audio),
+                duration_secs,
+                time.monotonic() + self.ttl_secs,
+            )
+        )
+        self._entries[key] = responses
+        self._entries.move_to_end(key)
+        self._vectors[key] = embed(key)
+        while len(self._entries) > self.max_size:
+            evicted, _ = self._entries.popitem(last=False)
+            del self._vectors[evicted]
+        return True
+
+    # unexpired responses for a key
+    def _live(self, key: str) -> list[CachedResponse] | None:
+        responses = self._entries.get(key)
+        if responses is None:
+            return None
+        now = time.monotonic()
+        responses = [cached for cached in responses if cached.expires_at > now]
+        if not responses:
+            del self._entries[key]
+            del self._vectors[key]
+            return None
+        self._entries[key] = responses
+        return responses
+
+    # responses that can be served, only once the key's variety pool is full
+    # so the first sessions with an answer keep collecting different questions
+    def _ready(self, key: str) -> list[CachedResponse] | None:
+        responses = self._live(key)
+        if responses is None or len(responses) < self.variants:
+            return None
+        self._entries.move_to_end(key)
+        return responses
+
+    # most similar cached key with a full pool, above the threshold
+    def _nearest(self, key: str) -> str | None:
+        candidates = [
+            cached
+            for cached, responses in self._entries.items()
+            if len(responses) >= self.variants and negations(cached) == negations(key)
+        ]
+        if not candidates:
+            return None
+        scores = np.stack([self._vectors[cached] for cached in candidates]) @ embed(key)
+        best = int(np.argmax(scores))
+        return candidates[best] if scores[best] >= self.similarity else None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "cached": len(self._entries),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": (
+                round((self.hits + self.near_hits) / lookups, 3) if lookups else None
+            ),
+        }
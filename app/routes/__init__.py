@@ -1,3 +1,4 @@
+from .routes_sessions import router as sessions_router
 from .routes_ws import router as ws_router
 
-__all__ = ["ws_router"]
+__all__ = ["sessions_router", "ws_router"]
@@ -0,0 +1,70 @@
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.deps import get_session_history
+from app.session_history import (
+    DEFAULT_LIST_LIMIT,
+    DEFAULT_TURNS_LIMIT,
+    MAX_LIST_LIMIT,
+    InvalidCursor,
+    parse_fields,
+    project,
+    session_turns,
+)
+
+router = APIRouter(prefix="/sessions", tags=["sessions"])
+
+
+def requested_fields(fields: str | None) -> list[str]:
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def load_session(session_id: str) -> dict:
+    document = await get_session_history().get_session(session_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return document
+
+
+# newest sessions first, pass next_cursor back as cursor for the next page
+# fields is a comma separated projection, summary fields when left out
+@router.get("")
+async def list_sessions(
+    limit: Annotated[int, Query(ge=1, le=MAX_LIST_LIMIT)] = DEFAULT_LIST_LIMIT,
+    cursor: str | None = None,
+    fields: str | None = None,
+):
+    try:
+        sessions, next_cursor = await get_session_history().list_sessions(
+            limit, cursor, requested_fields(fields)
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor {cursor}")
+    return {"sessions": sessions, "next_cursor": next_cursor}
+
+
+@router.get("/{session_id}")
+async def get_session(session_id: str, fields: str | None = None):
+    document = await load_session(session_id)
+    return project({**document, "session_id": session_id}, requested_fields(fields))
+
+
+# one page of a session's turns
+@router.get("/{session_id}/turns")
+async def get_session_turns(
+    session_id: str,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=MAX_LIST_LIMIT)] = DEFAULT_TURNS_LIMIT,
+):
+    turns = session_turns(await load_session(session_id))
+    page = turns[offset : offset + limit]
+    return {
+        "session_id": session_id,
+        "turns": page,
+        "total": len(turns),
+        "next_offset": offset + limit if offset + limit < len(turns) else None,
+    }
@@ -15,24 +15,111 @@ from fastapi import (
 from openai.types.responses import ResponseTextDeltaEvent
 
 from app import main_agent
+from app.admission import TRY_AGAIN_LATER, AdmissionRejected
+from app.audio_utils import PcmDecoder, create_uplink_decoder
+from app.context import (
+    ContextCompactor,
+    build_agent_prompt,
+    estimate_tokens,
+    qa_pairs_json,
+)
+from app.deadlines import StageTimeout, stage_deadline
+from app.deps import (
+    get_admission_controller,
+    get_quota_scheduler,
+    get_response_cache,
+    get_session_store,
+    get_user_profile_store,
+)
 from app.elevenlabs import (
+    PromptAudio,
+    TtsPlayback,
+    replay_tts_audio,
     stt_elevenlabs_session,
+    stt_pool,
     tts_elevenlabs_session,
 )
-from app.models import QAEmotionPair
+from app.emotions import EmotionTrajectory
+from app.events import (
+    AudioFrame,
+    PlaybackFinished,
+    PlaybackProgress,
+    SessionEventBus,
+    Transcript,
+    parse_playback_position,
+)
+from app.loop_watchdog import tag_session
+from app.models import (
+    ConversationAgentResult,
+    QAEmotionPair,
+    SessionState,
+    TurnTiming,
+)
+from app.outbound import OutboundWriter
+from app.quota import PRIORITY_BACKGROUND, PRIORITY_TURN, current_priority
+from app.response_cache import RESPONSE_CACHE_ENABLED
+from app.segments import answer_segment
 from app.services import (
     upload_session_in_background,
 )
+from app.session_store import SessionStore
+from app.song_catalog import MUSIC_FAST_MODE, get_song_catalog, is_music_request
+from app.summary_agent import summarize_turns
+from app.trace import current_trace, save_trace, start_trace, trace_span
+from app.user_profiles import load_user_profile
 
 router = APIRouter(tags=["agent"])
 
+# full-duplex mode: users can answer while the question is still playing
+BARGE_IN_ENABLED = os.getenv("BARGE_IN_ENABLED", "false").lower() == "true"
+
+# time allowed on top of the streamed audio duration for network and decoder start
+PLAYBACK_SLACK_SECS = float(os.getenv("PLAYBACK_SLACK_SECS", "0.75"))
+# fallback when the duration of the streamed audio is unknown
+PLAYBACK_ACK_TIMEOUT_SECS = 30.0
+# model calls per main agent run, the router and the agent it hands off to
+MAIN_AGENT_CALLS = 2
+# completion tokens reserved in the quota per model call
+LLM_OUTPUT_TOKENS = 500
+
 
 # helper to send status updates to frontend
-async def send_status(websocket: WebSocket, status_type: str, data: dict = None):
+async def send_status(outbound: OutboundWriter, status_type: str, data: dict = None):
     payload = {"type": status_type}
     if data:
         payload.update(data)
-    await websocket.send_json(payload)
+    await outbound.send(payload)
+
+
+# helper to persist session state after each turn
+async def save_session_snapshot(
+    session_store: SessionStore, state: SessionState, audio_bytes: bytearray
+):
+    audio_length = len(audio_bytes)
+    new_audio = bytes(audio_bytes[state.audio_length : audio_length])
+    snapshot = state.model_copy(update={"audio_length": audio_length})
+    try:
+        await session_store.save(snapshot, new_audio)
+        state.audio_length = audio_length
+    except Exception as e:
+        print(f"[WEBSOCKET] Failed to save session snapshot: {e}")
+
+
+# session mood from the smoothed distribution, last answer only as a fallback
+def session_mood(
+    emotion_trajectory: EmotionTrajectory, qa_pairs: list[QAEmotionPair]
+) -> tuple[str, float]:
+    dominant = emotion_trajectory.dominant()
+    if dominant:
+        return dominant
+    if qa_pairs:
+        return qa_pairs[-1].emotion, qa_pairs[-1].confidence
+    return "Calm", 0.5
+
+
+# helper for per-turn timings, seconds since an earlier loop.time()
+def secs_since(started: float) -> float:
+    return round(asyncio.get_running_loop().time() - started, 3)
 
 
 # helper to empty audio q and not use old audio data in next STT session
@@ -44,15 +131,42 @@ def clear_audio_queue(audio_queue: asyncio.Queue):
             break
 
 
-# helper to wait for frontend signal
-async def wait_for_playback_finished(res_queue: asyncio.Queue, timeout: float = 30.0):
+# helper to wait until the client has played the question
+# the server knows the streamed duration, the client ack only ends the wait early
+async def wait_for_playback_finished(
+    events: SessionEventBus, playback: TtsPlayback | None = None
+):
+    with trace_span("playback"):
+        await wait_for_playback_deadline(events, playback)
+
+
+async def wait_for_playback_deadline(
+    events: SessionEventBus, playback: TtsPlayback | None
+):
+    loop = asyncio.get_running_loop()
+    if playback and playback.duration_secs > 0:
+        started_at = playback.first_chunk_at or loop.time()
+        deadline = started_at + playback.duration_secs + PLAYBACK_SLACK_SECS
+    else:
+        deadline = loop.time() + PLAYBACK_ACK_TIMEOUT_SECS
     try:
         while True:
-            response = await asyncio.wait_for(res_queue.get(), timeout=timeout)
-            if response.get("type") == "audio_playback_finished":
+            response = await asyncio.wait_for(
+                events.control.get(), timeout=max(deadline - loop.time(), 0)
+            )
+            if isinstance(response, PlaybackFinished):
                 break
+            # client reports its playhead, recompute when it will finish
+            if isinstance(response, PlaybackProgress) and playback:
+                remaining = playback.duration_secs - response.position
+                deadline = loop.time() + max(remaining, 0) + PLAYBACK_SLACK_SECS
     except asyncio.TimeoutError:
-        print("[WEBSOCKET] Timeout waiting for audio playback finished signal")
+        if playback and playback.duration_secs > 0:
+            print(
+                f"[WEBSOCKET] Playback of {playback.duration_secs:.2f}s audio elapsed"
+            )
+        else:
+            print("[WEBSOCKET] Timeout waiting for audio playback finished signal")
 
 
 # receives constant stream of audio from frontend
@@ -60,190 +174,277 @@ async def receive_audio(
     websocket: WebSocket,
     audio_queue: asyncio.Queue,
     audioBytes: bytearray,
-    res_queue: asyncio.Queue,
+    events: SessionEventBus,
+    decoder: PcmDecoder,
 ):
+    trace = current_trace.get()
     try:
         while True:
             message = await websocket.receive()
+            if trace:
+                trace.record_inbound(message)
 
             if message["type"] == "websocket.disconnect":
                 print(
                     "[WEBSOCKET-RECEIVE_AUDIO] Client disconnected during audio reception"
                 )
-                break
+                # fails the session's task group, cancelling all in-flight work
+                raise WebSocketDisconnect(message.get("code", 1000))
 
             if message["type"] == "websocket.receive":
                 if "text" in message:
                     try:
                         json_message = json.loads(message["text"])
+                        if not isinstance(json_message, dict):
+                            continue
                         if json_message.get("type") == "audio_playback_finished":
-                            await res_queue.put({"type": "audio_playback_finished"})
+                            events.control.publish(PlaybackFinished())
+                            continue
+                        if json_message.get("type") == "playback_progress":
+                            position = parse_playback_position(
+                                json_message.get("position")
+                            )
+                            if position is not None:
+                                events.control.publish(PlaybackProgress(position))
                             continue
                     except json.JSONDecodeError:
                         pass
 
                 # handle binary audio data
                 if "bytes" in message:
-                    audio_data = message["bytes"]
+                    audio_data = decoder.decode(message["bytes"])
+                    if not audio_data:
+                        continue
+                    frame = AudioFrame(len(audioBytes), audio_data)
                     audioBytes.extend(audio_data)
-                    await audio_queue.put(audio_data)
+                    await audio_queue.put(frame)
     except WebSocketDisconnect:
         print("[WEBSOCKET-RECEIVE_AUDIO] WebSocket disconnected in receive_audio")
+        raise
     except Exception as e:
         print(f"[WEBSOCKET-RECEIVE_AUDIO] Error in receive_audio: {e}")
+        raise
 
 
 # listens for user response using elevenlabs STT
 async def listen_for_answer(
-    audio_queue: asyncio.Queue, res_queue: asyncio.Queue, websocket: WebSocket
-):
+    audio_queue: asyncio.Queue,
+    events: SessionEventBus,
+    outbound: OutboundWriter,
+    speech_detected: asyncio.Event | None = None,
+    announce: bool = True,
+    timing: TurnTiming | None = None,
+    playback_done: asyncio.Event | None = None,
+) -> Transcript:
     print("[WEBSOCKET] Now listening for user response...")
     # update frontend
-    await send_status(websocket, "listening")
+    if announce:
+        await send_status(outbound, "listening")
 
-    answer_transcript_container = {"current": ""}
-    answer_ready = asyncio.Event()
-    stt_task = asyncio.create_task(
-        stt_elevenlabs_session(
-            audio_queue,
-            res_queue,
-            answer_transcript_container,
-            answer_ready,
-            websocket,
-        )
-    )
+    # committed transcripts left over from the previous answer
+    events.transcripts.drain()
+    listen_started = asyncio.get_running_loop().time()
 
-    # wait for VAD signal
-    await answer_ready.wait()
-    await stt_task
-    answer_transcript = answer_transcript_container["current"]
-    print(f"[WEBSOCKET] Received answer: {answer_transcript}")
-    return answer_transcript
+    async def transcribe():
+        try:
+            async with get_admission_controller().provider_slot("stt"):
+                await stt_elevenlabs_session(
+                    audio_queue, events, outbound, speech_detected
+                )
+        finally:
+            # wakes the reader below when STT ends without committing an answer
+            events.transcripts.publish(Transcript("", is_final=True))
 
+    # the first committed transcript (VAD detected end of speech) is the answer
+    async def read_answer() -> Transcript:
+        while True:
+            transcript = await events.transcripts.get()
+            if transcript.is_final:
+                return transcript
 
-# main function to ask and listen
-async def ask_question_and_get_response(
-    question: str,
-    websocket: WebSocket,
+    # leaving the group early (deadline, disconnect) cancels the STT session
+    try:
+        with trace_span("stt"):
+            async with asyncio.TaskGroup() as listen_tasks:
+                listen_tasks.create_task(transcribe())
+                answer_task = listen_tasks.create_task(read_answer())
+                if playback_done is not None:
+                    # barge-in: the user can answer while the prompt plays,
+                    # the deadline only counts once it has finished
+                    playback_task = listen_tasks.create_task(playback_done.wait())
+                    await asyncio.wait(
+                        [answer_task, playback_task],
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    playback_task.cancel()
+                async with stage_deadline("stt"):
+                    transcript = await answer_task
+    except* StageTimeout:
+        # a silent user or a stuck STT session, handled like an empty answer
+        print("[WEBSOCKET] No answer before the STT deadline")
+        transcript = Transcript("", is_final=True)
+    if timing is not None:
+        timing.stt_commit_secs = secs_since(listen_started)
+    print(f"[WEBSOCKET] Received answer: {transcript.text}")
+    return transcript
+
+
+# helper to stream a prompt within the TTS quota and note its time to first audio
+# cached prompt audio is played without calling the provider
+async def timed_tts(
+    text: str,
+    outbound: OutboundWriter,
+    timing: TurnTiming | None,
+    prompt_audio: PromptAudio | None = None,
+) -> TtsPlayback:
+    if prompt_audio is not None and prompt_audio.chunks:
+        started = asyncio.get_running_loop().time()
+        playback = await replay_tts_audio(prompt_audio, outbound)
+    else:
+        await get_quota_scheduler().acquire("elevenlabs", "tts_chars", len(text))
+        async with (
+            stage_deadline("tts"),
+            get_admission_controller().provider_slot("tts"),
+        ):
+            started = asyncio.get_running_loop().time()
+            playback = await tts_elevenlabs_session(text, outbound, prompt_audio)
+    if timing is not None and playback.first_chunk_at is not None:
+        timing.tts_first_byte_secs = round(playback.first_chunk_at - started, 3)
+    return playback
+
+
+# half-duplex: play the whole prompt, then start listening
+async def speak_then_listen(
+    text: str,
+    status_type: str,
+    status_data: dict,
+    outbound: OutboundWriter,
     audio_queue: asyncio.Queue,
-    res_queue: asyncio.Queue,
+    events: SessionEventBus,
+    timing: TurnTiming | None = None,
+    prompt_audio: PromptAudio | None = None,
 ):
-    await tts_elevenlabs_session(question, websocket)
+    # drop late acks from a prompt the server already stopped waiting for
+    events.control.drain()
+
+    playback = await timed_tts(text, outbound, timing, prompt_audio)
     # update frontend
-    await send_status(websocket, "question", {"text": question})
+    await send_status(outbound, status_type, status_data)
 
-    await wait_for_playback_finished(res_queue)
+    playback_started = asyncio.get_running_loop().time()
+    await wait_for_playback_finished(events, playback)
+    if timing is not None:
+        timing.playback_secs = secs_since(playback_started)
 
     clear_audio_queue(audio_queue)
 
-    answer_transcript = await listen_for_answer(audio_queue, res_queue, websocket)
-
-    if not answer_transcript.strip():
-        retry_message = "Sorry, I didn't catch that. If you'd like me to play some music just say 'Play me some music'"
-        await tts_elevenlabs_session(retry_message, websocket)
-        await send_status(websocket, "empty_transcript", {"message": retry_message})
-
-        await wait_for_playback_finished(res_queue)
-        clear_audio_queue(audio_queue)
-
-        answer_transcript = await listen_for_answer(audio_queue, res_queue, websocket)
-
-    return answer_transcript
+    return await listen_for_answer(audio_queue, events, outbound, timing=timing)
 
 
-@router.websocket(os.getenv("AGENT_URL"))
-async def websocket_agent(websocket: WebSocket):
-    print("[WEBSOCKET] Client connected")
-    await websocket.accept()
+# full-duplex: STT runs during playback and user speech cuts the prompt short
+async def speak_with_barge_in(
+    text: str,
+    status_type: str,
+    status_data: dict,
+    outbound: OutboundWriter,
+    audio_queue: asyncio.Queue,
+    events: SessionEventBus,
+    timing: TurnTiming | None = None,
+    prompt_audio: PromptAudio | None = None,
+):
+    clear_audio_queue(audio_queue)
+    # drop acks left over from an earlier interrupted prompt
+    events.control.drain()
 
-    session_id = str(uuid.uuid4())
-    session_timestamp = datetime.now().isoformat()
-    audio_queue = asyncio.Queue()
-    res_queue = asyncio.Queue()
-    audio_bytes = bytearray()
-    qa_pairs: list[QAEmotionPair] = []
-    receive_task = None
+    speech_detected = asyncio.Event()
+    playback_done = asyncio.Event()
+    status_sent = False
 
-    try:
-        current_question = None
-        current_is_direct = False
-        high_confidence_reached = False
-        music_reminder_given = False
-        direct_question_count = 0
-
-        receive_task = asyncio.create_task(
-            receive_audio(websocket, audio_queue, audio_bytes, res_queue)
+    async def play_prompt():
+        nonlocal status_sent
+        try:
+            playback = await timed_tts(text, outbound, timing, prompt_audio)
+            await send_status(outbound, status_type, status_data)
+            status_sent = True
+            playback_started = asyncio.get_running_loop().time()
+            try:
+                await wait_for_playback_finished(events, playback)
+            finally:
+                # cut short when the user barges in
+                if timing is not None:
+                    timing.playback_secs = secs_since(playback_started)
+        finally:
+            # starts the answer's deadline, also when the user barged in
+            playback_done.set()
+
+    # prompt, STT and barge-in detection end together, whichever way the turn ends
+    async with asyncio.TaskGroup() as turn_tasks:
+        listen_task = turn_tasks.create_task(
+            listen_for_answer(
+                audio_queue,
+                events,
+                outbound,
+                speech_detected,
+                announce=False,
+                timing=timing,
+                playback_done=playback_done,
+            )
         )
-
-        initial_message = 'Hello! How are you feeling today? If you say "Play me some music", I can play you a song.'
-        current_question = initial_message
-        user_input = await ask_question_and_get_response(
-            initial_message, websocket, audio_queue, res_queue
+        playback_task = turn_tasks.create_task(play_prompt())
+        barge_in_task = turn_tasks.create_task(speech_detected.wait())
+        await asyncio.wait(
+            [playback_task, barge_in_task, listen_task],
+            return_when=asyncio.FIRST_COMPLETED,
         )
 
-        while True:
-            # empty response
-            if not user_input.strip():
-                print(
-                    "[WEBSOCKET] Two consecutive empty responses - ending with music recommendation"
-                )
-                if qa_pairs:
-                    last_qa = qa_pairs[-1]
-                    final_emotion = last_qa.emotion
-                    final_confidence = last_qa.confidence
-                else:
-                    final_emotion = "Calm"
-                    final_confidence = 0.5
-
-                await send_status(
-                    websocket,
-                    "result",
-                    {"mood": final_emotion, "confidence": final_confidence},
-                )
-
-                # force music rec
-                user_input = "play me some music"
-
-            await send_status(websocket, "analyzing")
-
-            # build existing context
-            qa_pairs_json = json.dumps(
-                [
-                    {
-                        "question": qa.question,
-                        "answer": qa.answer,
-                        "emotion": qa.emotion,
-                        "confidence": qa.confidence,
-                        "is_direct": qa.is_direct,
-                    }
-                    for qa in qa_pairs
-                ]
-            )
-
-            main_agent_prompt = f"""
-                User message: "{user_input}"
-
-                Current context:
-                - Questions asked so far: {len(qa_pairs)}
-                - Direct questions used: {direct_question_count}/5
-                - High confidence reached: {high_confidence_reached}
-                - Music reminder already given: {music_reminder_given}
-
-                Previous Q&A pairs:
-                {qa_pairs_json}
-
-                Process this user input according to your workflow.
-            """
+        if not playback_task.done():
+            print("[WEBSOCKET] User barged in, stopping question playback")
+            playback_task.cancel()
+            try:
+                await playback_task
+            except asyncio.CancelledError:
+                pass
+            if not status_sent:
+                await send_status(outbound, status_type, status_data)
+            await send_status(outbound, "stop_playback")
 
-            print("[WEBSOCKET] Run starting")
+        await send_status(outbound, "listening")
+        answer = await listen_task
+        barge_in_task.cancel()
+    return answer
 
-            # timing: per-run measurements
-            run_start = time.perf_counter()
-            first_agent_update_time = None
-            current_agent = None
-            agent_update_time: dict[str, float] = {}
-            agent_first_raw_seen: dict[str, bool] = {}
 
+# streams the main agent run to the frontend, returns its final output
+async def run_main_agent(
+    main_agent_prompt: str, outbound: OutboundWriter, turn_timing: TurnTiming
+):
+    trace = current_trace.get()
+    print("[WEBSOCKET] Run starting")
+
+    # timing: per-run measurements
+    run_start = time.perf_counter()
+    first_agent_update_time = None
+    first_token_time = None
+    current_agent = None
+    agent_update_time: dict[str, float] = {}
+    agent_first_raw_seen: dict[str, bool] = {}
+
+    trace_index = trace.next_index("agent") if trace else None
+    trace_start = trace.now() if trace else None
+    trace_first_token = False
+    quota = get_quota_scheduler()
+    await quota.acquire("openai", "requests", MAIN_AGENT_CALLS)
+    await quota.acquire(
+        "openai",
+        "tokens",
+        MAIN_AGENT_CALLS * (estimate_tokens(main_agent_prompt) + LLM_OUTPUT_TOKENS),
+    )
+    agent_result = None
+    try:
+        async with (
+            stage_deadline("llm"),
+            get_admission_controller().provider_slot("llm"),
+        ):
             agent_result = Runner.run_streamed(main_agent, main_agent_prompt)
 
             async for event in agent_result.stream_events():
@@ -253,6 +454,13 @@ async def websocket_agent(websocket: WebSocket):
                 ):
                     delta = event.data.delta
                     print(delta, end="", flush=True)
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+                    if trace:
+                        if not trace_first_token:
+                            trace.record_span("agent_first_token", trace_start)
+                            trace_first_token = True
+                        trace.record("agent", n=trace_index, event="delta", delta=delta)
                     # record time from last agent update to first raw response for that agent
                     if current_agent and not agent_first_raw_seen.get(
                         current_agent, False
@@ -268,7 +476,7 @@ async def websocket_agent(websocket: WebSocket):
 
                     try:
                         await send_status(
-                            websocket, "agent_stream_delta", {"delta": delta}
+                            outbound, "agent_stream_delta", {"delta": delta}
                         )
                     except Exception as e:
                         print(f"[WEBSOCKET] Failed to send stream delta: {e}")
@@ -280,6 +488,15 @@ async def websocket_agent(websocket: WebSocket):
                     )
                     agent_name = getattr(new_agent, "name", str(new_agent))
                     t_now = time.perf_counter()
+                    if trace:
+                        if first_agent_update_time is None:
+                            trace.record_span("agent_router", trace_start)
+                        trace.record(
+                            "agent",
+                            n=trace_index,
+                            event="agent_updated",
+                            name=agent_name,
+                        )
 
                     # time from run start to first agent switch
                     if first_agent_update_time is None:
@@ -306,159 +523,502 @@ async def websocket_agent(websocket: WebSocket):
                     current_agent = agent_name
                 else:
                     continue
+    except BaseException as e:
+        # stop the SDK's background run too, not just our view of its stream
+        if agent_result is not None:
+            agent_result.cancel()
+        quota.report_error("openai", e)
+        raise
+    quota.report_success("openai")
+
+    # streaming finished
+    run_end = time.perf_counter()
+    run_duration = run_end - run_start
+
+    final_output = agent_result.final_output
+    if isinstance(final_output, dict):
+        final_payload = final_output
+    elif hasattr(final_output, "model_dump"):
+        final_payload = final_output.model_dump()
+    else:
+        final_payload = {"text": str(final_output)}
+
+    print(f"\n[WEBSOCKET] Stream finished. Final payload: {final_payload}")
+    if trace:
+        trace.record_span("agent", trace_start)
+        trace.record("agent", n=trace_index, event="final", output=final_payload)
+    print(f"[WEBSOCKET] Total run duration: {run_duration:.3f}s")
+
+    # the answer's turn timing, stored with its QA pair
+    turn_timing.run_secs = round(run_duration, 3)
+    if first_agent_update_time is not None:
+        turn_timing.router_secs = round(first_agent_update_time - run_start, 3)
+    if first_token_time is not None:
+        turn_timing.agent_first_token_secs = round(first_token_time - run_start, 3)
+    print(f"[WEBSOCKET] Turn timing: {turn_timing.model_dump()}")
+    return final_output
+
+
+# stores a first-turn agent result and its question audio
+def cache_response(answer: str, result_data: dict, prompt_audio: PromptAudio):
+    try:
+        result = ConversationAgentResult.model_validate(result_data)
+    except Exception as e:
+        print(f"[WEBSOCKET] Not caching response: {e}")
+        return
+    if get_response_cache().put(
+        answer, result, prompt_audio.chunks, prompt_audio.duration_secs
+    ):
+        print(f"[WEBSOCKET] Cached response for '{answer}'")
 
-            # streaming finished
-            run_end = time.perf_counter()
-            run_duration = run_end - run_start
-
-            final_output = agent_result.final_output
-            if isinstance(final_output, dict):
-                final_payload = final_output
-            elif hasattr(final_output, "model_dump"):
-                final_payload = final_output.model_dump()
-            else:
-                final_payload = {"text": str(final_output)}
-
-            print(f"\n[WEBSOCKET] Stream finished. Final payload: {final_payload}")
-            print(f"[WEBSOCKET] Total run duration: {run_duration:.3f}s")
-
-            if isinstance(final_output, dict):
-                result_data = final_output
-            elif hasattr(final_output, "model_dump"):
-                result_data = final_output.model_dump()
-            else:
-                print(f"[WEBSOCKET] Unexpected output format: {type(final_output)}")
-                break
 
-            # handle question response
-            if result_data.get("question") is not None:
-                next_question = result_data["question"]
-                emotion = result_data.get("emotion")
-                confidence = result_data.get("confidence")
-
-                qa_pairs.append(
-                    QAEmotionPair(
-                        question=current_question,
-                        answer=user_input,
-                        emotion=emotion,
-                        confidence=confidence,
-                        negative_emotion_percentages=result_data.get(
-                            "negative_emotion_percentages"
-                        ),
-                        is_direct=current_is_direct,
-                    )
-                )
+# main function to ask and listen
+async def ask_question_and_get_response(
+    question: str,
+    outbound: OutboundWriter,
+    audio_queue: asyncio.Queue,
+    events: SessionEventBus,
+    timing: TurnTiming | None = None,
+    prompt_audio: PromptAudio | None = None,
+) -> Transcript:
+    speak_and_listen = speak_with_barge_in if BARGE_IN_ENABLED else speak_then_listen
+
+    answer_transcript = await speak_and_listen(
+        question,
+        "question",
+        {"text": question},
+        outbound,
+        audio_queue,
+        events,
+        timing,
+        prompt_audio,
+    )
 
-                if result_data.get("is_direct", False):
-                    direct_question_count += 1
+    if not answer_transcript.text.strip():
+        retry_message = "Sorry, I didn't catch that. If you'd like me to play some music just say 'Play me some music'"
+        answer_transcript = await speak_and_listen(
+            retry_message,
+            "empty_transcript",
+            {"message": retry_message},
+            outbound,
+            audio_queue,
+            events,
+            timing,
+        )
 
-                if confidence >= 0.8 and not high_confidence_reached:
-                    high_confidence_reached = True
+    return answer_transcript
+
+
+@router.websocket(os.getenv("AGENT_URL"))
+async def websocket_agent(websocket: WebSocket):
+    print("[WEBSOCKET] Client connected")
+    await websocket.accept()
+    outbound = OutboundWriter(websocket)
+    outbound.start()
+
+    # admission control: queue or shed the session when the worker is full
+    admission = get_admission_controller()
+
+    async def send_queue_position(position: int, eta_secs: float):
+        await send_status(
+            outbound, "queued", {"position": position, "eta_secs": round(eta_secs)}
+        )
+
+    try:
+        await admission.acquire(send_queue_position)
+    except AdmissionRejected as e:
+        print(f"[WEBSOCKET] Rejecting session ({e.reason}): {admission.stats()}")
+        try:
+            await send_status(outbound, "overloaded", {"retry_after": e.retry_after})
+            await outbound.close()
+            await websocket.close(code=TRY_AGAIN_LATER, reason=e.reason)
+        except Exception:
+            pass
+        return
+    except Exception as e:
+        print(f"[WEBSOCKET] Client left the admission queue: {e}")
+        await outbound.close()
+        return
+    # everything after admission runs under this finally so the slot can't leak
+    admitted_at = time.monotonic()
+    try:
+        await run_session(websocket, outbound)
+    finally:
+        await outbound.close()
+        admission.release(time.monotonic() - admitted_at)
+
+
+# one admitted conversation, from resume handshake to upload
+async def run_session(websocket: WebSocket, outbound: OutboundWriter):
+    session_store = get_session_store()
+    audio_queue = asyncio.Queue()
+    events = SessionEventBus()
+    session_completed = False
+    # set TRACE_DIR to record the session for app.replay
+    trace = start_trace()
+    if trace:
+        trace.record(
+            "open", query={"audio_codec": websocket.query_params.get("audio_codec")}
+        )
+        outbound.trace = trace
+
+    # resume handshake: client reconnects with ?session_id=<id>
+    state = None
+    resume_id = websocket.query_params.get("session_id")
+    if resume_id:
+        try:
+            state = await session_store.load(resume_id)
+            # state and audio resume together or not at all
+            if state is not None:
+                resumed_audio = await session_store.load_audio(state.session_id)
+        except Exception as e:
+            state = None
+            print(f"[WEBSOCKET] Failed to load session {resume_id}: {e}")
+        if state is None:
+            print(f"[WEBSOCKET] No stored state for session {resume_id}")
+
+    # uplink codec negotiation: client asks with ?audio_codec=opus
+    decoder = create_uplink_decoder(websocket.query_params.get("audio_codec"))
+
+    resumed = state is not None
+    if resumed:
+        audio_bytes = bytearray(resumed_audio)
+        # keep the archive consistent with what was persisted
+        del audio_bytes[state.audio_length :]
+        print(
+            f"[WEBSOCKET] Resuming session {state.session_id} after {len(state.qa_pairs)} QA pairs"
+        )
+    else:
+        state = SessionState(
+            session_id=str(uuid.uuid4()),
+            session_timestamp=datetime.now().isoformat(),
+            user_id=websocket.query_params.get("user_id"),
+        )
+        audio_bytes = bytearray()
+
+    # stalls of the event loop while this session or its tasks run are
+    # logged with its id
+    tag_session(state.session_id)
+
+    emotion_trajectory = EmotionTrajectory(trajectory=state.emotion_trajectory)
+    # music preferences are read once per session, through the worker's profile cache
+    profile = await load_user_profile(get_user_profile_store, state.user_id)
+
+    # older turns are summarized in the background while the next question plays
+    async def summarize(previous_summary, qa_pairs):
+        quota = get_quota_scheduler()
+        await quota.acquire("openai", "requests", priority=PRIORITY_BACKGROUND)
+        await quota.acquire(
+            "openai",
+            "tokens",
+            estimate_tokens(qa_pairs_json(qa_pairs)) + LLM_OUTPUT_TOKENS,
+            priority=PRIORITY_BACKGROUND,
+        )
+        async with (
+            stage_deadline("llm"),
+            get_admission_controller().provider_slot("llm"),
+        ):
+            return await summarize_turns(previous_summary, qa_pairs)
+
+    # every task of the session runs in this group: a disconnect, a missed
+    # deadline or an error cancels all in-flight provider calls at once
+    try:
+        async with asyncio.TaskGroup() as session_tasks:
+            await send_status(
+                outbound,
+                "session",
+                {
+                    "session_id": state.session_id,
+                    "resumed": resumed,
+                    "audio_codec": decoder.codec,
+                },
+            )
+
+            receive_task = session_tasks.create_task(
+                receive_audio(websocket, audio_queue, audio_bytes, events, decoder)
+            )
+            compactor = ContextCompactor(summarize, task_group=session_tasks)
+
+            if not resumed:
+                initial_message = 'Hello! How are you feeling today? If you say "Play me some music", I can play you a song.'
+                state.current_question = initial_message
+                await save_session_snapshot(session_store, state, audio_bytes)
+
+            # on resume the interrupted question is asked again
+            turn_timing = TurnTiming()
+            answer = await ask_question_and_get_response(
+                state.current_question, outbound, audio_queue, events, turn_timing
+            )
+
+            # the session is in progress now, its calls go ahead of new sessions
+            current_priority.set(PRIORITY_TURN)
+
+            while True:
+                user_input = answer.text
+                # where the answer sits in the session audio, from its word timestamps
+                audio_segment = answer_segment(
+                    answer.words, answer.audio_offset, len(audio_bytes)
+                )
+
+                # empty response
+                if not user_input.strip():
                     print(
-                        "[WEBSOCKET] High confidence (>= 0.8) reached for the first time."
+                        "[WEBSOCKET] Two consecutive empty responses - ending with music recommendation"
+                    )
+                    final_emotion, final_confidence = session_mood(
+                        emotion_trajectory, state.qa_pairs
                     )
 
-                if "Play me some music" in next_question and not music_reminder_given:
-                    music_reminder_given = True
-                    print("[WEBSOCKET] Music reminder has been given to the user.")
-
-                current_question = next_question
-                current_is_direct = result_data.get("is_direct", False)
-
-                # send emotion results to frontend
-                await send_status(
-                    websocket,
-                    "intermediate_result",
-                    {
-                        "mood": emotion,
-                        "confidence": confidence,
-                        "negative_emotion_percentages": result_data.get(
-                            "negative_emotion_percentages"
-                        ),
-                    },
-                )
+                    await send_status(
+                        outbound,
+                        "result",
+                        {"mood": final_emotion, "confidence": final_confidence},
+                    )
 
-                # ask next question
-                user_input = await ask_question_and_get_response(
-                    next_question, websocket, audio_queue, res_queue
-                )
+                    # force music rec
+                    user_input = "play me some music"
 
-            # handle music response
-            elif result_data.get("song") is not None:
-                music_song = result_data.get("song")
-                emotion = result_data.get(
-                    "emotion", qa_pairs[-1].emotion if qa_pairs else "Calm"
-                )
-                confidence = result_data.get(
-                    "confidence", qa_pairs[-1].confidence if qa_pairs else 0.5
-                )
+                await send_status(outbound, "analyzing")
 
-                # final pair
-                qa_pairs.append(
-                    QAEmotionPair(
-                        question=current_question,
-                        answer=user_input,
-                        emotion=emotion,
-                        confidence=confidence,
-                        negative_emotion_percentages=result_data.get(
-                            "negative_emotion_percentages"
-                        ),
-                        is_direct=current_is_direct,
+                # build existing context, folding in a finished summary
+                await compactor.apply(state)
+                # music turns: songs are ranked locally, the agent only picks one
+                song_candidates = []
+                if is_music_request(user_input):
+                    song_candidates = get_song_catalog().candidates(
+                        emotion_trajectory.distribution, profile
                     )
+                main_agent_prompt = build_agent_prompt(
+                    user_input, state, profile, song_candidates
                 )
 
-                await send_status(
-                    websocket, "result", {"mood": emotion, "confidence": confidence}
-                )
-                await send_status(
-                    websocket, "music_recommendation", {"music": music_song}
-                )
-                print(f"[WEBSOCKET] Music recommendation: {music_song}")
-                break
+                # common answers to the opening question skip the agent and TTS
+                first_turn = RESPONSE_CACHE_ENABLED and not state.qa_pairs
+                cached = None
+                if first_turn and not song_candidates:
+                    cached = get_response_cache().get(user_input)
+
+                if song_candidates and MUSIC_FAST_MODE:
+                    final_output = {"song": song_candidates[0].song.label}
+                    print(f"[WEBSOCKET] Fast mode song: {final_output['song']}")
+                elif cached is not None:
+                    final_output = cached.result
+                    print(f"[WEBSOCKET] Cached response: {cached.result.question}")
+                else:
+                    final_output = await run_main_agent(
+                        main_agent_prompt, outbound, turn_timing
+                    )
 
-            # main agent returned something unexpected
-            else:
-                print(f"[WEBSOCKET] Unknown result format: {result_data}")
-                break
+                if isinstance(final_output, dict):
+                    result_data = final_output
+                elif hasattr(final_output, "model_dump"):
+                    result_data = final_output.model_dump()
+                else:
+                    print(f"[WEBSOCKET] Unexpected output format: {type(final_output)}")
+                    break
+
+                # handle question response
+                if result_data.get("question") is not None:
+                    next_question = result_data["question"]
+                    emotion = result_data.get("emotion")
+                    confidence = result_data.get("confidence")
+
+                    state.qa_pairs.append(
+                        QAEmotionPair(
+                            question=state.current_question,
+                            answer=user_input,
+                            emotion=emotion,
+                            confidence=confidence,
+                            negative_emotion_percentages=result_data.get(
+                                "negative_emotion_percentages"
+                            ),
+                            is_direct=state.current_is_direct,
+                            audio_segment=audio_segment,
+                            timing=turn_timing,
+                        )
+                    )
 
-    except WebSocketDisconnect as e:
-        print(f"[WEBSOCKET] WebSocket disconnected: {e}")
-    except Exception as e:
-        print(f"[WEBSOCKET] Error during websocket communication: {e}")
+                    if result_data.get("is_direct", False):
+                        state.direct_question_count += 1
+
+                    if confidence >= 0.8 and not state.high_confidence_reached:
+                        state.high_confidence_reached = True
+                        print(
+                            "[WEBSOCKET] High confidence (>= 0.8) reached for the first time."
+                        )
+
+                    if (
+                        "Play me some music" in next_question
+                        and not state.music_reminder_given
+                    ):
+                        state.music_reminder_given = True
+                        print("[WEBSOCKET] Music reminder has been given to the user.")
+
+                    state.current_question = next_question
+                    state.current_is_direct = result_data.get("is_direct", False)
+
+                    negative_emotions = state.qa_pairs[-1].negative_emotion_percentages
+                    emotion_distribution = emotion_trajectory.update(
+                        emotion, confidence, negative_emotions
+                    )
+
+                    # send emotion results to frontend
+                    await send_status(
+                        outbound,
+                        "intermediate_result",
+                        {
+                            "mood": emotion,
+                            "confidence": confidence,
+                            "negative_emotion_percentages": (
+                                negative_emotions.to_dict()
+                                if negative_emotions
+                                else None
+                            ),
+                            "emotion_distribution": emotion_distribution,
+                        },
+                    )
+
+                    # snapshot the finished turn so the session can resume elsewhere
+                    await save_session_snapshot(session_store, state, audio_bytes)
+                    compactor.maybe_start(state)
+
+                    # the question audio is recorded for the cache on a miss
+                    prompt_audio = None
+                    if cached is not None:
+                        prompt_audio = PromptAudio(cached.audio, cached.duration_secs)
+                    elif first_turn:
+                        prompt_audio = PromptAudio()
+
+                    # ask next question
+                    turn_timing = TurnTiming()
+                    answer = await ask_question_and_get_response(
+                        next_question,
+                        outbound,
+                        audio_queue,
+                        events,
+                        turn_timing,
+                        prompt_audio,
+                    )
+
+                    if cached is None and prompt_audio is not None:
+                        cache_response(user_input, result_data, prompt_audio)
+
+                # handle music response
+                elif result_data.get("song") is not None:
+                    music_song = result_data.get("song")
+                    mood, mood_confidence = session_mood(
+                        emotion_trajectory, state.qa_pairs
+                    )
+                    emotion = result_data.get(
+                        "emotion",
+                        state.qa_pairs[-1].emotion if state.qa_pairs else "Calm",
+                    )
+                    confidence = result_data.get(
+                        "confidence",
+                        state.qa_pairs[-1].confidence if state.qa_pairs else 0.5,
+                    )
+
+                    # final pair
+                    state.qa_pairs.append(
+                        QAEmotionPair(
+                            question=state.current_question,
+                            answer=user_input,
+                            emotion=emotion,
+                            confidence=confidence,
+                            negative_emotion_percentages=result_data.get(
+                                "negative_emotion_percentages"
+                            ),
+                            is_direct=state.current_is_direct,
+                            audio_segment=audio_segment,
+                            timing=turn_timing,
+                        )
+                    )
+
+                    await send_status(
+                        outbound,
+                        "result",
+                        {
+                            "mood": mood,
+                            "confidence": mood_confidence,
+                            "emotion_distribution": emotion_trajectory.as_dict(),
+                        },
+                    )
+                    await send_status(
+                        outbound, "music_recommendation", {"music": music_song}
+                    )
+                    print(f"[WEBSOCKET] Music recommendation: {music_song}")
+                    session_completed = True
+                    break
+
+                # main agent returned something unexpected
+                else:
+                    print(f"[WEBSOCKET] Unknown result format: {result_data}")
+                    break
+
+            # the conversation is over, stop reading from the client and
+            # drop a summary nobody will use
+            receive_task.cancel()
+            compactor.cancel()
+
+    except* WebSocketDisconnect:
+        print("[WEBSOCKET] Client disconnected, cancelled in-flight work")
+    except* StageTimeout as timeouts:
+        print(f"[WEBSOCKET] Reaping stuck session: {timeouts.exceptions[0]}")
+        try:
+            await send_status(
+                outbound, "error", {"message": str(timeouts.exceptions[0])}
+            )
+        except Exception:
+            pass
+    except* Exception as errors:
+        print(f"[WEBSOCKET] Error during websocket communication: {errors.exceptions}")
         try:
-            await send_status(websocket, "error", {"message": str(e)})
+            await send_status(outbound, "error", {"message": str(errors.exceptions[0])})
         except Exception:
             pass
     finally:
         print("[WEBSOCKET] Cleaning up websocket session")
-        if receive_task:
-            receive_task.cancel()
+        print(
+            f"[WEBSOCKET] Uplink {decoder.codec}: {decoder.bytes_in} bytes received, {decoder.bytes_out} bytes PCM"
+        )
+        print(f"[WEBSOCKET] Event channels: {events.stats()}")
+        print(f"[WEBSOCKET] STT pool: {stt_pool.stats()}")
+        print(f"[WEBSOCKET] Provider quotas: {get_quota_scheduler().stats()}")
+        if RESPONSE_CACHE_ENABLED:
+            print(f"[WEBSOCKET] Response cache: {get_response_cache().stats()}")
+        save_trace(trace, state.session_id)
+        # finished sessions can't be resumed, interrupted ones stay until TTL
+        if session_completed:
             try:
-                await receive_task
-            except (asyncio.CancelledError, WebSocketDisconnect):
-                pass
+                await session_store.delete(state.session_id)
             except Exception as e:
-                print(f"[WEBSOCKET] Error during receive_task cleanup: {e}")
+                print(f"[WEBSOCKET] Failed to delete session state: {e}")
 
         # upload session data in background thread
-        if qa_pairs:
-            print(f"[WEBSOCKET] Uploading {len(qa_pairs)} QA pairs")
-            last_qa = qa_pairs[-1]
+        # a resumed session overwrites the same document and audio file
+        if state.qa_pairs:
+            print(f"[WEBSOCKET] Uploading {len(state.qa_pairs)} QA pairs")
+            final_emotion, final_confidence = session_mood(
+                emotion_trajectory, state.qa_pairs
+            )
             upload_thread = threading.Thread(
                 target=upload_session_in_background,
                 args=(
                     audio_bytes,
-                    session_id,
-                    session_timestamp,
-                    qa_pairs,
-                    last_qa.emotion,
-                    last_qa.confidence,
-                    len(qa_pairs),
-                    sum(1 for qa in qa_pairs if qa.is_direct),
+                    state.session_id,
+                    state.session_timestamp,
+                    state.qa_pairs,
+                    final_emotion,
+                    final_confidence,
+                    len(state.qa_pairs),
+                    sum(1 for qa in state.qa_pairs if qa.is_direct),
+                    state.emotion_trajectory,
                 ),
                 daemon=True,
             )
             upload_thread.start()
-            print(f"[WEBSOCKET] Started background upload for session: {session_id}")
+            print(
+                f"[WEBSOCKET] Started background upload for session: {state.session_id}"
+            )
         else:
             print("[WEBSOCKET] No QA pairs to upload")
@@ -0,0 +1,67 @@
+import os
+from collections.abc import Iterable
+
+from app.models import AnswerSegment, QAEmotionPair
+
+# session audio is 16kHz mono LINEAR16
+PCM_SAMPLE_RATE = 16000
+PCM_SAMPLE_WIDTH = 2
+PCM_BYTES_PER_SECOND = PCM_SAMPLE_RATE * PCM_SAMPLE_WIDTH
+# audio kept on both sides of the spoken words so the first and last word aren't clipped
+SEGMENT_PADDING_SECS = float(os.getenv("SEGMENT_PADDING_SECS", "0.25"))
+
+
+# helper to convert seconds of audio to a sample aligned byte offset
+def secs_to_bytes(secs: float) -> int:
+    return round(secs * PCM_SAMPLE_RATE) * PCM_SAMPLE_WIDTH
+
+
+# first and last spoken word of a committed transcript, None without timestamps
+def spoken_span(words: Iterable[dict]) -> tuple[float, float] | None:
+    starts, ends = [], []
+    for word in words:
+        if word.get("type", "word") != "word":
+            continue
+        start, end = word.get("start"), word.get("end")
+        if not isinstance(start, int | float) or not isinstance(end, int | float):
+            continue
+        starts.append(start)
+        ends.append(end)
+    if not starts:
+        return None
+    return max(min(starts), 0.0), max(max(ends), min(starts))
+
+
+# maps word timestamps of an answer to its place in the session audio archive
+# stream_offset is where the STT stream started in the archive
+def answer_segment(
+    words: Iterable[dict],
+    stream_offset: int | None,
+    archive_length: int | None = None,
+    padding_secs: float = SEGMENT_PADDING_SECS,
+) -> AnswerSegment | None:
+    span = spoken_span(words)
+    if span is None or stream_offset is None:
+        return None
+    start_secs, end_secs = span
+    start_byte = max(stream_offset + secs_to_bytes(start_secs - padding_secs), 0)
+    end_byte = stream_offset + secs_to_bytes(end_secs + padding_secs)
+    if archive_length is not None:
+        end_byte = min(end_byte, archive_length)
+    if end_byte <= start_byte:
+        return None
+    return AnswerSegment(
+        start_byte=start_byte,
+        end_byte=end_byte,
+        start_secs=round(start_byte / PCM_BYTES_PER_SECOND, 3),
+        end_secs=round(end_byte / PCM_BYTES_PER_SECOND, 3),
+    )
+
+
+# index stored next to the archive, one entry per answer that has audio
+def segment_index(qa_pairs: list[QAEmotionPair]) -> list[dict]:
+    return [
+        {"turn": turn, **qa.audio_segment.model_dump()}
+        for turn, qa in enumerate(qa_pairs)
+        if qa.audio_segment is not None
+    ]
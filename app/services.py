@@ -1,12 +1,14 @@
 import io
+import json
 import os
-from datetime import datetime
+from datetime import UTC, datetime
 
 from fastapi import HTTPException
 from pydub import AudioSegment
 
 from app.deps import get_firestore_client, get_storage_client
 from app.models import AgentSession, QAEmotionPair
+from app.segments import PCM_SAMPLE_RATE, segment_index
 
 
 # Background upload of agent session data and audio
@@ -19,6 +21,7 @@ def upload_session_in_background(
     final_confidence: float,
     total_question_count: int,
     direct_question_count: int,
+    emotion_trajectory: list[dict[str, float]],
 ):
     try:
         if not audio_bytes:
@@ -29,6 +32,10 @@ def upload_session_in_background(
         audio_url = upload_agent_audio_to_bucket(
             bytes(audio_bytes), session_id, session_timestamp
         )
+        # each answer on its own so tools can fetch one without the whole archive
+        upload_answer_segments_to_bucket(
+            bytes(audio_bytes), session_id, session_timestamp, qa_pairs_with_emotions
+        )
 
         # create session object
         session = AgentSession(
@@ -40,6 +47,9 @@ def upload_session_in_background(
             total_question_count=total_question_count,
             direct_question_count=direct_question_count,
             audio_url=audio_url,
+            emotion_trajectory=emotion_trajectory,
+            emotion_distribution=emotion_trajectory[-1] if emotion_trajectory else None,
+            updated_at=datetime.now(UTC),
         )
 
         # upload session to Firestore
@@ -53,7 +63,10 @@ def upload_session_in_background(
 def upload_agent_session(session: AgentSession):
     try:
         doc_ref = get_firestore_client().collection("sessions")
-        write_res = doc_ref.document(session.session_id).set(session.model_dump())
+        write_res = doc_ref.document(session.session_id).set(
+            # emotion breakdowns are stored as packed float32 bytes
+            session.model_dump(context={"emotion_vector": "bytes"})
+        )
 
         if not write_res.update_time:
             raise HTTPException(
@@ -98,3 +111,43 @@ def upload_agent_audio_to_bucket(
         raise HTTPException(status_code=400, detail=f"Failed to upload to Bucket: {e}")
 
     return f"{os.getenv('BUCKET_URL')}agent/{filename}.flac"
+
+
+# Upload each answer as its own audio file plus a byte offset index of the archive
+def upload_answer_segments_to_bucket(
+    audio_bytes: bytes,
+    session_id: str,
+    timestamp: str,
+    qa_pairs: list[QAEmotionPair],
+):
+    bucket = get_storage_client().bucket(os.getenv("BUCKET_NAME"))
+    filename = f"{session_id}_{timestamp}"
+
+    for turn, qa in enumerate(qa_pairs):
+        segment = qa.audio_segment
+        if segment is None or segment.end_byte > len(audio_bytes):
+            continue
+        blob_name = f"{filename}/answer_{turn}.flac"
+        try:
+            flac_bytes = linear_16_to_flac(
+                audio_bytes[segment.start_byte : segment.end_byte]
+            )
+            bucket.blob(f"audio/agent/{blob_name}").upload_from_string(
+                flac_bytes, content_type="audio/flac"
+            )
+            segment.audio_url = f"{os.getenv('BUCKET_URL')}agent/{blob_name}"
+        except Exception as e:
+            # the archive and the offsets in the index still locate the answer
+            print(f"[BUCKET] Error uploading answer {turn} audio: {e}")
+
+    index = segment_index(qa_pairs)
+    if not index:
+        return
+    try:
+        bucket.blob(f"audio/agent/{filename}.index.json").upload_from_string(
+            json.dumps({"sample_rate": PCM_SAMPLE_RATE, "segments": index}),
+            content_type="application/json",
+        )
+        print(f"[BUCKET] Uploaded index of {len(index)} answer segments: {filename}")
+    except Exception as e:
+        print(f"[BUCKET] Error uploading answer index: {e}")
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import UTC, datetime
+from typing import Optional
+
+from google.cloud.firestore import Query
+
+from app.models import AgentSession, QAEmotionPair
+
+SESSIONS_COLLECTION = "sessions"
+
+# fields a session list returns unless others are asked for, no transcripts
+SUMMARY_FIELDS = [
+    "session_id",
+    "created_at",
+    "updated_at",
+    "final_emotion",
+    "final_confidence",
+    "total_question_count",
+    "direct_question_count",
+    "emotion_distribution",
+]
+SESSION_FIELDS = set(AgentSession.model_fields)
+DEFAULT_LIST_LIMIT = 20
+MAX_LIST_LIMIT = 100
+DEFAULT_TURNS_LIMIT = 50
+# recently read sessions kept per worker, resumed sessions rewrite their
+# document so entries expire
+SESSION_HISTORY_CACHE_SIZE = int(os.getenv("SESSION_HISTORY_CACHE_SIZE", "200"))
+SESSION_HISTORY_CACHE_TTL_SECS = float(
+    os.getenv("SESSION_HISTORY_CACHE_TTL_SECS", "60")
+)
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+# requested fields from a comma separated list, summary fields by default
+def parse_fields(fields: str | None) -> list[str]:
+    if not fields:
+        return list(SUMMARY_FIELDS)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in SESSION_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    # the id always comes back so clients can fetch the full session
+    return ["session_id"] + [field for field in requested if field != "session_id"]
+
+
+# JSON-ready turns of a stored session, emotion breakdowns are stored as bytes
+def session_turns(document: dict) -> list[dict]:
+    return [
+        QAEmotionPair.model_validate(pair).model_dump(mode="json")
+        for pair in document.get("qa_pairs") or []
+    ]
+
+
+# sort key of a document, naive timestamps were written as UTC
+def created_at(document: dict) -> datetime:
+    value = document["created_at"]
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo is not None else value.replace(tzinfo=UTC)
+
+
+def project(document: dict, fields: list[str]) -> dict:
+    view = {field: document.get(field) for field in fields}
+    if "qa_pairs" in view:
+        view["qa_pairs"] = session_turns(document)
+    return view
+
+
+# read access to stored sessions, newest first
+class SessionHistory(ABC):
+    # one page of sessions with only the given fields, and the cursor of the
+    # next page, None on the last one
+    @abstractmethod
+    async def list_sessions(
+        self, limit: int, cursor: str | None, fields: list[str]
+    ) -> tuple[list[dict], str | None]: ...
+
+    # the whole stored document
+    @abstractmethod
+    async def get_session(self, session_id: str) -> Optional[dict]: ...
+
+
+# sessions held in the worker, e.g. loaded from an export
+class InMemorySessionHistory(SessionHistory):
+    def __init__(self, documents: list[dict] | None = None):
+        self._documents: dict[str, dict] = {}
+        for document in documents or []:
+            self.add(document)
+
+    def add(self, document: dict):
+        self._documents[document["session_id"]] = document
+
+    async def list_sessions(
+        self, limit: int, cursor: str | None, fields: list[str]
+    ) -> tuple[list[dict], str | None]:
+        documents = sorted(
+            self._documents.values(),
+            key=lambda d: (created_at(d), d["session_id"]),
+            reverse=True,
+        )
+        start = 0
+        if cursor is not None:
+            ids = [d["session_id"] for d in documents]
+            if cursor not in ids:
+                raise InvalidCursor(cursor)
+            start = ids.index(cursor) + 1
+        page = documents[start : start + limit]
+        next_cursor = page[-1]["session_id"] if start + limit < len(documents) else None
+        return [project(d, fields) for d in page], next_cursor
+
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        return self._documents.get(session_id)
+
+
+# sessions in Firestore, projections are applied by the query so list pages
+# don't download transcripts, the sync client runs in a thread
+class FirestoreSessionHistory(SessionHistory):
+    def __init__(self, client, collection: str = SESSIONS_COLLECTION):
+        self.client = client
+        self.collection = collection
+
+    async def list_sessions(
+        self, limit: int, cursor: str | None, fields: list[str]
+    ) -> tuple[list[dict], str | None]:
+        return await asyncio.to_thread(self._list_sessions, limit, cursor, fields)
+
+    def _list_sessions(
+        self, limit: int, cursor: str | None, fields: list[str]
+    ) -> tuple[list[dict], str | None]:
+        sessions = self.client.collection(self.collection)
+        query = (
+            sessions.order_by("created_at", direction=Query.DESCENDING)
+            .select(fields)
+            # one extra document tells whether there is a next page
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            # the cursor is the last session id of the previous page
+            last = sessions.document(cursor).get(field_paths=["created_at"])
+            if not last.exists:
+                raise InvalidCursor(cursor)
+            query = query.start_after(last)
+        snapshots = list(query.stream())
+        page = snapshots[:limit]
+        next_cursor = page[-1].id if len(snapshots) > limit else None
+        return [
+            project({**snapshot.to_dict(), "session_id": snapshot.id}, fields)
+            for snapshot in page
+        ], next_cursor
+
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        document = self.client.collection(self.collection).document(session_id)
+        snapshot = await asyncio.to_thread(document.get)
+        return snapshot.to_dict() if snapshot.exists else None
+
+
+# LRU cache with a TTL for single sessions, so paging through a session's
+# turns reads its document once, list pages always go to the store
+class CachedSessionHistory(SessionHistory):
+    def __init__(
+        self,
+        store: SessionHistory,
+        max_size: int = SESSION_HISTORY_CACHE_SIZE,
+        ttl_secs: float = SESSION_HISTORY_CACHE_TTL_SECS,
+    ):
+        self.store = store
+        self.max_size = max_size
+        self.ttl_secs = ttl_secs
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    async def list_sessions(
+        self, limit: int, cursor: str | None, fields: list[str]
+    ) -> tuple[list[dict], str | None]:
+        return await self.store.list_sessions(limit, cursor, fields)
+
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        entry = self._entries.get(session_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        document = await self.store.get_session(session_id)
+        # unknown ids aren't cached, the session may still be uploading
+        if document is not None:
+            self._entries[session_id] = (time.monotonic() + self.ttl_secs, document)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return document
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "cached": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def create_session_history(firestore_client=None) -> SessionHistory:
+    if firestore_client is not None:
+        print("[SESSION_HISTORY] Using Firestore session history")
+        store = FirestoreSessionHistory(firestore_client)
+    else:
+        print("[SESSION_HISTORY] Using in-memory session history")
+        store = InMemorySessionHistory()
+    return CachedSessionHistory(store)
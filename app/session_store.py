@@ -0,0 +1,127 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from redis import asyncio as aioredis
+
+from app.models import SessionState
+
+SESSION_STATE_TTL_SECS = int(os.getenv("SESSION_STATE_TTL_SECS", "3600"))
+SESSION_KEY_PREFIX = "session"
+
+
+# interface for conversation state shared between workers
+class SessionStore(ABC):
+    # persist a snapshot and append the audio received since the last one
+    @abstractmethod
+    async def save(self, state: SessionState, new_audio: bytes = b"") -> None: ...
+
+    @abstractmethod
+    async def load(self, session_id: str) -> Optional[SessionState]: ...
+
+    @abstractmethod
+    async def load_audio(self, session_id: str) -> bytes: ...
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> None: ...
+
+
+# single worker backend, state is lost on restart
+class InMemorySessionStore(SessionStore):
+    def __init__(self, ttl_secs: int = SESSION_STATE_TTL_SECS):
+        self.ttl_secs = ttl_secs
+        self._states: dict[str, tuple[float, str]] = {}
+        self._audio: dict[str, bytearray] = {}
+
+    def _expired(self, session_id: str) -> bool:
+        entry = self._states.get(session_id)
+        if entry is None:
+            return True
+        if entry[0] < time.monotonic():
+            self._states.pop(session_id, None)
+            self._audio.pop(session_id, None)
+            return True
+        return False
+
+    # drop every expired session, interrupted sessions are never loaded again
+    def sweep(self) -> int:
+        now = time.monotonic()
+        expired = [
+            sid for sid, (expires_at, _) in self._states.items() if expires_at < now
+        ]
+        for session_id in expired:
+            self._states.pop(session_id, None)
+            self._audio.pop(session_id, None)
+        return len(expired)
+
+    async def save(self, state: SessionState, new_audio: bytes = b"") -> None:
+        self.sweep()
+        expires_at = time.monotonic() + self.ttl_secs
+        self._states[state.session_id] = (expires_at, state.model_dump_json())
+        self._audio.setdefault(state.session_id, bytearray()).extend(new_audio)
+
+    async def load(self, session_id: str) -> Optional[SessionState]:
+        if self._expired(session_id):
+            return None
+        return SessionState.model_validate_json(self._states[session_id][1])
+
+    async def load_audio(self, session_id: str) -> bytes:
+        if self._expired(session_id):
+            return b""
+        return bytes(self._audio.get(session_id, b""))
+
+    async def delete(self, session_id: str) -> None:
+        self._states.pop(session_id, None)
+        self._audio.pop(session_id, None)
+
+
+# shared backend so any worker can resume a session
+class RedisSessionStore(SessionStore):
+    def __init__(self, client: aioredis.Redis, ttl_secs: int = SESSION_STATE_TTL_SECS):
+        self.client = client
+        self.ttl_secs = ttl_secs
+
+    @staticmethod
+    def _state_key(session_id: str) -> str:
+        return f"{SESSION_KEY_PREFIX}:{session_id}:state"
+
+    @staticmethod
+    def _audio_key(session_id: str) -> str:
+        return f"{SESSION_KEY_PREFIX}:{session_id}:audio"
+
+    async def save(self, state: SessionState, new_audio: bytes = b"") -> None:
+        state_key = self._state_key(state.session_id)
+        audio_key = self._audio_key(state.session_id)
+        # state and audio are written together so a resume never sees a torn snapshot
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(state_key, state.model_dump_json(), ex=self.ttl_secs)
+            if new_audio:
+                pipe.append(audio_key, new_audio)
+            pipe.expire(audio_key, self.ttl_secs)
+            await pipe.execute()
+
+    async def load(self, session_id: str) -> Optional[SessionState]:
+        raw = await self.client.get(self._state_key(session_id))
+        if raw is None:
+            return None
+        return SessionState.model_validate_json(raw)
+
+    async def load_audio(self, session_id: str) -> bytes:
+        raw = await self.client.get(self._audio_key(session_id))
+        return bytes(raw) if raw else b""
+
+    async def delete(self, session_id: str) -> None:
+        await self.client.delete(
+            self._state_key(session_id), self._audio_key(session_id)
+        )
+
+
+# pick backend from env, redis when REDIS_URL is set
+def create_session_store() -> SessionStore:
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        print("[SESSION_STORE] Using Redis session store")
+        return RedisSessionStore(aioredis.from_url(redis_url))
+    print("[SESSION_STORE] Using in-memory session store")
+    return InMemorySessionStore()
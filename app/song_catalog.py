@@ -0,0 +1,145 @@
+import json
+import os
+from functools import cache
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from app.emotions import EMOTION_INDEX, EMOTIONS
+from app.models import UserProfile
+
+# tracks with genre tags and the emotions each one suits, weights over EMOTIONS
+SONG_CATALOG_PATH = Path(
+    os.getenv("SONG_CATALOG_PATH", Path(__file__).parent / "data" / "song_catalog.json")
+)
+# ranked songs the music agent chooses from
+SONG_CANDIDATES = int(os.getenv("SONG_CANDIDATES", "5"))
+# skip the music agent and play the best ranked song
+MUSIC_FAST_MODE = os.getenv("MUSIC_FAST_MODE", "false").lower() == "true"
+# int8 emotion profiles, a quarter of the float32 index for large catalogs
+SONG_CATALOG_QUANTIZED = os.getenv("SONG_CATALOG_QUANTIZED", "false").lower() == "true"
+
+# score added on top of the cosine similarity for matching preferences
+GENRE_BONUS = 0.15
+ARTIST_BONUS = 0.25
+
+MUSIC_REQUEST = "play me some music"
+
+
+def is_music_request(user_input: str) -> bool:
+    return MUSIC_REQUEST in user_input.lower()
+
+
+class Song(NamedTuple):
+    title: str
+    artist: str
+    genres: tuple[str, ...]
+
+    @property
+    def label(self) -> str:
+        return f"{self.title} by {self.artist}"
+
+
+class SongCandidate(NamedTuple):
+    song: Song
+    score: float
+
+
+# nearest-neighbor index over the catalog's emotion profiles
+# rows are unit vectors so a single matrix-vector product gives cosine similarity
+class SongCatalog:
+    def __init__(
+        self, songs: list[Song], profiles: np.ndarray, quantized: bool = False
+    ):
+        self.songs = songs
+        profiles = np.asarray(profiles, dtype=np.float32)
+        norms = np.linalg.norm(profiles, axis=1, keepdims=True)
+        profiles = profiles / np.where(norms > 0, norms, 1.0)
+        self.quantized = quantized
+        if quantized:
+            # unit vectors only need a fixed scale
+            self.profiles = np.round(profiles * 127).astype(np.int8)
+            self.scale = np.float32(1 / 127)
+        else:
+            self.profiles = profiles
+            self.scale = np.float32(1.0)
+
+        self.genre_index = {
+            genre: i
+            for i, genre in enumerate(
+                sorted({g for song in songs for g in song.genres})
+            )
+        }
+        self.genre_matrix = np.zeros((len(songs), len(self.genre_index)), dtype=bool)
+        for row, song in enumerate(songs):
+            for genre in song.genres:
+                self.genre_matrix[row, self.genre_index[genre]] = True
+        self.artists = np.array([song.artist.lower() for song in songs])
+
+    @classmethod
+    def from_entries(cls, entries: list[dict], quantized: bool = False):
+        songs = []
+        profiles = np.zeros((len(entries), len(EMOTIONS)), dtype=np.float32)
+        for row, entry in enumerate(entries):
+            songs.append(
+                Song(
+                    title=entry["title"],
+                    artist=entry["artist"],
+                    genres=tuple(genre.lower() for genre in entry.get("genres", [])),
+                )
+            )
+            for emotion, weight in entry.get("emotions", {}).items():
+                index = EMOTION_INDEX.get(emotion.lower())
+                if index is not None:
+                    profiles[row, index] = weight
+        return cls(songs, profiles, quantized)
+
+    @classmethod
+    def from_file(cls, path: Path = SONG_CATALOG_PATH, quantized: bool = False):
+        with path.open(encoding="utf-8") as f:
+            return cls.from_entries(json.load(f), quantized)
+
+    def __len__(self) -> int:
+        return len(self.songs)
+
+    # best songs for a session emotion distribution over EMOTIONS and the
+    # user's preferences, highest score first
+    def candidates(
+        self,
+        distribution: np.ndarray,
+        profile: UserProfile | None = None,
+        k: int = SONG_CANDIDATES,
+    ) -> list[SongCandidate]:
+        if not self.songs or k <= 0:
+            return []
+        query = np.asarray(distribution, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        scores = (self.profiles @ query) * self.scale
+
+        if profile is not None:
+            genres = [
+                self.genre_index[genre.lower()]
+                for genre in profile.music_genres
+                if genre.lower() in self.genre_index
+            ]
+            if genres:
+                scores += GENRE_BONUS * self.genre_matrix[:, genres].any(axis=1)
+            if profile.favorite_artists:
+                artists = [artist.lower() for artist in profile.favorite_artists]
+                scores += ARTIST_BONUS * np.isin(self.artists, artists)
+
+        k = min(k, len(self.songs))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [SongCandidate(self.songs[i], round(float(scores[i]), 3)) for i in top]
+
+
+# loaded once per worker, the catalog is read-only
+@cache
+def get_song_catalog() -> SongCatalog:
+    catalog = SongCatalog.from_file(quantized=SONG_CATALOG_QUANTIZED)
+    print(f"[SONG_CATALOG] Loaded {len(catalog)} songs from {SONG_CATALOG_PATH}")
+    return catalog
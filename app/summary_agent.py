@@ -0,0 +1,42 @@
+from agents import Agent, Runner
+
+from app.context import qa_pairs_json
+from app.models import QAEmotionPair
+
+instructions = """
+    You summarize the earlier part of an emotional support conversation.
+    The summary replaces those turns in the context of the conversation agent,
+    so keep everything it needs to ask good follow-up questions.
+
+    KEEP:
+    - What the user talked about: situations, people, causes of their feelings
+    - How their emotions changed over the turns
+    - Topics the user avoided or asked not to talk about
+    - Which direct emotion questions were already asked
+
+    RULES:
+    - Extend the previous summary if there is one, don't repeat it word for word
+    - At most 120 words, plain sentences, no lists
+    - Never invent details that are not in the turns
+"""
+
+summary_agent = Agent(
+    name="Summary Agent",
+    instructions=instructions,
+    model="gpt-5-mini",
+)
+
+
+# new running summary from the previous one and the turns being folded
+async def summarize_turns(
+    previous_summary: str | None, qa_pairs: list[QAEmotionPair]
+) -> str:
+    prompt = f"""
+        Previous summary:
+        {previous_summary or "None"}
+
+        Turns to add:
+        {qa_pairs_json(qa_pairs)}
+    """
+    result = await Runner.run(summary_agent, prompt)
+    return str(result.final_output).strip()
@@ -0,0 +1,155 @@
+import base64
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+# set to record every session to <TRACE_DIR>/<session_id>.trace.jsonl.gz
+TRACE_DIR = os.getenv("TRACE_DIR")
+TRACE_VERSION = 1
+
+# outbound messages the replayer orders client messages against,
+# streamed deltas, transcripts and audio chunks vary in count between runs
+NON_MILESTONE_TYPES = {"agent_stream_delta", "transcript", "question_audio_base_64"}
+
+# recorder of the session running in the current task, None when not tracing
+current_trace: ContextVar["TraceRecorder | None"] = ContextVar(
+    "current_trace", default=None
+)
+
+
+# timestamped session events: client input, provider output and stage spans
+# event kinds:
+#   open      query params of the websocket
+#   in        client message, after = milestones sent before it arrived
+#   out       milestone message sent to the client
+#   stt       realtime STT event of STT session n
+#   agent     stream event of agent run n
+#   tts       audio chunk of TTS call n
+#   span      duration of a stage (stt, agent, agent_first_token, tts, ...)
+class TraceRecorder:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.events: list[dict] = []
+        self.milestones = 0
+        self.on_milestone: Callable[[], None] | None = None
+        self._counters: dict[str, int] = defaultdict(int)
+
+    def now(self) -> float:
+        return round(time.monotonic() - self.started, 4)
+
+    def record(self, kind: str, **data):
+        self.events.append({"t": self.now(), "kind": kind, **data})
+
+    # numbers the STT sessions, agent runs and TTS calls of the session
+    def next_index(self, kind: str) -> int:
+        index = self._counters[kind]
+        self._counters[kind] += 1
+        return index
+
+    def record_inbound(self, message: dict):
+        if message["type"] == "websocket.disconnect":
+            self.record("in", after=self.milestones, disconnect=True)
+        elif message.get("text") is not None:
+            self.record("in", after=self.milestones, text=message["text"])
+        elif message.get("bytes") is not None:
+            self.record("in", after=self.milestones, b64=encode(message["bytes"]))
+
+    def record_outbound(self, payload: dict):
+        if payload.get("type") in NON_MILESTONE_TYPES:
+            return
+        self.milestones += 1
+        self.record("out", type=payload.get("type"))
+        if self.on_milestone:
+            self.on_milestone()
+
+    def record_span(self, stage: str, start: float):
+        self.record("span", stage=stage, start=start, secs=round(self.now() - start, 4))
+
+    @contextmanager
+    def span(self, stage: str):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.record_span(stage, start)
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"version": TRACE_VERSION}) + "\n")
+            for event in self.events:
+                f.write(json.dumps(event, separators=(",", ":")) + "\n")
+
+
+def encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode(data: str) -> bytes:
+    return base64.b64decode(data)
+
+
+def load_trace(path: Path) -> list[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != TRACE_VERSION:
+            raise ValueError(f"Unsupported trace version: {header.get('version')}")
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# recorder for a new session: the one a replay installed, a new one when
+# TRACE_DIR is set, otherwise None
+def start_trace() -> TraceRecorder | None:
+    trace = current_trace.get()
+    if trace is None and TRACE_DIR:
+        trace = TraceRecorder()
+        current_trace.set(trace)
+    return trace
+
+
+# helper to time a stage when the session is traced
+@contextmanager
+def trace_span(stage: str):
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(stage):
+        yield
+
+
+def save_trace(trace: TraceRecorder | None, session_id: str):
+    if trace is None or not TRACE_DIR:
+        return
+    path = Path(TRACE_DIR) / f"{session_id}.trace.jsonl.gz"
+    try:
+        trace.save(path)
+        print(f"[TRACE] Saved {len(trace.events)} events to {path}")
+    except Exception as e:
+        print(f"[TRACE] Failed to save trace: {e}")
+
+
+# per-stage latency from the spans of a trace, in seconds
+def latency_breakdown(events: list[dict]) -> dict[str, dict[str, float]]:
+    durations: dict[str, list[float]] = defaultdict(list)
+    for event in events:
+        if event["kind"] == "span":
+            durations[event["stage"]].append(event["secs"])
+
+    breakdown = {}
+    for stage, secs in durations.items():
+        secs.sort()
+        breakdown[stage] = {
+            "count": len(secs),
+            "p50": round(secs[len(secs) // 2], 3),
+            "p95": round(secs[min(int(len(secs) * 0.95), len(secs) - 1)], 3),
+            "max": round(secs[-1], 3),
+            "total": round(sum(secs), 3),
+        }
+    return breakdown
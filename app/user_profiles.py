@@ -0,0 +1,128 @@
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Optional
+
+from app.models import UserProfile
+
+USER_PROFILES_COLLECTION = "user_profiles"
+# profiles kept per worker, a session reads its profile once at start
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "1000"))
+USER_PROFILE_CACHE_TTL_SECS = float(os.getenv("USER_PROFILE_CACHE_TTL_SECS", "300"))
+
+
+# interface for per-user preferences, keyed on the id the client sends
+class UserProfileStore(ABC):
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[UserProfile]: ...
+
+    @abstractmethod
+    async def save(self, profile: UserProfile) -> None: ...
+
+
+# single worker backend, profiles are lost on restart
+class InMemoryUserProfileStore(UserProfileStore):
+    def __init__(self):
+        self._profiles: dict[str, str] = {}
+
+    async def get(self, user_id: str) -> Optional[UserProfile]:
+        data = self._profiles.get(user_id)
+        return UserProfile.model_validate_json(data) if data else None
+
+    async def save(self, profile: UserProfile) -> None:
+        self._profiles[profile.user_id] = profile.model_dump_json()
+
+
+# profiles in Firestore next to the sessions, the sync client runs in a thread
+class FirestoreUserProfileStore(UserProfileStore):
+    def __init__(self, client, collection: str = USER_PROFILES_COLLECTION):
+        self.client = client
+        self.collection = collection
+
+    async def get(self, user_id: str) -> Optional[UserProfile]:
+        document = self.client.collection(self.collection).document(user_id)
+        snapshot = await asyncio.to_thread(document.get)
+        if not snapshot.exists:
+            return None
+        return UserProfile.model_validate({**snapshot.to_dict(), "user_id": user_id})
+
+    async def save(self, profile: UserProfile) -> None:
+        document = self.client.collection(self.collection).document(profile.user_id)
+        await asyncio.to_thread(document.set, profile.model_dump())
+
+
+# read-through LRU cache with a TTL, unknown users are cached too
+class CachedUserProfileStore(UserProfileStore):
+    def __init__(
+        self,
+        store: UserProfileStore,
+        max_size: int = USER_PROFILE_CACHE_SIZE,
+        ttl_secs: float = USER_PROFILE_CACHE_TTL_SECS,
+    ):
+        self.store = store
+        self.max_size = max_size
+        self.ttl_secs = ttl_secs
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, Optional[UserProfile]]] = (
+            OrderedDict()
+        )
+
+    async def get(self, user_id: str) -> Optional[UserProfile]:
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        profile = await self.store.get(user_id)
+        self._put(user_id, profile)
+        return profile
+
+    async def save(self, profile: UserProfile) -> None:
+        await self.store.save(profile)
+        self._put(profile.user_id, profile)
+
+    def _put(self, user_id: str, profile: Optional[UserProfile]):
+        self._entries[user_id] = (time.monotonic() + self.ttl_secs, profile)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "cached": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def create_user_profile_store(firestore_client=None) -> UserProfileStore:
+    if firestore_client is not None:
+        print("[USER_PROFILES] Using Firestore user profile store")
+        store = FirestoreUserProfileStore(firestore_client)
+    else:
+        print("[USER_PROFILES] Using in-memory user profile store")
+        store = InMemoryUserProfileStore()
+    return CachedUserProfileStore(store)
+
+
+# profile for a new session, the default one for anonymous users or when the
+# store is unavailable, a profile problem never blocks the conversation
+async def load_user_profile(
+    get_store: Callable[[], UserProfileStore], user_id: str | None
+) -> UserProfile:
+    if not user_id:
+        return UserProfile()
+    try:
+        profile = await get_store().get(user_id)
+    except Exception as e:
+        print(f"[USER_PROFILES] Failed to load profile {user_id}: {e}")
+        profile = None
+    return profile or UserProfile(user_id=user_id)
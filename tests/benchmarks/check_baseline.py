@@ -0,0 +1,23 @@
+import json
+import sys
+from pathlib import Path
+
+
+def benchmark_names(path: Path) -> set[str]:
+    return {b["fullname"] for b in json.loads(path.read_text())["benchmarks"]}
+
+
+# every benchmark of the base run must run again, a benchmark that gets skipped
+# (e.g. FLAC without ffmpeg) would silently drop out of the comparison
+def main():
+    base, head = (benchmark_names(Path(path)) for path in sys.argv[1:3])
+    for name in sorted(head - base):
+        print(f"[BENCHMARK] {name} is new, compared from the next run on")
+    missing = sorted(base - head)
+    for name in missing:
+        print(f"[BENCHMARK] {name} has a baseline but didn't run")
+    sys.exit(1 if missing else 0)
+
+
+if __name__ == "__main__":
+    main()
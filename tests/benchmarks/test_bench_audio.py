@@ -0,0 +1,45 @@
+import json
+import os
+import shutil
+
+import orjson
+import pytest
+
+from app.audio_utils import stt_audio_message, tts_audio_message
+from app.services import linear_16_to_flac
+
+pytest.importorskip("pytest_benchmark")
+
+# 100ms of 16kHz LINEAR16, what the client sends per frame
+PCM_FRAME = bytes(range(256)) * 12 + bytes(128)
+# one minute of session audio
+PCM_MINUTE = PCM_FRAME * 600
+# a typical mp3_22050_32 chunk from the TTS stream
+MP3_CHUNK = bytes(range(256)) * 16
+
+
+class TestAudioFramingBenchmarks:
+    """Per-chunk cost of the base64 + JSON framing on both audio paths"""
+
+    def test_stt_frame(self, benchmark):
+        """Benchmark framing one uplink frame for the STT socket"""
+        message = benchmark(lambda: json.dumps(stt_audio_message(PCM_FRAME)))
+        assert len(message) > len(PCM_FRAME)
+
+    def test_tts_chunk(self, benchmark):
+        """Benchmark framing one TTS chunk for the client"""
+        message = benchmark(lambda: orjson.dumps(tts_audio_message(MP3_CHUNK)))
+        assert message.startswith(b'{"type":"question_audio_base_64"')
+
+
+# the CI benchmark job installs ffmpeg, there a missing one fails the run
+@pytest.mark.skipif(
+    shutil.which("ffmpeg") is None and not os.getenv("BENCHMARK_REQUIRE_FFMPEG"),
+    reason="ffmpeg not installed",
+)
+class TestFlacBenchmarks:
+    """Archive encoding done once per session upload"""
+
+    def test_minute_to_flac(self, benchmark):
+        """Benchmark encoding a minute of session audio"""
+        assert benchmark(linear_16_to_flac, PCM_MINUTE)
@@ -0,0 +1,38 @@
+import pytest
+
+from app.context import build_agent_prompt, qa_pairs_json
+from app.models import QAEmotionPair, SessionState
+
+pytest.importorskip("pytest_benchmark")
+
+
+def make_state(turns: int) -> SessionState:
+    return SessionState(
+        session_id="bench",
+        session_timestamp="2025-01-01T00:00:00",
+        qa_pairs=[
+            QAEmotionPair(
+                question=f"Question {i}: how did that make you feel?",
+                answer=f"Answer {i}: honestly a bit tired and stressed about work.",
+                emotion="Stressed",
+                confidence=0.7,
+                negative_emotion_percentages={"Stressed": 60.0, "Tired": 40.0},
+            )
+            for i in range(turns)
+        ],
+    )
+
+
+class TestContextBenchmarks:
+    """Prompt context built before every agent run"""
+
+    @pytest.mark.parametrize("turns", [5, 20])
+    def test_qa_pairs_json(self, benchmark, turns):
+        """Benchmark serializing the Q&A history"""
+        state = make_state(turns)
+        assert benchmark(qa_pairs_json, state.qa_pairs).startswith("[")
+
+    def test_agent_prompt(self, benchmark):
+        """Benchmark building the full main agent prompt"""
+        state = make_state(5)
+        assert "I feel fine" in benchmark(build_agent_prompt, "I feel fine", state)
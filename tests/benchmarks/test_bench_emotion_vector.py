@@ -0,0 +1,41 @@
+import pytest
+
+from app.emotions import EmotionVector
+from app.models import QAEmotionPair
+
+pytest.importorskip("pytest_benchmark")
+
+# one turn as the conversation agent returns it
+TURN = {
+    "question": "How has your week been?",
+    "answer": "Pretty stressful, work has been a lot and I can't sleep.",
+    "emotion": "Stressed",
+    "confidence": 0.82,
+    "negative_emotion_percentages": {"stress": 55.0, "Anxious": 30.0, "Sad": 15.0},
+    "is_direct": False,
+}
+
+
+class TestEmotionVectorBenchmarks:
+    """Per-turn validation and serialization cost of the emotion breakdown"""
+
+    def test_validate_turn(self, benchmark):
+        """Benchmark validating one agent turn into a QAEmotionPair"""
+        pair = benchmark(QAEmotionPair.model_validate, TURN)
+        assert pair.negative_emotion_percentages is not None
+
+    def test_dump_turn_json(self, benchmark):
+        """Benchmark the websocket / session snapshot JSON form"""
+        pair = QAEmotionPair.model_validate(TURN)
+        assert benchmark(pair.model_dump_json)
+
+    def test_dump_turn_storage(self, benchmark):
+        """Benchmark the packed form written to Firestore"""
+        pair = QAEmotionPair.model_validate(TURN)
+        dumped = benchmark(pair.model_dump, context={"emotion_vector": "bytes"})
+        assert len(dumped["negative_emotion_percentages"]) == 32
+
+    def test_bytes_round_trip(self, benchmark):
+        """Benchmark decoding and re-encoding the packed vector"""
+        data = EmotionVector.from_dict(TURN["negative_emotion_percentages"]).to_bytes()
+        assert benchmark(lambda: EmotionVector.from_bytes(data).to_bytes()) == data
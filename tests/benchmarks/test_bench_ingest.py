@@ -0,0 +1,64 @@
+import asyncio
+import contextlib
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+from app.audio_utils import PcmDecoder
+from app.events import SessionEventBus
+from app.routes.routes_ws import receive_audio
+
+pytest.importorskip("pytest_benchmark")
+
+# 100ms of 16kHz LINEAR16 per frame, ten seconds of speech
+PCM_FRAME = bytes(3200)
+FRAMES = 100
+
+
+# replays client messages, interleaving playhead reports with audio like the client does
+class FakeWebSocket:
+    def __init__(self, frames: int):
+        self.messages = []
+        for i in range(frames):
+            self.messages.append({"type": "websocket.receive", "bytes": PCM_FRAME})
+            if i % 10 == 0:
+                self.messages.append(
+                    {
+                        "type": "websocket.receive",
+                        "text": f'{{"type": "playback_progress", "position": {i / 10}}}',
+                    }
+                )
+        self.messages.append({"type": "websocket.disconnect"})
+        self._position = 0
+
+    async def receive(self):
+        message = self.messages[self._position]
+        self._position += 1
+        return message
+
+
+async def ingest(frames: int) -> bytearray:
+    audio_bytes = bytearray()
+    # the disconnect at the end ends the session
+    with contextlib.suppress(WebSocketDisconnect):
+        await receive_audio(
+            FakeWebSocket(frames),
+            asyncio.Queue(),
+            audio_bytes,
+            SessionEventBus(),
+            PcmDecoder(),
+        )
+    return audio_bytes
+
+
+class TestIngestBenchmarks:
+    """Uplink path from websocket message to archive and STT queue"""
+
+    def test_receive_audio(self, benchmark):
+        """Benchmark ingesting ten seconds of audio frames"""
+        loop = asyncio.new_event_loop()
+        try:
+            audio_bytes = benchmark(lambda: loop.run_until_complete(ingest(FRAMES)))
+        finally:
+            loop.close()
+        assert len(audio_bytes) == FRAMES * len(PCM_FRAME)
@@ -0,0 +1,47 @@
+import pytest
+
+from app.models import AgentSession
+
+pytest.importorskip("pytest_benchmark")
+
+TURN = {
+    "question": "How has your week been?",
+    "answer": "Pretty stressful, work has been a lot and I can't sleep.",
+    "emotion": "Stressed",
+    "confidence": 0.82,
+    "negative_emotion_percentages": {"Stressed": 55.0, "Anxious": 30.0, "Sad": 15.0},
+    "is_direct": False,
+}
+
+# a finished session as it is uploaded
+SESSION = {
+    "session_id": "bench",
+    "created_at": "2025-01-01T00:00:00",
+    "qa_pairs": [TURN] * 10,
+    "final_emotion": "Stressed",
+    "final_confidence": 0.8,
+    "total_question_count": 10,
+    "direct_question_count": 2,
+    "audio_url": "https://storage.example/agent/bench.flac",
+    "emotion_trajectory": [{"Stressed": 0.6, "Calm": 0.4}] * 10,
+}
+
+
+class TestAgentSessionBenchmarks:
+    """Validation and serialization of the uploaded session document"""
+
+    def test_validate(self, benchmark):
+        """Benchmark validating a ten turn session"""
+        session = benchmark(AgentSession.model_validate, SESSION)
+        assert len(session.qa_pairs) == 10
+
+    def test_dump_storage(self, benchmark):
+        """Benchmark the packed form written to Firestore"""
+        session = AgentSession.model_validate(SESSION)
+        dumped = benchmark(session.model_dump, context={"emotion_vector": "bytes"})
+        assert len(dumped["qa_pairs"]) == 10
+
+    def test_dump_json(self, benchmark):
+        """Benchmark the JSON form used by exports"""
+        session = AgentSession.model_validate(SESSION)
+        assert benchmark(session.model_dump_json)
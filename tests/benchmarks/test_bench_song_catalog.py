@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from app.emotions import EMOTIONS
+from app.models import UserProfile
+from app.song_catalog import SongCatalog
+
+pytest.importorskip("pytest_benchmark")
+
+
+# synthetic catalog far larger than the bundled one
+def make_catalog(size: int, quantized: bool) -> SongCatalog:
+    rng = np.random.default_rng(0)
+    entries = [
+        {
+            "title": f"Song {i}",
+            "artist": f"Artist {i % 500}",
+            "genres": [["metal", "rock", "pop", "jazz"][i % 4]],
+            "emotions": dict(zip(EMOTIONS, rng.random(len(EMOTIONS)).tolist())),
+        }
+        for i in range(size)
+    ]
+    return SongCatalog.from_entries(entries, quantized)
+
+
+class TestSongCatalogBenchmarks:
+    """Song ranking on music turns"""
+
+    @pytest.mark.parametrize("quantized", [False, True])
+    def test_candidates(self, benchmark, quantized):
+        """Benchmark ranking 10k songs for a session"""
+        catalog = make_catalog(10_000, quantized)
+        query = np.random.default_rng(1).random(len(EMOTIONS))
+        profile = UserProfile(favorite_artists=["Artist 7"])
+        assert len(benchmark(catalog.candidates, query, profile)) == 5
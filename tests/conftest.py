@@ -0,0 +1,4 @@
+import os
+
+# the websocket route is registered at import, the real path comes from .env
+os.environ.setdefault("AGENT_URL", "/agent")
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmissionController:
+    """Test session admission and provider slots"""
+
+    def test_admits_up_to_limit_then_queues(self):
+        """Test a queued session is admitted when a slot is released"""
+
+        async def run():
+            admission = AdmissionController(max_active=1, max_waiting=1)
+            await admission.acquire()
+            positions = []
+
+            async def on_position(position, eta_secs):
+                positions.append((position, eta_secs))
+
+            waiter = asyncio.create_task(admission.acquire(on_position))
+            await asyncio.sleep(0)
+            assert admission.waiting == 1
+            admission.release()
+            await waiter
+            return admission, positions
+
+        admission, positions = asyncio.run(run())
+        assert admission.active == 1
+        assert admission.waiting == 0
+        assert positions[0][0] == 1
+
+    def test_rejects_when_queue_is_full(self):
+        """Test overload is rejected right away with a retry hint"""
+
+        async def run():
+            admission = AdmissionController(
+                max_active=1, max_waiting=0, expected_session_secs=30
+            )
+            await admission.acquire()
+            with pytest.raises(AdmissionRejected) as rejected:
+                await admission.acquire()
+            return admission, rejected.value
+
+        admission, rejected = asyncio.run(run())
+        assert rejected.reason == "queue_full"
+        assert rejected.retry_after == 30
+        assert admission.rejected == 1
+
+    def test_queue_timeout(self):
+        """Test a session that waits too long is rejected and leaves the queue"""
+
+        async def run():
+            admission = AdmissionController(
+                max_active=1, max_waiting=1, max_wait_secs=0.05
+            )
+            await admission.acquire()
+            with pytest.raises(AdmissionRejected) as rejected:
+                await admission.acquire()
+            return admission, rejected.value
+
+        admission, rejected = asyncio.run(run())
+        assert rejected.reason == "queue_timeout"
+        assert admission.waiting == 0
+        assert admission.active == 1
+
+    def test_release_updates_eta(self):
+        """Test observed session length feeds the ETA"""
+        admission = AdmissionController(max_active=2, expected_session_secs=100)
+        admission.active = 1
+        admission.release(session_secs=200)
+        assert admission.avg_session_secs == pytest.approx(120)
+        assert admission.eta(3) == pytest.approx(240)
+        assert admission.active == 0
+
+    def test_provider_slot_limits_concurrency(self):
+        """Test in-flight calls per provider never exceed the limit"""
+
+        async def run():
+            admission = AdmissionController(provider_limits={"tts": 2})
+            peak = 0
+
+            async def call():
+                nonlocal peak
+                async with admission.provider_slot("tts"):
+                    peak = max(peak, admission.stats()["provider_in_flight"]["tts"])
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(*(call() for _ in range(6)))
+            return peak, admission.stats()
+
+        peak, stats = asyncio.run(run())
+        assert peak == 2
+        assert stats["provider_in_flight"]["tts"] == 0
@@ -0,0 +1,177 @@
+import json
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from app.analytics_export import (
+    daily_sessions,
+    emotion_summary,
+    export_sessions,
+    flatten_sessions,
+    iter_json_sessions,
+    load_high_water_mark,
+    negative_emotion_means,
+    read_table,
+)
+
+
+def make_session(
+    session_id: str, created_at: str, updated_at: str | None = None
+) -> dict:
+    return {
+        "session_id": session_id,
+        "created_at": created_at,
+        "updated_at": updated_at,
+        "qa_pairs": [
+            {
+                "question": "How are you?",
+                "answer": "Stressed about work",
+                "emotion": "Stressed",
+                "confidence": 0.8,
+                "negative_emotion_percentages": {"Stressed": 75.0, "Anxious": 25.0},
+                "is_direct": False,
+                "timing": {"stt_commit_secs": 4.5, "run_secs": 2.0},
+            },
+            {
+                "question": "What helps?",
+                "answer": "Music",
+                "emotion": "Calm",
+                "confidence": 0.6,
+                "negative_emotion_percentages": None,
+                "is_direct": True,
+            },
+        ],
+        "final_emotion": "Calm",
+        "final_confidence": 0.6,
+        "total_question_count": 2,
+        "direct_question_count": 1,
+        "audio_url": f"https://example.com/{session_id}.flac",
+    }
+
+
+class TestFlattenSessions:
+    """Test flattening session documents into tables"""
+
+    def test_one_row_per_session_and_pair(self):
+        """Test sessions and QA pairs become separate tables"""
+        sessions, qa_pairs = flatten_sessions(
+            [make_session("a", "2025-01-01T10:00:00")]
+        )
+        assert sessions.num_rows == 1
+        assert sessions["qa_pair_count"].to_pylist() == [2]
+        assert qa_pairs.num_rows == 2
+        assert qa_pairs["turn_index"].to_pylist() == [0, 1]
+
+    def test_negative_emotion_columns(self):
+        """Test breakdown is spread over fixed columns"""
+        _, qa_pairs = flatten_sessions([make_session("a", "2025-01-01T10:00:00")])
+        assert qa_pairs["neg_stressed"].to_pylist() == [75.0, None]
+        assert qa_pairs["neg_anxious"].to_pylist() == [25.0, None]
+        assert qa_pairs["neg_sad"].to_pylist() == [0.0, None]
+
+    def test_timing_columns(self):
+        """Test turn timings become columns, null where not recorded"""
+        _, qa_pairs = flatten_sessions([make_session("a", "2025-01-01T10:00:00")])
+        assert qa_pairs["stt_commit_secs"].to_pylist() == [4.5, None]
+        assert qa_pairs["run_secs"].to_pylist() == [2.0, None]
+        assert qa_pairs["tts_first_byte_secs"].to_pylist() == [None, None]
+
+
+class TestExportSessions:
+    """Test incremental parquet export"""
+
+    def test_incremental_export(self, tmp_path):
+        """Test a second run only exports sessions after the high-water mark"""
+        dump = tmp_path / "sessions.json"
+        out = tmp_path / "out"
+        dump.write_text(
+            json.dumps(
+                [
+                    make_session("a", "2025-01-01T10:00:00"),
+                    make_session("b", "2025-01-02T10:00:00"),
+                ]
+            )
+        )
+
+        assert export_sessions(iter_json_sessions(dump, page_size=1), out) == 2
+        assert load_high_water_mark(out).isoformat() == "2025-01-02T10:00:00+00:00"
+
+        dump.write_text(
+            "\n".join(
+                json.dumps(s)
+                for s in [
+                    make_session("a", "2025-01-01T10:00:00"),
+                    make_session("b", "2025-01-02T10:00:00"),
+                    make_session("c", "2025-01-03T10:00:00"),
+                ]
+            )
+        )
+        since = load_high_water_mark(out)
+        assert export_sessions(iter_json_sessions(dump, since), out) == 1
+
+        sessions = read_table(out, "sessions")
+        assert sorted(sessions["session_id"].to_pylist()) == ["a", "b", "c"]
+        assert read_table(out, "qa_pairs").num_rows == 6
+
+    def test_out_of_order_uploads(self, tmp_path):
+        """Test a session uploaded after a later-starting one is still exported"""
+        dump = tmp_path / "sessions.jsonl"
+        out = tmp_path / "out"
+        # b started later but finished first
+        b = make_session("b", "2025-01-01T10:05:00", "2025-01-01T10:10:00")
+        dump.write_text(json.dumps(b))
+        assert export_sessions(iter_json_sessions(dump), out) == 1
+
+        a = make_session("a", "2025-01-01T10:00:00", "2025-01-01T10:20:00")
+        dump.write_text("\n".join(json.dumps(s) for s in [b, a]))
+        since = load_high_water_mark(out)
+        assert export_sessions(iter_json_sessions(dump, since), out) == 1
+        assert sorted(read_table(out, "sessions")["session_id"].to_pylist()) == [
+            "a",
+            "b",
+        ]
+
+    def test_rewritten_session_replaces_earlier_export(self, tmp_path):
+        """Test a resumed session is re-exported and read back once"""
+        dump = tmp_path / "sessions.jsonl"
+        out = tmp_path / "out"
+        first = make_session("a", "2025-01-01T10:00:00", "2025-01-01T10:05:00")
+        dump.write_text(json.dumps(first))
+        export_sessions(iter_json_sessions(dump), out)
+
+        resumed = make_session("a", "2025-01-01T10:00:00", "2025-01-01T10:30:00")
+        resumed["final_emotion"] = "Happy"
+        dump.write_text(json.dumps(resumed))
+        since = load_high_water_mark(out)
+        assert export_sessions(iter_json_sessions(dump, since), out) == 1
+
+        sessions = read_table(out, "sessions")
+        assert sessions["final_emotion"].to_pylist() == ["Happy"]
+        assert read_table(out, "qa_pairs").num_rows == 2
+
+    def test_aggregates(self, tmp_path):
+        """Test aggregate queries over exported tables"""
+        dump = tmp_path / "sessions.json"
+        out = tmp_path / "out"
+        dump.write_text(
+            json.dumps(
+                [
+                    make_session("a", "2025-01-01T10:00:00"),
+                    make_session("b", "2025-01-01T18:00:00"),
+                ]
+            )
+        )
+        export_sessions(iter_json_sessions(dump), out)
+        qa_pairs = read_table(out, "qa_pairs")
+
+        summary = emotion_summary(qa_pairs).to_pylist()
+        assert {row["emotion"]: row["turns"] for row in summary} == {
+            "Stressed": 2,
+            "Calm": 2,
+        }
+        assert negative_emotion_means(qa_pairs)["Stressed"] == pytest.approx(75.0)
+
+        daily = daily_sessions(read_table(out, "sessions")).to_pylist()
+        assert len(daily) == 1
+        assert daily[0]["sessions"] == 2
@@ -0,0 +1,93 @@
+import pytest
+
+from app.audio_utils import (
+    Mp3DurationCounter,
+    create_uplink_decoder,
+    opuslib,
+    parse_mp3_frame_header,
+)
+
+# MPEG 2 Layer III, no CRC, 32 kbit/s, 22050 Hz, mono (ElevenLabs mp3_22050_32)
+MP3_22050_32_HEADER = bytes([0xFF, 0xF3, 0x40, 0xC0])
+MP3_22050_32_FRAME_LENGTH = 104
+MP3_22050_32_FRAME_SECS = 576 / 22050
+
+
+def make_frames(count: int) -> bytes:
+    frame = MP3_22050_32_HEADER + bytes(MP3_22050_32_FRAME_LENGTH - 4)
+    return frame * count
+
+
+class TestParseMp3FrameHeader:
+    """Test MPEG audio frame header parsing"""
+
+    def test_mp3_22050_32(self):
+        """Test header of the TTS output format"""
+        assert parse_mp3_frame_header(MP3_22050_32_HEADER) == (104, 576, 22050)
+
+    def test_mpeg1_layer3_with_padding(self):
+        """Test MPEG 1 Layer III 128 kbit/s 44.1 kHz with padding bit"""
+        header = bytes([0xFF, 0xFB, 0x92, 0x64])
+        assert parse_mp3_frame_header(header) == (418, 1152, 44100)
+
+    def test_invalid_headers(self):
+        """Test data without a frame sync is rejected"""
+        assert parse_mp3_frame_header(b"\x00\x00\x00\x00") is None
+        assert parse_mp3_frame_header(b"\xff\xf3") is None
+        # free format bitrate
+        assert parse_mp3_frame_header(bytes([0xFF, 0xF3, 0x00, 0xC0])) is None
+
+
+class TestMp3DurationCounter:
+    """Test streaming mp3 duration counting"""
+
+    def test_whole_stream(self):
+        """Test duration of a stream fed in one chunk"""
+        counter = Mp3DurationCounter()
+        counter.feed(make_frames(100))
+        assert counter.frames == 100
+        assert counter.duration_secs == pytest.approx(100 * MP3_22050_32_FRAME_SECS)
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 50, 104, 1000])
+    def test_chunk_boundaries(self, chunk_size):
+        """Test frames split across chunks are counted once"""
+        data = make_frames(40)
+        counter = Mp3DurationCounter()
+        for i in range(0, len(data), chunk_size):
+            counter.feed(data[i : i + chunk_size])
+        assert counter.frames == 40
+
+    def test_skips_id3_tag_and_garbage(self):
+        """Test ID3v2 tag and junk bytes before the first frame are ignored"""
+        tag = b"ID3\x04\x00\x00\x00\x00\x00\x0a" + bytes(10)
+        counter = Mp3DurationCounter()
+        counter.feed(tag[:5])
+        counter.feed(tag[5:] + b"\x00\x01" + make_frames(3))
+        assert counter.frames == 3
+
+
+class TestUplinkDecoders:
+    """Test uplink codec negotiation and decoding"""
+
+    def test_pcm_passthrough(self):
+        """Test PCM frames are passed through unchanged"""
+        decoder = create_uplink_decoder("pcm")
+        assert decoder.codec == "pcm"
+        assert decoder.decode(b"\x01\x02\x03\x04") == b"\x01\x02\x03\x04"
+        assert decoder.bytes_in == decoder.bytes_out == 4
+
+    def test_unknown_codec_falls_back_to_pcm(self):
+        """Test unsupported codecs negotiate down to PCM"""
+        assert create_uplink_decoder("flac").codec == "pcm"
+        assert create_uplink_decoder(None).codec == "pcm"
+
+    @pytest.mark.skipif(opuslib is None, reason="libopus is not installed")
+    def test_opus_roundtrip(self):
+        """Test opus packets decode to 16 kHz LINEAR16"""
+        encoder = opuslib.Encoder(16000, 1, opuslib.APPLICATION_VOIP)
+        packet = encoder.encode(bytes(640), 320)
+
+        decoder = create_uplink_decoder("opus")
+        assert decoder.codec == "opus"
+        assert len(decoder.decode(packet)) == 640
+        assert decoder.bytes_in == len(packet)
@@ -0,0 +1,187 @@
+import asyncio
+
+from app.context import (
+    ContextCompactor,
+    build_agent_prompt,
+    emotion_stats,
+    folded_turns,
+)
+from app.models import QAEmotionPair, SessionState
+
+
+def make_state(turns: int, **kwargs) -> SessionState:
+    return SessionState(
+        session_id="s",
+        session_timestamp="2025-01-01T00:00:00",
+        qa_pairs=[
+            QAEmotionPair(
+                question=f"Question {i}, what has been on your mind lately?",
+                answer=f"Answer {i}, mostly work and not sleeping well at all.",
+                emotion="Stressed" if i % 2 else "Tired",
+                confidence=0.5,
+                is_direct=i == 0,
+            )
+            for i in range(turns)
+        ],
+        **kwargs,
+    )
+
+
+class TestPrompt:
+    """Test the bounded history in the agent prompt"""
+
+    def test_short_history_stays_verbatim(self):
+        """Test nothing is folded while under budget"""
+        state = make_state(3)
+        assert folded_turns(state, token_budget=1000) == 0
+        prompt = build_agent_prompt("hi", state)
+        assert "Earlier conversation" not in prompt
+        assert "Answer 0" in prompt
+
+    def test_long_history_keeps_recent_turns(self):
+        """Test only the recent turns stay verbatim without a summary"""
+        state = make_state(40)
+        assert folded_turns(state, token_budget=200, recent_turns=4) == 36
+
+    def test_summary_replaces_older_turns(self):
+        """Test summarized turns are left out of the verbatim history"""
+        state = make_state(40, context_summary="Work stress.", summarized_turns=36)
+        prompt = build_agent_prompt("hi", state)
+        assert "Earlier conversation (36 turns, summarized)" in prompt
+        assert "Work stress." in prompt
+        assert "Answer 35," not in prompt
+        assert "Answer 36," in prompt
+        assert "Questions asked so far: 40" in prompt
+
+    def test_prompt_size_is_capped(self):
+        """Test prompt size stops growing with the session length"""
+        short = build_agent_prompt("hi", make_state(50))
+        long = build_agent_prompt("hi", make_state(500))
+        assert len(long) - len(short) < 50
+
+    def test_emotion_stats(self):
+        """Test folded turns are aggregated"""
+        stats = emotion_stats(make_state(4).qa_pairs)
+        assert stats["turns"] == 4
+        assert stats["emotions"] == {"Tired": 2, "Stressed": 2}
+        assert stats["direct_questions"] == 1
+
+
+class TestContextCompactor:
+    """Test background summarization between turns"""
+
+    def test_summarizes_all_but_recent_turns(self):
+        """Test older turns are folded into the summary"""
+        calls = []
+
+        async def summarize(previous, qa_pairs):
+            calls.append((previous, len(qa_pairs)))
+            return "summary"
+
+        async def run():
+            state = make_state(10)
+            compactor = ContextCompactor(summarize, token_budget=100, recent_turns=4)
+            compactor.maybe_start(state)
+            await compactor.apply(state)
+            return state
+
+        state = asyncio.run(run())
+        assert calls == [(None, 6)]
+        assert state.context_summary == "summary"
+        assert state.summarized_turns == 6
+
+    def test_under_budget_does_nothing(self):
+        """Test short sessions never call the summarizer"""
+
+        async def summarize(previous, qa_pairs):
+            raise AssertionError("not expected")
+
+        async def run():
+            state = make_state(3)
+            compactor = ContextCompactor(summarize, token_budget=10_000)
+            compactor.maybe_start(state)
+            await compactor.apply(state)
+            return state
+
+        assert asyncio.run(run()).summarized_turns == 0
+
+    def test_slow_summary_does_not_block(self):
+        """Test the prompt is built without a summary that isn't ready"""
+
+        async def summarize(previous, qa_pairs):
+            await asyncio.sleep(10)
+
+        async def run():
+            state = make_state(10)
+            compactor = ContextCompactor(
+                summarize, token_budget=100, recent_turns=4, wait_secs=0.01
+            )
+            compactor.maybe_start(state)
+            await compactor.apply(state)
+            compactor.cancel()
+            return state
+
+        state = asyncio.run(run())
+        assert state.summarized_turns == 0
+        assert folded_turns(state, token_budget=100, recent_turns=4) == 6
+
+    def test_failed_summary_is_retried(self):
+        """Test a failed summary leaves the state alone and can start again"""
+        attempts = []
+
+        async def summarize(previous, qa_pairs):
+            attempts.append(len(qa_pairs))
+            raise RuntimeError("provider down")
+
+        async def run():
+            state = make_state(10)
+            compactor = ContextCompactor(summarize, token_budget=100, recent_turns=4)
+            compactor.maybe_start(state)
+            await compactor.apply(state)
+            compactor.maybe_start(state)
+            await compactor.apply(state)
+            return state
+
+        assert asyncio.run(run()).summarized_turns == 0
+        assert attempts == [6, 6]
+
+    def test_summary_ends_with_the_session_group(self):
+        """Test a failing summary doesn't fail the group and a pending one is cancelled"""
+        cancelled = asyncio.Event()
+
+        async def failing(previous, qa_pairs):
+            raise RuntimeError("provider down")
+
+        async def hanging(previous, qa_pairs):
+            try:
+                await asyncio.sleep(10)
+            finally:
+                cancelled.set()
+
+        async def run():
+            state = make_state(10)
+            async with asyncio.TaskGroup() as session_tasks:
+                compactor = ContextCompactor(
+                    failing, token_budget=100, recent_turns=4, task_group=session_tasks
+                )
+                compactor.maybe_start(state)
+                await compactor.apply(state)
+
+            try:
+                async with asyncio.TaskGroup() as session_tasks:
+                    compactor = ContextCompactor(
+                        hanging,
+                        token_budget=100,
+                        recent_turns=4,
+                        task_group=session_tasks,
+                    )
+                    compactor.maybe_start(state)
+                    await asyncio.sleep(0)
+                    # e.g. the client disconnecting
+                    raise ConnectionError
+            except* ConnectionError:
+                pass
+            return state
+
+        assert asyncio.run(run()).summarized_turns == 0
+        assert cancelled.is_set()
@@ -0,0 +1,111 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from app.deadlines import STAGE_DEADLINES_SECS, StageTimeout, stage_deadline
+from app.events import SessionEventBus, Transcript
+from app.models import TurnTiming
+
+
+# agent run that never produces an event
+class HangingRunResult:
+    def __init__(self):
+        self.cancelled = False
+        self.final_output = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    async def stream_events(self):
+        await asyncio.Event().wait()
+        yield
+
+
+class TestStageDeadline:
+    """Test per-stage deadlines"""
+
+    def test_stuck_stage_times_out(self):
+        """Test a stage past its deadline is cancelled with its name"""
+
+        async def stuck():
+            async with stage_deadline("stt", 0.01):
+                await asyncio.Event().wait()
+
+        with pytest.raises(StageTimeout) as raised:
+            asyncio.run(stuck())
+        assert raised.value.stage == "stt"
+
+    def test_inner_timeout_passes_through(self):
+        """Test a timeout raised inside the stage isn't blamed on the deadline"""
+
+        async def inner_timeout():
+            async with stage_deadline("stt", 10):
+                await asyncio.wait_for(asyncio.Event().wait(), 0.01)
+
+        with pytest.raises(TimeoutError):
+            asyncio.run(inner_timeout())
+
+    def test_agent_run_is_cancelled_at_deadline(self):
+        """Test a stuck LLM run is reaped and the SDK run cancelled"""
+        from app.routes import routes_ws
+
+        result = HangingRunResult()
+        outbound = SimpleNamespace(send=mock.AsyncMock())
+        with (
+            mock.patch.dict(STAGE_DEADLINES_SECS, {"llm": 0.05}),
+            mock.patch.object(
+                routes_ws, "Runner", SimpleNamespace(run_streamed=lambda *a: result)
+            ),
+            pytest.raises(StageTimeout),
+        ):
+            asyncio.run(routes_ws.run_main_agent("hi", outbound, TurnTiming()))
+        assert result.cancelled
+
+    def test_missed_stt_deadline_is_no_answer(self):
+        """Test a silent user gets an empty answer instead of an error"""
+        from app.routes import routes_ws
+
+        async def silent_stt(audio_queue, events, outbound, speech_detected):
+            await asyncio.Event().wait()
+
+        async def run():
+            return await routes_ws.listen_for_answer(
+                asyncio.Queue(), SessionEventBus(), outbound, announce=False
+            )
+
+        outbound = SimpleNamespace(send=mock.AsyncMock())
+        with (
+            mock.patch.dict(STAGE_DEADLINES_SECS, {"stt": 0.05}),
+            mock.patch.object(routes_ws, "stt_elevenlabs_session", silent_stt),
+        ):
+            transcript = asyncio.run(run())
+        assert transcript == Transcript("", is_final=True)
+
+    def test_barge_in_stt_deadline_starts_after_playback(self):
+        """Test time spent playing the prompt doesn't count against the answer"""
+        from app.routes import routes_ws
+
+        async def late_answer(audio_queue, events, outbound, speech_detected):
+            await asyncio.sleep(0.2)
+            events.transcripts.publish(Transcript("I am fine", is_final=True))
+
+        async def run():
+            playback_done = asyncio.Event()
+            asyncio.get_running_loop().call_later(0.15, playback_done.set)
+            return await routes_ws.listen_for_answer(
+                asyncio.Queue(),
+                SessionEventBus(),
+                outbound,
+                announce=False,
+                playback_done=playback_done,
+            )
+
+        outbound = SimpleNamespace(send=mock.AsyncMock())
+        with (
+            mock.patch.dict(STAGE_DEADLINES_SECS, {"stt": 0.1}),
+            mock.patch.object(routes_ws, "stt_elevenlabs_session", late_answer),
+        ):
+            transcript = asyncio.run(run())
+        assert transcript.text == "I am fine"
@@ -0,0 +1,154 @@
+import pytest
+
+from app.emotions import (
+    EMOTION_VECTOR_SIZE,
+    EMOTIONS,
+    NEGATIVE_EMOTIONS,
+    EmotionTrajectory,
+    EmotionVector,
+)
+from app.models import QAEmotionPair
+
+
+class TestEmotionTrajectory:
+    """Test session-level emotion aggregation"""
+
+    def test_first_turn_seeds_distribution(self):
+        """Test the first analyzed turn becomes the distribution"""
+        trajectory = EmotionTrajectory(alpha=0.5)
+        point = trajectory.update("Happy", 0.9)
+        assert point["Happy"] == 1.0
+        assert trajectory.dominant() == ("Happy", 1.0)
+
+    def test_confidence_weighted_smoothing(self):
+        """Test later turns move the distribution by alpha * confidence"""
+        trajectory = EmotionTrajectory(alpha=0.5)
+        trajectory.update("Happy", 0.9)
+        point = trajectory.update("sad", 0.8)
+        assert point["Happy"] == pytest.approx(0.6)
+        assert point["Sad"] == pytest.approx(0.4)
+        assert sum(point.values()) == pytest.approx(1.0)
+
+    def test_low_confidence_barely_moves(self):
+        """Test a zero confidence turn leaves the distribution unchanged"""
+        trajectory = EmotionTrajectory(alpha=0.5)
+        trajectory.update("Calm", 1.0)
+        trajectory.update("Angry", 0.0)
+        assert trajectory.dominant() == ("Calm", 1.0)
+        assert trajectory.turns == 2
+
+    def test_negative_breakdown_spreads_weight(self):
+        """Test negative turns use the percentage breakdown"""
+        trajectory = EmotionTrajectory()
+        point = trajectory.update(
+            "Stressed", 0.7, {"Stressed": 60.0, "Anxious": 40.0, "unknown": 10.0}
+        )
+        assert point["Stressed"] == pytest.approx(0.6)
+        assert point["Anxious"] == pytest.approx(0.4)
+
+    def test_unknown_emotion_is_ignored(self):
+        """Test labels outside the emotion set don't change the distribution"""
+        trajectory = EmotionTrajectory()
+        trajectory.update("joyful", 0.9)
+        assert trajectory.dominant() is None
+        assert len(trajectory.as_dict()) == len(EMOTIONS)
+
+    def test_unknown_first_turn_does_not_block_seeding(self):
+        """Test the first recognized turn seeds even after an unknown label"""
+        trajectory = EmotionTrajectory(alpha=0.5)
+        trajectory.update("joyful", 0.9)
+        point = trajectory.update("Happy", 0.8)
+        assert sum(point.values()) == pytest.approx(1.0)
+        assert trajectory.dominant() == ("Happy", 1.0)
+
+    def test_resume_from_trajectory(self):
+        """Test an aggregator rebuilt from stored points continues smoothing"""
+        stored = []
+        EmotionTrajectory(alpha=0.5, trajectory=stored).update("Happy", 1.0)
+        resumed = EmotionTrajectory(alpha=0.5, trajectory=stored)
+        resumed.update("Sad", 1.0)
+        assert len(stored) == 2
+        assert stored[-1]["Happy"] == pytest.approx(0.5)
+
+
+class TestEmotionVector:
+    """Test the fixed-slot negative emotion breakdown"""
+
+    def test_from_dict_normalizes_and_maps_aliases(self):
+        """Test aliases land in canonical slots and values sum to 100"""
+        vector = EmotionVector.from_dict({"stress": 3.0, "Anxious": 1.0, "bored": 5.0})
+        percentages = vector.to_dict()
+        assert list(percentages) == list(NEGATIVE_EMOTIONS)
+        assert percentages["Stressed"] == pytest.approx(75.0)
+        assert percentages["Anxious"] == pytest.approx(25.0)
+        assert sum(percentages.values()) == pytest.approx(100.0)
+
+    def test_empty_breakdown_is_none(self):
+        """Test empty or all-unknown breakdowns don't become zero vectors"""
+        assert EmotionVector.validate({}) is None
+        assert EmotionVector.validate({"bored": 40.0, "Sad": 0.0}) is None
+        pair = QAEmotionPair(
+            question="Q",
+            answer="A",
+            emotion="Calm",
+            confidence=0.8,
+            negative_emotion_percentages={"unknown": 50.0},
+        )
+        assert pair.negative_emotion_percentages is None
+        with pytest.raises(ValueError):
+            EmotionVector.from_values([0.0] * len(NEGATIVE_EMOTIONS))
+
+    def test_invalid_agent_breakdown_is_none(self):
+        """Test a bad breakdown from the agent is dropped instead of failing the turn"""
+        for breakdown in (
+            {"Sad": -10.0, "Angry": 5.0},
+            {"Sad": float("nan")},
+            {"Sad": "high"},
+            {"Sad": 20.0, 1: 10.0},
+        ):
+            pair = QAEmotionPair(
+                question="Q",
+                answer="A",
+                emotion="Sad",
+                confidence=0.8,
+                negative_emotion_percentages=breakdown,
+            )
+            assert pair.negative_emotion_percentages is None
+
+    def test_bytes_round_trip(self):
+        """Test the packed form is 32 bytes and decodes to the same vector"""
+        vector = EmotionVector.from_dict({"Sad": 40.0, "Angry": 60.0})
+        data = vector.to_bytes()
+        assert len(data) == EMOTION_VECTOR_SIZE == 32
+        assert EmotionVector.from_bytes(data) == vector
+
+    def test_rejects_invalid_values(self):
+        """Test wrong lengths and negative values are rejected"""
+        with pytest.raises(ValueError):
+            EmotionVector.from_values([1.0, 2.0])
+        with pytest.raises(ValueError):
+            EmotionVector.from_dict({"Sad": -1.0})
+        with pytest.raises(ValueError):
+            EmotionVector.from_bytes(b"\x00" * 8)
+
+    def test_model_dump_modes(self):
+        """Test dicts by default and bytes when storing"""
+        pair = QAEmotionPair(
+            question="Q",
+            answer="A",
+            emotion="Sad",
+            confidence=0.8,
+            negative_emotion_percentages={"Sad": 1.0},
+        )
+        assert pair.model_dump()["negative_emotion_percentages"]["Sad"] == 100.0
+        stored = pair.model_dump(context={"emotion_vector": "bytes"})
+        assert isinstance(stored["negative_emotion_percentages"], bytes)
+        assert QAEmotionPair.model_validate(stored) == pair
+        assert QAEmotionPair.model_validate_json(pair.model_dump_json()) == pair
+
+    def test_trajectory_accepts_vector(self):
+        """Test the aggregator reads the vector slots directly"""
+        vector = EmotionVector.from_dict({"Stressed": 60.0, "Anxious": 40.0})
+        point = EmotionTrajectory().update("Stressed", 0.7, vector)
+        assert point["Stressed"] == pytest.approx(0.6)
+        assert point["Anxious"] == pytest.approx(0.4)
@@ -0,0 +1,115 @@
+import asyncio
+import tracemalloc
+
+from app.events import (
+    Channel,
+    PlaybackFinished,
+    PlaybackProgress,
+    SessionEventBus,
+    Transcript,
+    parse_playback_position,
+)
+
+
+class TestChannel:
+    """Test bounded drop-oldest channels"""
+
+    def test_drops_oldest_when_full(self):
+        """Test a full channel keeps the newest events"""
+        channel = Channel("test", maxsize=2)
+        for i in range(5):
+            channel.publish(i)
+        assert channel.qsize() == 2
+        assert channel.dropped == 3
+        assert asyncio.run(channel.get()) == 3
+
+    def test_drain(self):
+        """Test drain empties the channel"""
+        channel = Channel("test", maxsize=4)
+        channel.publish(1)
+        channel.publish(2)
+        assert channel.drain() == 2
+        assert channel.qsize() == 0
+
+
+class TestSessionEventBus:
+    """Test the per-session event bus"""
+
+    def test_transcripts_do_not_delay_acks(self):
+        """Test a playback ack is the next control event despite transcript noise"""
+
+        async def run():
+            bus = SessionEventBus()
+            for i in range(100):
+                bus.transcripts.publish(Transcript(f"partial {i}", is_final=False))
+            bus.control.publish(PlaybackProgress(1.5))
+            bus.control.publish(PlaybackFinished())
+            return [await bus.control.get(), await bus.control.get()]
+
+        assert asyncio.run(run()) == [PlaybackProgress(1.5), PlaybackFinished()]
+
+    def test_acks_survive_progress_flood(self):
+        """Test progress reports never evict a playback ack"""
+
+        async def run():
+            bus = SessionEventBus(control_size=4)
+            bus.control.publish(PlaybackFinished())
+            for i in range(50):
+                bus.control.publish(PlaybackProgress(float(i)))
+            return await bus.control.get(), bus.control.qsize()
+
+        first, queued = asyncio.run(run())
+        assert first == PlaybackFinished()
+        assert queued == 3
+
+    def test_committed_transcript_survives_partials(self):
+        """Test partials only evict other partials"""
+
+        async def run():
+            bus = SessionEventBus(transcript_size=4)
+            bus.transcripts.publish(Transcript("I am fine", is_final=True))
+            for i in range(50):
+                bus.transcripts.publish(Transcript(f"partial {i}", is_final=False))
+            return await bus.transcripts.get()
+
+        assert asyncio.run(run()) == Transcript("I am fine", is_final=True)
+
+    def test_queue_size_stays_flat_over_long_session(self):
+        """Test memory held by the bus doesn't grow with the number of partials"""
+        bus = SessionEventBus()
+
+        def simulate_turns(turns: int):
+            for turn in range(turns):
+                for i in range(200):
+                    bus.transcripts.publish(Transcript(f"turn {turn} word {i}", False))
+                    bus.control.publish(PlaybackProgress(float(i)))
+                bus.transcripts.publish(Transcript(f"turn {turn}", True))
+                # listen_for_answer drains the channel before each answer
+                bus.transcripts.drain()
+
+        tracemalloc.start()
+        try:
+            simulate_turns(10)
+            baseline, _ = tracemalloc.get_traced_memory()
+            simulate_turns(500)
+            current, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert bus.control.qsize() == bus.control.maxsize
+        # 100k partials later the bus holds the same number of events
+        assert current - baseline < 64 * 1024
+
+
+class TestParsePlaybackPosition:
+    """Test validation of client playhead reports"""
+
+    def test_accepts_numbers(self):
+        """Test numeric positions pass through as floats"""
+        assert parse_playback_position(3) == 3.0
+        assert parse_playback_position(1.25) == 1.25
+
+    def test_rejects_malformed_values(self):
+        """Test null, strings and non-finite values are skipped"""
+        for value in (None, "abc", "1.5", True, float("nan"), float("inf"), -1, {}):
+            assert parse_playback_position(value) is None
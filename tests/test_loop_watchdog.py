@@ -0,0 +1,85 @@
+import asyncio
+import sys
+import time
+
+import pytest
+
+from app.loop_watchdog import LoopWatchdog, tag_session
+
+# stalls are attributed through Task.get_context()
+needs_task_context = pytest.mark.skipif(
+    sys.version_info < (3, 12), reason="Task.get_context needs Python 3.12"
+)
+
+
+def block_loop(secs: float):
+    time.sleep(secs)
+
+
+class TestLoopWatchdog:
+    """Test event-loop lag detection"""
+
+    @needs_task_context
+    def test_reports_blocking_call_with_session(self):
+        """Test a blocking call is reported with its stack and session"""
+        watchdog = LoopWatchdog(threshold_secs=0.05, heartbeat_secs=0.02)
+
+        async def session():
+            tag_session("session-1")
+            block_loop(0.3)
+            await asyncio.sleep(0.1)
+
+        async def main():
+            watchdog.start()
+            try:
+                await asyncio.create_task(session())
+            finally:
+                watchdog.stop()
+
+        asyncio.run(main())
+        stats = watchdog.stats()
+        assert stats["stalls"] >= 1
+        assert stats["max_lag_ms"] >= 200
+        report = watchdog.reports[0]
+        assert report["session_id"] == "session-1"
+        assert "block_loop" in "".join(report["stack"])
+
+    @needs_task_context
+    def test_child_task_inherits_session(self):
+        """Test a stall in a task the session created is reported for it"""
+        watchdog = LoopWatchdog(threshold_secs=0.05, heartbeat_secs=0.02)
+
+        async def child():
+            block_loop(0.3)
+
+        async def session():
+            tag_session("session-2")
+            async with asyncio.TaskGroup() as tasks:
+                tasks.create_task(child(), name="child")
+
+        async def main():
+            watchdog.start()
+            try:
+                await asyncio.create_task(session())
+                await asyncio.sleep(0.1)
+            finally:
+                watchdog.stop()
+
+        asyncio.run(main())
+        report = watchdog.reports[0]
+        assert report["session_id"] == "session-2"
+        assert report["task"] == "child"
+
+    def test_idle_loop_has_no_stalls(self):
+        """Test a loop that keeps yielding isn't reported"""
+        watchdog = LoopWatchdog(threshold_secs=0.1, heartbeat_secs=0.01)
+
+        async def main():
+            watchdog.start()
+            await asyncio.sleep(0.2)
+            watchdog.stop()
+
+        asyncio.run(main())
+        assert watchdog.beats > 5
+        assert watchdog.stalls == 0
+        assert not watchdog.reports
@@ -8,6 +8,7 @@ from app.models import (
     ConversationAgentResult,
     MusicAgentResult,
     QAEmotionPair,
+    TurnTiming,
 )
 
 
@@ -67,7 +68,29 @@ class TestQAPair:
             confidence=0.8,
             negative_emotion_percentages={"sadness": 0.6, "anxiety": 0.2},
         )
-        assert qa_with.negative_emotion_percentages == {"sadness": 0.6, "anxiety": 0.2}
+        # aliases map onto the canonical labels and the breakdown is normalized to 100
+        percentages = qa_with.negative_emotion_percentages.to_dict()
+        assert percentages["Sad"] == pytest.approx(75.0)
+        assert percentages["Anxious"] == pytest.approx(25.0)
+        assert sum(percentages.values()) == pytest.approx(100.0)
+
+    def test_optional_timing(self):
+        """Test turn timing is optional and rejects negative durations"""
+        qa = QAEmotionPair(question="Q", answer="A", emotion="happy", confidence=0.5)
+        assert qa.timing is None
+
+        qa = QAEmotionPair(
+            question="Q",
+            answer="A",
+            emotion="happy",
+            confidence=0.5,
+            timing=TurnTiming(stt_commit_secs=3.2, run_secs=1.1),
+        )
+        assert qa.model_dump()["timing"]["stt_commit_secs"] == 3.2
+        assert qa.timing.playback_secs is None
+
+        with pytest.raises(ValidationError):
+            TurnTiming(run_secs=-1.0)
 
 
 class TestAgentSession:
@@ -0,0 +1,126 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+from app.outbound import OutboundWriter
+
+
+class FakeWebSocket:
+    def __init__(self, fail_after: int | None = None):
+        self.messages = []
+        self.fail_after = fail_after
+
+    async def send_text(self, text: str):
+        if self.fail_after is not None and len(self.messages) >= self.fail_after:
+            raise RuntimeError("Cannot call send once a close message has been sent")
+        self.messages.append(json.loads(text))
+        # yield like a real socket write
+        await asyncio.sleep(0)
+
+
+class TestOutboundWriter:
+    """Test the per-connection outbound writer"""
+
+    def test_preserves_order(self):
+        """Test messages from awaited and sync senders keep their order"""
+
+        async def run():
+            websocket = FakeWebSocket()
+            outbound = OutboundWriter(websocket, coalesce_window=0)
+            outbound.start()
+            await outbound.send({"type": "question", "text": "Hi"})
+            outbound.send_nowait(
+                {"type": "transcript", "transcript": "a", "is_final": True}
+            )
+            await outbound.send({"type": "listening"})
+            await outbound.close()
+            return websocket.messages
+
+        messages = asyncio.run(run())
+        assert [m["type"] for m in messages] == ["question", "transcript", "listening"]
+
+    def test_coalesces_bursts(self):
+        """Test deltas are concatenated and partials keep the latest text"""
+
+        async def run():
+            websocket = FakeWebSocket()
+            outbound = OutboundWriter(websocket, coalesce_window=0.01)
+            outbound.start()
+            for delta in ["Hel", "lo", " there"]:
+                await outbound.send({"type": "agent_stream_delta", "delta": delta})
+            for text in ["I", "I am", "I am fine"]:
+                outbound.send_nowait(
+                    {"type": "transcript", "transcript": text, "is_final": False}
+                )
+            await outbound.close()
+            return websocket.messages, outbound.coalesced
+
+        messages, coalesced = asyncio.run(run())
+        assert messages == [
+            {"type": "agent_stream_delta", "delta": "Hello there"},
+            {"type": "transcript", "transcript": "I am fine", "is_final": False},
+        ]
+        assert coalesced == 4
+
+    def test_final_transcript_is_not_merged(self):
+        """Test a committed transcript ends a run of partials"""
+
+        async def run():
+            websocket = FakeWebSocket()
+            outbound = OutboundWriter(websocket, coalesce_window=0.01)
+            outbound.start()
+            outbound.send_nowait(
+                {"type": "transcript", "transcript": "ok", "is_final": False}
+            )
+            outbound.send_nowait(
+                {"type": "transcript", "transcript": "ok.", "is_final": True}
+            )
+            outbound.send_nowait(
+                {"type": "transcript", "transcript": "next", "is_final": False}
+            )
+            await outbound.close()
+            return websocket.messages
+
+        messages = asyncio.run(run())
+        assert [m["is_final"] for m in messages] == [False, True, False]
+
+    def test_closed_socket_fails_sends(self):
+        """Test sends after a socket error raise WebSocketDisconnect"""
+
+        async def run():
+            outbound = OutboundWriter(FakeWebSocket(fail_after=0), coalesce_window=0)
+            outbound.start()
+            await outbound.send({"type": "analyzing"})
+            await asyncio.sleep(0.01)
+            assert outbound.closed
+            # sync senders are ignored instead of raising
+            outbound.send_nowait(
+                {"type": "transcript", "transcript": "x", "is_final": True}
+            )
+            with pytest.raises(WebSocketDisconnect):
+                await outbound.send({"type": "listening"})
+            await outbound.close()
+
+        asyncio.run(run())
+
+    def test_full_outbox_drops_partials(self):
+        """Test partials are dropped instead of growing a full outbox"""
+
+        async def run():
+            websocket = FakeWebSocket()
+            outbound = OutboundWriter(websocket, max_size=2, coalesce_window=0)
+            # writer not started, so the outbox fills up
+            outbound.send_nowait({"type": "status", "n": 1})
+            outbound.send_nowait({"type": "status", "n": 2})
+            outbound.send_nowait(
+                {"type": "transcript", "transcript": "x", "is_final": False}
+            )
+            assert outbound.dropped == 1
+            outbound.start()
+            await outbound.close()
+            return websocket.messages
+
+        messages = asyncio.run(run())
+        assert [m.get("n") for m in messages] == [1, 2]
@@ -0,0 +1,199 @@
+import asyncio
+
+from app.provider_pool import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self, index: int):
+        self.index = index
+        self.closed = False
+        self.on_close = None
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeProvider:
+    def __init__(self):
+        self.opened: list[FakeConnection] = []
+
+    async def connect(self):
+        await asyncio.sleep(0.01)
+        connection = FakeConnection(len(self.opened))
+        self.opened.append(connection)
+        return connection
+
+
+def watch_close(connection, on_close):
+    connection.on_close = on_close
+
+
+class TestConnectionPool:
+    """Test the warm provider connection pool"""
+
+    def test_warm_acquire_is_a_hit(self):
+        """Test acquiring after warm-up reuses an idle connection and refills"""
+
+        async def run():
+            provider = FakeProvider()
+            pool = ConnectionPool(
+                "stt", provider.connect, size=2, refresh_interval=0.01
+            )
+            await pool.start()
+            await asyncio.sleep(0.05)
+            connection = await pool.acquire()
+            await asyncio.sleep(0.05)
+            stats = pool.stats()
+            await pool.close()
+            return provider, connection, stats
+
+        provider, connection, stats = asyncio.run(run())
+        assert connection is provider.opened[0]
+        assert stats["hits"] == 1
+        assert stats["misses"] == 0
+        assert stats["hit_rate"] == 1.0
+        # the handed out connection was replaced
+        assert stats["idle"] == 2
+        assert len(provider.opened) == 3
+
+    def test_empty_pool_connects_on_demand(self):
+        """Test a disabled pool still hands out fresh connections"""
+
+        async def run():
+            provider = FakeProvider()
+            pool = ConnectionPool("stt", provider.connect, size=0)
+            await pool.start()
+            connection = await pool.acquire()
+            return connection, pool.stats()
+
+        connection, stats = asyncio.run(run())
+        assert connection.index == 0
+        assert stats["misses"] == 1
+        assert stats["acquire_ms_p50"] is not None
+
+    def test_refreshes_before_idle_timeout(self):
+        """Test idle connections are closed and replaced when they get old"""
+
+        async def run():
+            provider = FakeProvider()
+            pool = ConnectionPool(
+                "stt",
+                provider.connect,
+                size=1,
+                max_idle_secs=0.05,
+                refresh_interval=0.01,
+            )
+            await pool.start()
+            await asyncio.sleep(0.2)
+            stats = pool.stats()
+            await pool.close()
+            return provider, stats
+
+        provider, stats = asyncio.run(run())
+        assert stats["refreshed"] >= 1
+        assert provider.opened[0].closed
+        assert all(connection.closed for connection in provider.opened)
+
+    def test_skips_connections_closed_by_provider(self):
+        """Test a connection the provider closed while idle is not handed out"""
+
+        async def run():
+            provider = FakeProvider()
+            pool = ConnectionPool(
+                "stt",
+                provider.connect,
+                size=1,
+                refresh_interval=10,
+                watch_close=watch_close,
+            )
+            await pool.start()
+            await asyncio.sleep(0.05)
+            provider.opened[0].on_close()
+            connection = await pool.acquire()
+            await pool.close()
+            return provider, connection
+
+        provider, connection = asyncio.run(run())
+        assert connection is not provider.opened[0]
+
+    def test_failed_connects_back_off(self):
+        """Test a failing provider is retried with growing delays"""
+
+        async def run():
+            attempts = 0
+
+            async def connect():
+                nonlocal attempts
+                attempts += 1
+                raise ConnectionError("provider down")
+
+            pool = ConnectionPool(
+                "stt", connect, size=1, refresh_interval=0.01, max_backoff_secs=1
+            )
+            await pool.start()
+            await asyncio.sleep(0.2)
+            await pool.close()
+            return attempts, pool.stats()
+
+        attempts, stats = asyncio.run(run())
+        # without backoff this would be about 20 attempts
+        assert 2 <= attempts <= 6
+        assert stats["connect_failures"] == attempts
+
+    def test_goes_dormant_without_acquires(self):
+        """Test an unused pool stops reopening connections until the next acquire"""
+
+        async def run():
+            provider = FakeProvider()
+            pool = ConnectionPool(
+                "stt",
+                provider.connect,
+                size=1,
+                max_idle_secs=0.02,
+                refresh_interval=0.01,
+                dormant_after_secs=0.1,
+            )
+            await pool.start()
+            await asyncio.sleep(0.2)
+            opened = len(provider.opened)
+            dormant = pool.stats()
+            await asyncio.sleep(0.1)
+            idle_opens = len(provider.opened) - opened
+            lapsed = all(connection.closed for connection in provider.opened)
+            await pool.acquire()
+            await asyncio.sleep(0.05)
+            woken = pool.stats()
+            await pool.close()
+            return dormant, idle_opens, lapsed, woken
+
+        dormant, idle_opens, lapsed, woken = asyncio.run(run())
+        assert dormant["dormant"] and dormant["idle"] == 0
+        assert idle_opens == 0
+        assert lapsed
+        assert not woken["dormant"]
+
+    def test_background_opens_use_their_own_connect(self):
+        """Test warm connections go through background_connect"""
+
+        async def run():
+            provider = FakeProvider()
+            warmed = 0
+
+            async def background_connect():
+                nonlocal warmed
+                warmed += 1
+                return await provider.connect()
+
+            pool = ConnectionPool(
+                "stt",
+                provider.connect,
+                size=2,
+                refresh_interval=0.01,
+                background_connect=background_connect,
+            )
+            await pool.start()
+            await asyncio.sleep(0.05)
+            await pool.close()
+            return warmed
+
+        assert asyncio.run(run()) == 2
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.quota import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_NEW_SESSION,
+    PRIORITY_TURN,
+    QuotaExceeded,
+    QuotaScheduler,
+    is_rate_limited,
+    retry_after_secs,
+)
+
+
+# 600 a minute is 10 a second, a 0.1s burst holds one call
+def make_scheduler(wait_secs: float = 1.0) -> QuotaScheduler:
+    return QuotaScheduler(
+        {("openai", "requests"): 600}, burst_secs=0.1, wait_secs=wait_secs
+    )
+
+
+class TestQuotaScheduler:
+    """Test provider rate limits shared by sessions"""
+
+    def test_waits_for_refill(self):
+        """Test calls over the burst wait for the bucket to refill"""
+        scheduler = make_scheduler()
+
+        async def three_calls():
+            started = time.monotonic()
+            for _ in range(3):
+                await scheduler.acquire("openai", "requests")
+            return time.monotonic() - started
+
+        assert 0.15 <= asyncio.run(three_calls()) < 0.5
+        assert scheduler.stats()["openai/requests"]["granted"] == 3
+
+    def test_unknown_quota_is_unlimited(self):
+        """Test resources without a quota never wait"""
+        scheduler = make_scheduler()
+        asyncio.run(scheduler.acquire("elevenlabs", "tts_chars", 10_000))
+
+    def test_turns_go_before_new_sessions(self):
+        """Test queued calls are served by priority, then arrival"""
+        scheduler = make_scheduler()
+        order = []
+
+        async def call(name: str, priority: int):
+            await scheduler.acquire("openai", "requests", priority=priority)
+            order.append(name)
+
+        async def main():
+            # empty the bucket, then queue calls in reverse priority
+            await scheduler.acquire("openai", "requests")
+            await asyncio.gather(
+                call("summary", PRIORITY_BACKGROUND),
+                call("new session", PRIORITY_NEW_SESSION),
+                call("turn", PRIORITY_TURN),
+            )
+
+        asyncio.run(main())
+        assert order == ["turn", "new session", "summary"]
+
+    def test_queue_timeout(self):
+        """Test a call that can't get capacity in time fails and leaves no waiter"""
+        scheduler = make_scheduler(wait_secs=0.05)
+
+        async def main():
+            await scheduler.acquire("openai", "requests")
+            scheduler.report_rate_limited("openai", retry_after=5)
+            await scheduler.acquire("openai", "requests")
+
+        with pytest.raises(QuotaExceeded):
+            asyncio.run(main())
+        stats = scheduler.stats()["openai/requests"]
+        assert stats["timeouts"] == 1
+        assert stats["waiting"] == 0
+
+    def test_rate_limits_adjust_rate(self):
+        """Test 429s halve the rate and successes recover it"""
+        scheduler = make_scheduler()
+        scheduler.report_rate_limited("openai", retry_after=0)
+        scheduler.report_rate_limited("openai", retry_after=0)
+        assert scheduler.stats()["openai/requests"]["rate_per_min"] == 150
+        for _ in range(40):
+            scheduler.report_success("openai")
+        assert scheduler.stats()["openai/requests"]["rate_per_min"] == 600
+
+    def test_rate_limit_errors(self):
+        """Test 429s are recognized from HTTP errors and STT messages"""
+        error = SimpleNamespace(status_code=429, headers={"retry-after": "2"})
+        assert is_rate_limited(error)
+        assert retry_after_secs(error) == 2.0
+        assert is_rate_limited({"message_type": "rate_limited"})
+        assert not is_rate_limited({"message_type": "auth_error"})
+        assert not is_rate_limited(ValueError())
+        assert retry_after_secs(ValueError()) is None
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from app.conversation_agent import conversation_agent
+from app.quota import QuotaScheduler
+from app.reanalysis import (
+    FakeAnalysisBackend,
+    JsonlResultSink,
+    analysis_version,
+    collect_batch,
+    reanalyze_sessions,
+    submit_batch,
+)
+
+
+def make_session(session_id: str) -> dict:
+    return {
+        "session_id": session_id,
+        "created_at": "2025-01-01T10:00:00",
+        "qa_pairs": [
+            {
+                "question": "How are you?",
+                "answer": "Honestly stressed about work",
+                "emotion": "Anxious",
+                "confidence": 0.6,
+                "is_direct": False,
+            },
+            {
+                "question": "What would help?",
+                "answer": "Being calm for once",
+                "emotion": "Calm",
+                "confidence": 0.7,
+                "is_direct": False,
+            },
+            {
+                "question": "Anything else?",
+                "answer": "Play me some music",
+                "emotion": "Calm",
+                "confidence": 0.7,
+                "is_direct": False,
+            },
+        ],
+    }
+
+
+def pages(count: int) -> list[list[dict]]:
+    return [[make_session(f"s{i}") for i in range(count)]]
+
+
+def unlimited() -> QuotaScheduler:
+    return QuotaScheduler({})
+
+
+def run(pages, sink, backend, concurrency=8):
+    return asyncio.run(
+        reanalyze_sessions(
+            pages, sink, backend, "v1", concurrency=concurrency, quota=unlimited()
+        )
+    )
+
+
+class TestReanalysis:
+    """Test re-scoring stored sessions"""
+
+    def test_writes_versioned_results(self, tmp_path):
+        """Test each answer is re-analyzed and stored with the old result"""
+        sink = JsonlResultSink(tmp_path / "results.jsonl")
+        stats = run(pages(3), sink, FakeAnalysisBackend())
+        assert stats["sessions"] == 3
+        results = [json.loads(line) for line in sink.path.read_text().splitlines()]
+        pairs = results[0]["qa_pairs"]
+        assert results[0]["version"] == "v1"
+        # the closing music request isn't an answer
+        assert [p["turn_index"] for p in pairs] == [0, 1]
+        assert pairs[0]["emotion"] == "Stressed"
+        assert pairs[0]["previous_emotion"] == "Anxious"
+
+    def test_resumes_from_checkpoint(self, tmp_path):
+        """Test sessions already in the results are skipped on the next run"""
+        sink = JsonlResultSink(tmp_path / "results.jsonl")
+        run(pages(2), sink, FakeAnalysisBackend())
+        backend = FakeAnalysisBackend()
+        stats = run(pages(5), sink, backend)
+        assert stats["skipped"] == 2
+        assert stats["sessions"] == 3
+        assert backend.calls == 6
+
+    def test_failed_session_is_retried_next_run(self, tmp_path):
+        """Test a session with a failed answer isn't checkpointed"""
+        sink = JsonlResultSink(tmp_path / "results.jsonl")
+        backend = FakeAnalysisBackend()
+        backend.analyze = mock.AsyncMock(side_effect=RuntimeError("provider down"))
+        with mock.patch("app.reanalysis.REANALYSIS_ATTEMPTS", 1):
+            stats = run(pages(1), sink, backend)
+        assert stats["failed"] == 1
+        assert sink.completed() == set()
+
+    def test_answers_run_in_parallel(self, tmp_path):
+        """Test the pool overlaps provider calls across sessions"""
+        sink = JsonlResultSink(tmp_path / "results.jsonl")
+        started = time.monotonic()
+        stats = run(pages(40), sink, FakeAnalysisBackend(delay_secs=0.05), 32)
+        elapsed = time.monotonic() - started
+        assert stats["answers"] == 80
+        # 80 calls of 50ms take 4s one after another
+        assert elapsed < 1.0
+
+    def test_version_follows_instructions(self):
+        """Test changed instructions produce a new result version"""
+        changed = conversation_agent.clone(instructions="Be brief.")
+        assert analysis_version(changed) != analysis_version()
+        assert analysis_version().startswith(conversation_agent.model)
+
+
+# the parts of the OpenAI client the batch API uses
+class FakeBatchClient:
+    def __init__(self):
+        self.requests = None
+        self.files = SimpleNamespace(create=self.create_file, content=self.content)
+        self.batches = SimpleNamespace(
+            create=lambda **kwargs: SimpleNamespace(id="batch_1"),
+            retrieve=lambda batch_id: SimpleNamespace(
+                id=batch_id, status="completed", output_file_id="out_1"
+            ),
+        )
+
+    def create_file(self, file, purpose):
+        self.requests = [json.loads(line) for line in file.read().splitlines()]
+        return SimpleNamespace(id="file_1")
+
+    def content(self, file_id):
+        lines = []
+        for request in self.requests:
+            text = json.dumps(
+                {
+                    "question": "Why?",
+                    "is_direct": False,
+                    "emotion": "Sad",
+                    "confidence": 0.7,
+                    "negative_emotion_percentages": {"Sad": 100},
+                }
+            )
+            body = {"output": [{"type": "message", "content": [{"type": "output_text", "text": text}]}]}  # fmt: skip
+            lines.append(
+                json.dumps(
+                    {
+                        "custom_id": request["custom_id"],
+                        "response": {"status_code": 200, "body": body},
+                    }
+                )
+            )
+        return SimpleNamespace(text="\n".join(lines))
+
+
+class TestBatchReanalysis:
+    """Test re-scoring through the provider batch API"""
+
+    def test_submit_and_collect(self, tmp_path):
+        """Test batch results are written like live ones"""
+        sink = JsonlResultSink(tmp_path / "results.jsonl")
+        client = FakeBatchClient()
+        state_path = tmp_path / "results.batch.json"
+        assert submit_batch(pages(2), sink, "v1", client, state_path) == "batch_1"
+        assert len(client.requests) == 4
+        assert client.requests[0]["body"]["model"] == conversation_agent.model
+
+        stats = collect_batch(sink, client, state_path)
+        assert stats["sessions"] == 2
+        assert sink.completed() == {"s0", "s1"}
@@ -0,0 +1,161 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+from app.elevenlabs import PromptAudio, tts_elevenlabs_session
+from app.models import ConversationAgentResult
+from app.response_cache import ResponseCache, normalize_transcript
+
+
+def agent_result(question: str, confidence: float = 0.7) -> ConversationAgentResult:
+    return ConversationAgentResult(
+        question=question,
+        is_direct=False,
+        emotion="Calm",
+        confidence=confidence,
+        negative_emotion_percentages=None,
+    )
+
+
+def filled_cache(answer: str = "I'm fine", variants: int = 2, **kwargs):
+    cache = ResponseCache(variants=variants, **kwargs)
+    for i in range(variants):
+        cache.put(answer, agent_result(f"Question {i}?"), [b"mp3"], 1.0)
+    return cache
+
+
+class FakeOutbound:
+    def __init__(self):
+        self.closed = False
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+class TestNormalizeTranscript:
+    """Test cache keys for transcripts"""
+
+    def test_drops_punctuation_and_fillers(self):
+        """Test spoken variations of an answer share a key"""
+        assert normalize_transcript("Um, I'm fine, thanks!") == "im fine"
+        assert normalize_transcript("I am fine.") == "im fine"
+        assert normalize_transcript("Okay") == normalize_transcript("alright")
+
+    def test_keeps_words_that_carry_meaning(self):
+        """Test "well", "so" and "like" aren't dropped as fillers"""
+        assert normalize_transcript("I am well") == "im well"
+        assert normalize_transcript("so so") == "so so"
+        assert normalize_transcript("I like it") == "i like it"
+
+
+class TestResponseCache:
+    """Test the first-turn response cache"""
+
+    def test_serves_once_the_pool_is_full(self):
+        """Test an answer is served only after collecting its variants"""
+        cache = ResponseCache(variants=2)
+        cache.put("I'm fine", agent_result("How was your day?"), [b"mp3"], 1.0)
+        assert cache.get("I'm fine") is None
+        cache.put("i'm fine.", agent_result("What made it fine?"), [b"mp3"], 1.0)
+        questions = {cache.get("I am fine").result.question for _ in range(50)}
+        assert questions == {"How was your day?", "What made it fine?"}
+
+    def test_same_question_is_not_a_new_variant(self):
+        """Test the variety pool only holds distinct questions"""
+        cache = ResponseCache(variants=2)
+        assert cache.put("I'm tired", agent_result("Why tired?"), [b"mp3"], 1.0)
+        assert not cache.put("I'm tired", agent_result("Why tired?"), [b"mp3"], 1.0)
+
+    def test_rejects_uncacheable_responses(self):
+        """Test low confidence, long, music and audio-less responses aren't cached"""
+        cache = ResponseCache(variants=1, min_confidence=0.6)
+        assert not cache.put("I'm fine", agent_result("Why?", 0.4), [b"mp3"], 1.0)
+        assert not cache.put("I'm fine", agent_result("Why?"), [], 1.0)
+        long_answer = "my boss yelled at me in front of everyone today"
+        assert not cache.put(long_answer, agent_result("Why?"), [b"mp3"], 1.0)
+        assert not cache.put("Play me some music", agent_result("Why?"), [b"mp3"], 1.0)
+
+    def test_refuses_keys_with_one_word(self):
+        """Test answers left with a single word after normalizing aren't cached"""
+        cache = ResponseCache(variants=1)
+        for answer in ("I am", "I am very very", "tired", "Um, thanks"):
+            assert cache.key(answer) is None
+            assert not cache.put(answer, agent_result("Why?"), [b"mp3"], 1.0)
+        assert cache.stats()["cached"] == 0
+
+    def test_filler_words_dont_collide(self):
+        """Test answers that differ only in former fillers get their own responses"""
+        cache = filled_cache("I'm fine")
+        for answer in ("I am well", "so so", "I like it", "I am very very", "I am"):
+            assert cache.get(answer) is None
+        assert cache.stats()["hits"] == 0
+
+    def test_happy_is_not_unhappy(self):
+        """Test an answer never gets the responses of its opposite"""
+        assert filled_cache("I'm happy").get("I'm unhappy") is None
+        assert filled_cache("I'm happy", similarity=0.7).get("I'm unhappy") is None
+
+    def test_near_match(self):
+        """Test similar answers share cached responses when enabled"""
+        cache = filled_cache("I'm so tired", similarity=0.7)
+        assert cache.get("I'm tired") is not None
+        assert cache.stats()["near_hits"] == 1
+        assert cache.get("I'm excited") is None
+
+    def test_near_match_respects_negation(self):
+        """Test a negated answer never matches the plain one"""
+        cache = filled_cache("I'm good", similarity=0.7)
+        assert cache.get("I'm not good") is None
+
+    def test_exact_match_only(self):
+        """Test only exact matches are served by default"""
+        cache = filled_cache("I'm tired")
+        assert cache.get("I'm so tired") is None
+        assert cache.get("Um, I am really tired.") is not None
+        assert cache.stats()["near_hits"] == 0
+
+    def test_entries_expire(self):
+        """Test responses are dropped after the TTL"""
+        cache = filled_cache(ttl_secs=60)
+        with mock.patch("app.response_cache.time.monotonic", return_value=1e12):
+            assert cache.get("I'm fine") is None
+        assert cache.stats()["cached"] == 0
+
+    def test_lru_eviction(self):
+        """Test the least recently used answer is evicted first"""
+        cache = ResponseCache(variants=1, max_size=2)
+        cache.put("I'm fine", agent_result("A?"), [b"mp3"], 1.0)
+        cache.put("I'm tired", agent_result("B?"), [b"mp3"], 1.0)
+        cache.get("I'm fine")
+        cache.put("I'm stressed", agent_result("C?"), [b"mp3"], 1.0)
+        assert cache.get("I'm fine") is not None
+        assert cache.get("I'm tired") is None
+
+
+class TestPromptAudio:
+    """Test recording and replaying question audio"""
+
+    def test_records_streamed_audio(self):
+        """Test a complete TTS stream is kept for the cache"""
+        client = SimpleNamespace(
+            text_to_speech=SimpleNamespace(stream=lambda **kw: iter([b"a", b"b"]))
+        )
+        recording = PromptAudio()
+        with mock.patch("app.elevenlabs.get_elevenlabs", lambda: client):
+            asyncio.run(
+                tts_elevenlabs_session("How are you?", FakeOutbound(), recording)
+            )
+        assert recording.chunks == [b"a", b"b"]
+
+    def test_cached_audio_skips_the_provider(self):
+        """Test cached question audio is played without a TTS call"""
+        from app.routes.routes_ws import timed_tts
+
+        outbound = FakeOutbound()
+        with mock.patch("app.elevenlabs.get_elevenlabs", side_effect=AssertionError):
+            playback = asyncio.run(
+                timed_tts("Why?", outbound, None, PromptAudio((b"a", b"b"), 2.5))
+            )
+        assert len(outbound.sent) == 2
+        assert playback.duration_secs == 2.5
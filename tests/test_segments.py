@@ -0,0 +1,100 @@
+from app.models import AnswerSegment, QAEmotionPair
+from app.segments import (
+    PCM_BYTES_PER_SECOND,
+    answer_segment,
+    secs_to_bytes,
+    segment_index,
+    spoken_span,
+)
+
+WORDS = (
+    {"text": "I", "start": 0.5, "end": 0.6, "type": "word"},
+    {"text": " ", "start": 0.6, "end": 0.7, "type": "spacing"},
+    {"text": "am", "start": 0.7, "end": 0.9, "type": "word"},
+    {"text": " ", "start": 0.9, "end": 1.0, "type": "spacing"},
+    {"text": "fine", "start": 1.0, "end": 1.5, "type": "word"},
+)
+
+
+class TestSpokenSpan:
+    """Test finding the spoken part of a committed transcript"""
+
+    def test_span_ignores_spacing(self):
+        """Test the span runs from the first to the last word"""
+        assert spoken_span(WORDS) == (0.5, 1.5)
+
+    def test_no_timestamps(self):
+        """Test transcripts without usable timestamps have no span"""
+        assert spoken_span(()) is None
+        assert spoken_span([{"text": "hi", "type": "word"}]) is None
+
+
+class TestAnswerSegment:
+    """Test mapping word timestamps to archive offsets"""
+
+    def test_offsets_follow_stream_start(self):
+        """Test offsets are relative to where the STT stream started"""
+        stream_offset = 10 * PCM_BYTES_PER_SECOND
+        segment = answer_segment(WORDS, stream_offset, padding_secs=0)
+        assert segment.start_byte == stream_offset + secs_to_bytes(0.5)
+        assert segment.end_byte == stream_offset + secs_to_bytes(1.5)
+        assert segment.start_secs == 10.5
+        assert segment.end_secs == 11.5
+
+    def test_offsets_are_sample_aligned(self):
+        """Test offsets never split a 16-bit sample"""
+        segment = answer_segment(WORDS, 2, padding_secs=0.123)
+        assert segment.start_byte % 2 == 0
+        assert segment.end_byte % 2 == 0
+
+    def test_padding_is_clamped(self):
+        """Test padding stays inside the archive"""
+        segment = answer_segment(WORDS, 0, archive_length=40000, padding_secs=1.0)
+        assert segment.start_byte == 0
+        assert segment.end_byte == 40000
+
+    def test_missing_stream_offset(self):
+        """Test answers without a known stream start get no segment"""
+        assert answer_segment(WORDS, None) is None
+        assert answer_segment((), 0) is None
+
+
+class TestSegmentIndex:
+    """Test the per-session answer index"""
+
+    def test_index_skips_answers_without_audio(self):
+        """Test only answers with a segment are indexed, by turn"""
+        segment = AnswerSegment(start_byte=0, end_byte=320, start_secs=0, end_secs=0.01)
+        qa_pairs = [
+            QAEmotionPair(question="q", answer="a", emotion="Calm", confidence=0.5),
+            QAEmotionPair(
+                question="q",
+                answer="a",
+                emotion="Calm",
+                confidence=0.5,
+                audio_segment=segment,
+            ),
+        ]
+        index = segment_index(qa_pairs)
+        assert len(index) == 1
+        assert index[0]["turn"] == 1
+        assert index[0]["end_byte"] == 320
+
+    def test_segment_round_trips(self):
+        """Test a stored pair keeps its segment reference"""
+        segment = AnswerSegment(
+            start_byte=0,
+            end_byte=320,
+            start_secs=0,
+            end_secs=0.01,
+            audio_url="https://bucket/agent/s/answer_0.flac",
+        )
+        qa = QAEmotionPair(
+            question="q",
+            answer="a",
+            emotion="Calm",
+            confidence=0.5,
+            audio_segment=segment,
+        )
+        restored = QAEmotionPair.model_validate(qa.model_dump())
+        assert restored.audio_segment == segment
@@ -0,0 +1,206 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routes import sessions_router
+from app.session_history import (
+    SUMMARY_FIELDS,
+    CachedSessionHistory,
+    FirestoreSessionHistory,
+    InMemorySessionHistory,
+    InvalidCursor,
+    parse_fields,
+)
+
+
+def make_session(session_id: str, created_at: str, turns: int = 2) -> dict:
+    return {
+        "session_id": session_id,
+        "created_at": created_at,
+        "updated_at": created_at,
+        "qa_pairs": [
+            {
+                "question": f"Question {i}?",
+                "answer": f"Answer {i}",
+                "emotion": "Calm",
+                "confidence": 0.7,
+                "is_direct": False,
+            }
+            for i in range(turns)
+        ],
+        "final_emotion": "Calm",
+        "final_confidence": 0.7,
+        "total_question_count": turns,
+        "direct_question_count": 0,
+        "audio_url": f"gs://bucket/{session_id}.flac",
+    }
+
+
+def history() -> InMemorySessionHistory:
+    return InMemorySessionHistory(
+        [make_session(f"s{i}", f"2025-01-0{i + 1}T10:00:00") for i in range(5)]
+    )
+
+
+class CountingHistory(InMemorySessionHistory):
+    def __init__(self, documents):
+        super().__init__(documents)
+        self.gets = 0
+
+    async def get_session(self, session_id):
+        self.gets += 1
+        return await super().get_session(session_id)
+
+
+class TestParseFields:
+    """Test field projections"""
+
+    def test_summary_by_default(self):
+        """Test lists leave transcripts out unless asked"""
+        assert parse_fields(None) == SUMMARY_FIELDS
+        assert "qa_pairs" not in SUMMARY_FIELDS
+
+    def test_selected_fields_keep_the_id(self):
+        """Test the session id always comes back"""
+        assert parse_fields("final_emotion") == ["session_id", "final_emotion"]
+
+    def test_unknown_field(self):
+        """Test fields outside the session model are rejected"""
+        with pytest.raises(ValueError):
+            parse_fields("final_emotion,password")
+
+
+class TestSessionHistory:
+    """Test reading stored sessions"""
+
+    def test_pages_newest_first(self):
+        """Test the cursor walks all sessions exactly once"""
+        store = history()
+        seen, cursor = [], None
+        while True:
+            page, cursor = asyncio.run(store.list_sessions(2, cursor, ["session_id"]))
+            seen += [session["session_id"] for session in page]
+            if cursor is None:
+                break
+        assert seen == ["s4", "s3", "s2", "s1", "s0"]
+
+    def test_unknown_cursor(self):
+        """Test a cursor for a missing session is rejected"""
+        with pytest.raises(InvalidCursor):
+            asyncio.run(history().list_sessions(2, "missing", ["session_id"]))
+
+    def test_cache_serves_recent_sessions(self):
+        """Test a session is read from the store once while cached"""
+        store = CountingHistory([make_session("s0", "2025-01-01T10:00:00")])
+        cached = CachedSessionHistory(store, ttl_secs=60)
+        for _ in range(3):
+            assert asyncio.run(cached.get_session("s0")) is not None
+        assert store.gets == 1
+        assert cached.stats()["hits"] == 2
+
+    def test_cache_expires(self):
+        """Test rewritten sessions are read again after the TTL"""
+        store = CountingHistory([make_session("s0", "2025-01-01T10:00:00")])
+        cached = CachedSessionHistory(store, ttl_secs=0)
+        asyncio.run(cached.get_session("s0"))
+        asyncio.run(cached.get_session("s0"))
+        assert store.gets == 2
+
+
+# query chain of the Firestore client, records what was asked for
+class FakeQuery:
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+        self.calls = {}
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls[name] = args
+            return self
+
+        return call
+
+    def stream(self):
+        return iter(self.snapshots[: self.calls["limit"][0]])
+
+
+class TestFirestoreSessionHistory:
+    """Test the Firestore backend"""
+
+    def test_projection_is_applied_by_the_query(self):
+        """Test list pages only download the selected fields"""
+        snapshots = [
+            SimpleNamespace(id=f"s{i}", to_dict=lambda: {"final_emotion": "Calm"})
+            for i in range(3)
+        ]
+        query = FakeQuery(snapshots)
+        client = SimpleNamespace(collection=lambda name: query)
+        store = FirestoreSessionHistory(client)
+        page, cursor = asyncio.run(
+            store.list_sessions(2, None, ["session_id", "final_emotion"])
+        )
+        assert query.calls["select"] == (["session_id", "final_emotion"],)
+        assert page == [
+            {"session_id": "s0", "final_emotion": "Calm"},
+            {"session_id": "s1", "final_emotion": "Calm"},
+        ]
+        assert cursor == "s1"
+
+
+class TestSessionRoutes:
+    """Test the session history API"""
+
+    @pytest.fixture
+    def client(self):
+        app = FastAPI()
+        app.include_router(sessions_router)
+        store = CachedSessionHistory(history())
+        with mock.patch(
+            "app.routes.routes_sessions.get_session_history", lambda: store
+        ):
+            yield TestClient(app)
+
+    def test_list_summary(self, client):
+        """Test lists return summary fields and a cursor"""
+        body = client.get("/sessions", params={"limit": 2}).json()
+        assert [s["session_id"] for s in body["sessions"]] == ["s4", "s3"]
+        assert set(body["sessions"][0]) == set(SUMMARY_FIELDS)
+        following = client.get("/sessions", params={"cursor": body["next_cursor"]})
+        assert following.json()["sessions"][0]["session_id"] == "s2"
+
+    def test_list_projection(self, client):
+        """Test only the requested fields are returned"""
+        body = client.get("/sessions", params={"fields": "final_emotion"}).json()
+        assert body["sessions"][0] == {"session_id": "s4", "final_emotion": "Calm"}
+
+    def test_bad_requests(self, client):
+        """Test unknown fields, cursors and sessions"""
+        assert client.get("/sessions", params={"fields": "nope"}).status_code == 400
+        assert client.get("/sessions", params={"cursor": "nope"}).status_code == 400
+        assert client.get("/sessions/nope").status_code == 404
+
+    def test_page_bounds(self, client):
+        """Test out of range limits and offsets are rejected"""
+        assert client.get("/sessions", params={"limit": 0}).status_code == 422
+        assert client.get("/sessions", params={"limit": 101}).status_code == 422
+        turns = "/sessions/s1/turns"
+        assert client.get(turns, params={"offset": -1}).status_code == 422
+        assert client.get(turns, params={"limit": 101}).status_code == 422
+
+    def test_session_with_turns(self, client):
+        """Test a session can be fetched with its transcript"""
+        body = client.get("/sessions/s1", params={"fields": "qa_pairs"}).json()
+        assert body["qa_pairs"][1]["answer"] == "Answer 1"
+
+    def test_turn_pages(self, client):
+        """Test turns are paged on demand"""
+        body = client.get("/sessions/s1/turns", params={"limit": 1}).json()
+        assert [t["question"] for t in body["turns"]] == ["Question 0?"]
+        assert body["total"] == 2
+        assert body["next_offset"] == 1
+        last = client.get("/sessions/s1/turns", params={"offset": 1}).json()
+        assert last["next_offset"] is None
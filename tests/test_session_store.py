@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from app.models import QAEmotionPair, SessionState
+from app.session_store import InMemorySessionStore, RedisSessionStore
+
+
+def make_state(**kwargs) -> SessionState:
+    kwargs.setdefault("session_id", "session-1")
+    return SessionState(session_timestamp="2025-01-01T12:00:00", **kwargs)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return InMemorySessionStore()
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisSessionStore(fakeredis.aioredis.FakeRedis())
+
+
+class TestSessionStore:
+    """Test session store backends"""
+
+    def test_save_and_load_roundtrip(self, store):
+        """Test a saved snapshot can be loaded back"""
+        state = make_state(
+            qa_pairs=[
+                QAEmotionPair(
+                    question="How are you?",
+                    answer="Good",
+                    emotion="Happy",
+                    confidence=0.9,
+                )
+            ],
+            current_question="What made it good?",
+            direct_question_count=1,
+            music_reminder_given=True,
+        )
+
+        async def run():
+            await store.save(state)
+            return await store.load("session-1")
+
+        loaded = asyncio.run(run())
+        assert loaded == state
+
+    def test_load_missing_session(self, store):
+        """Test unknown session id returns None"""
+        assert asyncio.run(store.load("missing")) is None
+        assert asyncio.run(store.load_audio("missing")) == b""
+
+    def test_audio_is_appended_between_snapshots(self, store):
+        """Test audio deltas from each snapshot are concatenated"""
+
+        async def run():
+            await store.save(make_state(audio_length=3), b"abc")
+            await store.save(make_state(audio_length=6), b"def")
+            return await store.load_audio("session-1")
+
+        assert asyncio.run(run()) == b"abcdef"
+
+    def test_delete(self, store):
+        """Test deleted sessions can't be resumed"""
+
+        async def run():
+            await store.save(make_state(), b"abc")
+            await store.delete("session-1")
+            return await store.load("session-1"), await store.load_audio("session-1")
+
+        assert asyncio.run(run()) == (None, b"")
+
+
+def test_in_memory_store_expires():
+    """Test in-memory snapshots expire after the TTL"""
+    store = InMemorySessionStore(ttl_secs=-1)
+    asyncio.run(store.save(make_state(), b"abc"))
+    assert asyncio.run(store.load("session-1")) is None
+
+
+def test_in_memory_store_sweeps_abandoned_sessions():
+    """Test expired sessions are dropped on save even if never loaded again"""
+    store = InMemorySessionStore(ttl_secs=-1)
+    asyncio.run(store.save(make_state(session_id="abandoned"), b"abc"))
+    store.ttl_secs = 60
+    asyncio.run(store.save(make_state(session_id="active"), b"def"))
+    # the abandoned session was already dropped by the save
+    assert store.sweep() == 0
+    assert asyncio.run(store.load("active")) is not None
+    assert asyncio.run(store.load_audio("active")) == b"def"
@@ -0,0 +1,78 @@
+import numpy as np
+
+from app.context import build_agent_prompt
+from app.emotions import EMOTIONS
+from app.models import SessionState, UserProfile
+from app.song_catalog import SongCatalog, get_song_catalog, is_music_request
+
+ENTRIES = [
+    {"title": "Calm Song", "artist": "Band A", "genres": ["ambient"], "emotions": {"Anxious": 1.0}},
+    {"title": "Sad Song", "artist": "Band B", "genres": ["rock"], "emotions": {"Sad": 0.8, "Depressed": 0.2}},
+    {"title": "Loud Song", "artist": "Band C", "genres": ["metal"], "emotions": {"Angry": 1.0}},
+    {"title": "Other Sad Song", "artist": "Band D", "genres": ["metal"], "emotions": {"Sad": 0.6, "Depressed": 0.4}},
+]  # fmt: skip
+
+
+def distribution(**weights) -> np.ndarray:
+    return np.array([weights.get(emotion, 0.0) for emotion in EMOTIONS])
+
+
+class TestSongCatalog:
+    """Test ranking catalog songs for a session"""
+
+    def test_nearest_emotion_profile_first(self):
+        """Test the closest emotion profile ranks first"""
+        catalog = SongCatalog.from_entries(ENTRIES)
+        candidates = catalog.candidates(distribution(Sad=0.9, Depressed=0.1), k=2)
+        assert [c.song.title for c in candidates] == ["Sad Song", "Other Sad Song"]
+        assert candidates[0].score > candidates[1].score
+
+    def test_preferences_break_ties(self):
+        """Test a preferred genre or artist lifts a close match"""
+        catalog = SongCatalog.from_entries(ENTRIES)
+        sad = distribution(Sad=0.9, Depressed=0.1)
+        by_genre = catalog.candidates(sad, UserProfile(music_genres=["Metal"]), k=1)
+        assert by_genre[0].song.title == "Other Sad Song"
+        by_artist = catalog.candidates(
+            sad, UserProfile(music_genres=[], favorite_artists=["band d"]), k=1
+        )
+        assert by_artist[0].song.title == "Other Sad Song"
+
+    def test_quantized_matches_float(self):
+        """Test the int8 index ranks like the float32 one"""
+        query = distribution(Anxious=0.5, Sad=0.3, Angry=0.2)
+        exact = SongCatalog.from_entries(ENTRIES).candidates(query, k=4)
+        quantized = SongCatalog.from_entries(ENTRIES, quantized=True)
+        assert quantized.profiles.dtype == np.int8
+        approx = quantized.candidates(query, k=4)
+        assert [c.song for c in approx] == [c.song for c in exact]
+        assert np.allclose(
+            [c.score for c in approx], [c.score for c in exact], atol=0.02
+        )
+
+    def test_empty_distribution(self):
+        """Test a session without analyzed turns still gets songs"""
+        catalog = SongCatalog.from_entries(ENTRIES)
+        candidates = catalog.candidates(np.zeros(len(EMOTIONS)), k=10)
+        assert len(candidates) == len(ENTRIES)
+
+    def test_bundled_catalog_loads(self):
+        """Test the shipped catalog only uses known emotions"""
+        catalog = get_song_catalog()
+        assert len(catalog) > 0
+        assert np.allclose(np.linalg.norm(catalog.profiles, axis=1), 1.0)
+
+
+class TestMusicPrompt:
+    """Test candidate songs in the agent prompt"""
+
+    def test_candidates_in_prompt(self):
+        """Test music turns list the ranked songs for the agent"""
+        assert is_music_request("OK, Play me some music please")
+        candidates = SongCatalog.from_entries(ENTRIES).candidates(
+            distribution(Angry=1.0), k=1
+        )
+        state = SessionState(session_id="s", session_timestamp="t")
+        prompt = build_agent_prompt("play me some music", state, None, candidates)
+        assert '["Loud Song by Band C"]' in prompt
+        assert "Candidate songs" not in build_agent_prompt("hi", state)
@@ -0,0 +1,156 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+from app.replay import replay
+from app.trace import (
+    TraceRecorder,
+    current_trace,
+    encode,
+    latency_breakdown,
+    load_trace,
+    trace_span,
+)
+
+
+# a new session where the user asks for music right away
+def music_session_trace() -> list[dict]:
+    committed = {"text": "play me some music"}
+    return [
+        {"t": 0.0, "kind": "open", "query": {"audio_codec": None}},
+        {"t": 0.1, "kind": "tts", "n": 0, "b64": encode(b"mp3 chunk")},
+        {"t": 2.0, "kind": "in", "after": 2, "text": '{"type": "audio_playback_finished"}'},
+        {"t": 2.1, "kind": "stt", "n": 0, "event": "open", "data": None},
+        {"t": 2.2, "kind": "in", "after": 3, "b64": encode(bytes(3200))},
+        {"t": 2.5, "kind": "stt", "n": 0, "event": "partial_transcript", "data": {"text": "play me"}},
+        {"t": 3.0, "kind": "stt", "n": 0, "event": "committed_transcript", "data": committed},
+        {
+            "t": 3.0,
+            "kind": "stt",
+            "n": 0,
+            "event": "committed_transcript_with_timestamps",
+            "data": {**committed, "words": [{"text": "play", "start": 0.1, "end": 0.4, "type": "word"}]},
+        },
+        {"t": 3.1, "kind": "agent", "n": 0, "event": "agent_updated", "name": "Music agent"},
+        {"t": 3.5, "kind": "agent", "n": 0, "event": "delta", "delta": "{}"},
+        {"t": 3.6, "kind": "agent", "n": 0, "event": "final", "output": {"song": "Here Comes the Sun"}},
+        {"t": 1.0, "kind": "span", "stage": "stt", "start": 2.0, "secs": 1.0},
+    ]  # fmt: skip
+
+
+class TestTraceRecorder:
+    """Test recording session traces"""
+
+    def test_milestones_skip_streamed_messages(self):
+        """Test only status messages advance the milestone count"""
+        trace = TraceRecorder()
+        trace.record_outbound({"type": "question", "text": "hi"})
+        trace.record_outbound({"type": "agent_stream_delta", "delta": "x"})
+        trace.record_outbound({"type": "question_audio_base_64", "chunk": ""})
+        trace.record_inbound({"type": "websocket.receive", "text": "{}"})
+        assert trace.milestones == 1
+        assert trace.events[-1]["after"] == 1
+
+    def test_save_and_load(self, tmp_path):
+        """Test a saved trace loads back with binary frames intact"""
+        trace = TraceRecorder()
+        trace.record_inbound({"type": "websocket.receive", "bytes": b"\x00\x01"})
+        path = tmp_path / "session.trace.jsonl.gz"
+        trace.save(path)
+        events = load_trace(path)
+        assert events == trace.events
+        assert events[0]["b64"] == encode(b"\x00\x01")
+
+    def test_trace_span_without_trace(self):
+        """Test stage timing is a no-op for untraced sessions"""
+        assert current_trace.get() is None
+        with trace_span("stt"):
+            pass
+
+    def test_latency_breakdown(self):
+        """Test spans are summarized per stage"""
+        events = [
+            {"t": 0, "kind": "span", "stage": "tts", "start": 0, "secs": secs}
+            for secs in (0.2, 0.4, 0.3)
+        ]
+        breakdown = latency_breakdown(events)
+        assert breakdown["tts"]["count"] == 3
+        assert breakdown["tts"]["p50"] == 0.3
+        assert breakdown["tts"]["max"] == 0.4
+
+
+class TestReplay:
+    """Test driving the websocket endpoint from a trace"""
+
+    def test_replays_session_against_fake_providers(self):
+        """Test a recorded session runs to the same outcome as fast as possible"""
+        replayed = asyncio.run(
+            asyncio.wait_for(replay(music_session_trace(), speed=None), 10)
+        )
+        sent = [e["type"] for e in replayed.events if e["kind"] == "out"]
+        assert sent[:3] == ["session", "question", "listening"]
+        assert sent[-1] == "music_recommendation"
+
+        stages = latency_breakdown(replayed.events)
+        assert {"tts", "playback", "stt", "agent"} <= set(stages)
+        # the replayed run can itself be replayed
+        json.dumps(replayed.events)
+
+    def test_turn_timing_is_recorded(self):
+        """Test the answered turn carries its latency breakdown"""
+        from app.routes import routes_ws
+
+        uploads = []
+        with mock.patch.object(
+            routes_ws,
+            "threading",
+            SimpleNamespace(
+                Thread=lambda target, args, daemon: SimpleNamespace(
+                    start=lambda: uploads.append(args)
+                )
+            ),
+        ):
+            asyncio.run(asyncio.wait_for(replay(music_session_trace()), 10))
+        qa_pairs = uploads[0][3]
+        timing = qa_pairs[-1].timing
+        assert timing.stt_commit_secs is not None
+        assert timing.playback_secs is not None
+        assert timing.run_secs is not None
+        assert timing.router_secs <= timing.run_secs
+
+    def test_music_fast_mode_skips_agent(self):
+        """Test fast mode recommends the top catalog song without an agent run"""
+        from app.routes import routes_ws
+
+        with mock.patch.object(routes_ws, "MUSIC_FAST_MODE", True):
+            replayed = asyncio.run(asyncio.wait_for(replay(music_session_trace()), 10))
+        sent = [e for e in replayed.events if e["kind"] == "out"]
+        assert sent[-1]["type"] == "music_recommendation"
+        assert "agent" not in latency_breakdown(replayed.events)
+
+    def test_disconnect_cancels_agent_run(self):
+        """Test a client leaving mid-turn cancels the in-flight agent run"""
+
+        class HangingRunResult:
+            cancelled = False
+
+            def cancel(self):
+                self.cancelled = True
+
+            async def stream_events(self):
+                await asyncio.Event().wait()
+                yield
+
+        result = HangingRunResult()
+        events = music_session_trace()
+        # the client leaves once the server is analyzing the answer
+        events.append({"t": 3.2, "kind": "in", "after": 4, "disconnect": True})
+        with mock.patch(
+            "app.replay.ReplayRunner",
+            lambda runs, speed: SimpleNamespace(run_streamed=lambda *a: result),
+        ):
+            replayed = asyncio.run(asyncio.wait_for(replay(events), 10))
+        assert result.cancelled
+        sent = [e["type"] for e in replayed.events if e["kind"] == "out"]
+        assert sent[-1] == "analyzing"
@@ -0,0 +1,178 @@
+import asyncio
+
+from app.models import DEFAULT_MUSIC_GENRES, UserProfile
+from app.user_profiles import (
+    CachedUserProfileStore,
+    FirestoreUserProfileStore,
+    InMemoryUserProfileStore,
+    load_user_profile,
+)
+
+
+class CountingStore(InMemoryUserProfileStore):
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+
+    async def get(self, user_id):
+        self.gets += 1
+        return await super().get(user_id)
+
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+class FakeDocument:
+    def __init__(self, documents, user_id):
+        self.documents = documents
+        self.user_id = user_id
+
+    def get(self):
+        return FakeSnapshot(self.documents.get(self.user_id))
+
+    def set(self, data):
+        self.documents[self.user_id] = data
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.documents = {}
+
+    def collection(self, name):
+        return self
+
+    def document(self, user_id):
+        return FakeDocument(self.documents, user_id)
+
+
+class TestUserProfileStores:
+    """Test user profile backends"""
+
+    def test_in_memory_round_trip(self):
+        """Test a saved profile is returned"""
+        store = InMemoryUserProfileStore()
+        profile = UserProfile(user_id="u1", music_genres=["jazz"])
+
+        async def run():
+            await store.save(profile)
+            return await store.get("u1"), await store.get("u2")
+
+        saved, missing = asyncio.run(run())
+        assert saved == profile
+        assert missing is None
+
+    def test_firestore_round_trip(self):
+        """Test profiles are stored as documents keyed on the user id"""
+        client = FakeFirestore()
+        store = FirestoreUserProfileStore(client)
+        profile = UserProfile(user_id="u1", favorite_artists=["Nina Simone"])
+
+        async def run():
+            await store.save(profile)
+            return await store.get("u1"), await store.get("u2")
+
+        saved, missing = asyncio.run(run())
+        assert saved == profile
+        assert missing is None
+        assert client.documents["u1"]["favorite_artists"] == ["Nina Simone"]
+
+
+class TestCachedUserProfileStore:
+    """Test the read-through profile cache"""
+
+    def test_reads_through_once(self):
+        """Test repeated lookups, including unknown users, hit the cache"""
+        backend = CountingStore()
+        store = CachedUserProfileStore(backend)
+
+        async def run():
+            await backend.save(UserProfile(user_id="u1"))
+            for _ in range(3):
+                await store.get("u1")
+                await store.get("unknown")
+
+        asyncio.run(run())
+        assert backend.gets == 2
+        assert store.stats()["hits"] == 4
+
+    def test_expired_entries_are_reloaded(self):
+        """Test entries past their TTL go back to the backend"""
+        backend = CountingStore()
+        store = CachedUserProfileStore(backend, ttl_secs=-1)
+
+        async def run():
+            await store.get("u1")
+            await store.get("u1")
+
+        asyncio.run(run())
+        assert backend.gets == 2
+
+    def test_least_recently_used_is_evicted(self):
+        """Test the cache stays within its size"""
+        backend = CountingStore()
+        store = CachedUserProfileStore(backend, max_size=2)
+
+        async def run():
+            await store.get("a")
+            await store.get("b")
+            await store.get("a")
+            await store.get("c")
+            await store.get("a")
+            await store.get("b")
+
+        asyncio.run(run())
+        # a stays cached, b was evicted by c and is loaded again
+        assert backend.gets == 4
+
+    def test_save_updates_cache(self):
+        """Test a saved profile is served without a reload"""
+        backend = CountingStore()
+        store = CachedUserProfileStore(backend)
+
+        async def run():
+            await store.get("u1")
+            await store.save(UserProfile(user_id="u1", music_genres=["folk"]))
+            return await store.get("u1")
+
+        assert asyncio.run(run()).music_genres == ["folk"]
+        assert backend.gets == 1
+
+
+class TestLoadUserProfile:
+    """Test loading the profile at session start"""
+
+    def test_anonymous_user_gets_default(self):
+        """Test sessions without a user id don't touch the store"""
+
+        def get_store():
+            raise AssertionError("not expected")
+
+        profile = asyncio.run(load_user_profile(get_store, None))
+        assert profile.music_genres == DEFAULT_MUSIC_GENRES
+
+    def test_unavailable_store_falls_back(self):
+        """Test a failing store never blocks the session"""
+
+        def get_store():
+            raise RuntimeError("no credentials")
+
+        profile = asyncio.run(load_user_profile(get_store, "u1"))
+        assert profile.user_id == "u1"
+        assert profile.music_genres == DEFAULT_MUSIC_GENRES
+
+    def test_profile_is_in_prompt(self):
+        """Test the music preferences reach the agent context"""
+        from app.context import build_agent_prompt
+        from app.models import SessionState
+
+        state = SessionState(session_id="s", session_timestamp="2025-01-01")
+        profile = UserProfile(user_id="u1", music_genres=["jazz"])
+        prompt = build_agent_prompt("play me some music", state, profile)
+        assert '"music_genres":["jazz"]' in prompt
+        assert "u1" not in prompt
@@ -1,4 +1,8 @@
 import StreamingService from "../services/streamingService";
+import OpusUplinkEncoder from "./opusUplinkEncoder";
+
+// set VITE_AUDIO_UPLINK_CODEC=opus to compress mic audio when the browser supports it
+const UPLINK_CODEC = import.meta.env.VITE_AUDIO_UPLINK_CODEC ?? "pcm";
 
 export default class AudioRecorder {
   private isRecording: boolean = false;
@@ -7,6 +11,7 @@ export default class AudioRecorder {
   private stream: MediaStream | null = null;
   private streamingService: StreamingService;
   private recorderNode: AudioWorkletNode | null = null;
+  private opusEncoder: OpusUplinkEncoder | null = null;
   private onRecordingStart?: () => void;
 
   constructor(streamingService: StreamingService) {
@@ -61,8 +66,9 @@ export default class AudioRecorder {
     }
 
     // get mic stream
+    // echo cancellation keeps question playback out of the mic during barge-in
     this.stream = await navigator.mediaDevices.getUserMedia({
-      audio: true,
+      audio: { echoCancellation: true, noiseSuppression: true },
       video: false,
     });
 
@@ -77,16 +83,28 @@ export default class AudioRecorder {
     );
     this.source.connect(this.recorderNode);
 
-    // connect to streaming service
-    this.streamingService.connect();
+    // connect to streaming service, asking for opus when the browser can encode it
+    const useOpus =
+      UPLINK_CODEC === "opus" && (await OpusUplinkEncoder.isSupported());
+    if (useOpus) {
+      this.opusEncoder = new OpusUplinkEncoder((packet) =>
+        this.streamingService.processEncodedAudio(packet),
+      );
+    }
+    this.streamingService.connect(useOpus ? "opus" : "pcm");
 
     // handle incoming audio data from worklet
     this.recorderNode.port.onmessage = (event) => {
       const workletInput = event.data[0];
       if (workletInput) {
         const float32Data = new Float32Array(workletInput);
-        const int16Data = this.linear16PCM(float32Data);
-        this.streamingService.processStreamingAudio(int16Data);
+        const codec = this.streamingService.getAudioCodec();
+        if (codec === "opus" && this.opusEncoder) {
+          this.opusEncoder.encode(float32Data);
+        } else if (codec === "pcm") {
+          const int16Data = this.linear16PCM(float32Data);
+          this.streamingService.processStreamingAudio(int16Data);
+        }
       }
     };
     this.audioContext.resume();
@@ -106,6 +124,10 @@ export default class AudioRecorder {
       this.stream.getTracks().forEach((track) => track.stop());
       this.stream = null;
     }
+    if (this.opusEncoder) {
+      this.opusEncoder.close();
+      this.opusEncoder = null;
+    }
     if (this.audioContext && this.audioContext.state !== "closed") {
       await this.audioContext.close();
     }
@@ -0,0 +1,63 @@
+// https://developer.mozilla.org/en-US/docs/Web/API/AudioEncoder
+const SAMPLE_RATE = 16000;
+const OPUS_CONFIG: AudioEncoderConfig = {
+  codec: "opus",
+  sampleRate: SAMPLE_RATE,
+  numberOfChannels: 1,
+  bitrate: 24000,
+};
+
+// encodes mic audio to raw opus packets, one packet per websocket message
+export default class OpusUplinkEncoder {
+  private encoder: AudioEncoder;
+  private timestampUs: number = 0;
+
+  constructor(onPacket: (packet: ArrayBuffer) => void) {
+    this.encoder = new AudioEncoder({
+      output: (chunk) => {
+        const packet = new ArrayBuffer(chunk.byteLength);
+        chunk.copyTo(packet);
+        onPacket(packet);
+      },
+      error: (error) => {
+        console.error("[OPUS] Encoder error:", error);
+      },
+    });
+    this.encoder.configure(OPUS_CONFIG);
+  }
+
+  public static async isSupported(): Promise<boolean> {
+    if (typeof AudioEncoder === "undefined") {
+      return false;
+    }
+    try {
+      const { supported } = await AudioEncoder.isConfigSupported(OPUS_CONFIG);
+      return supported === true;
+    } catch {
+      return false;
+    }
+  }
+
+  public encode(samples: Float32Array): void {
+    if (this.encoder.state !== "configured") {
+      return;
+    }
+    const audioData = new AudioData({
+      format: "f32",
+      sampleRate: SAMPLE_RATE,
+      numberOfChannels: 1,
+      numberOfFrames: samples.length,
+      timestamp: this.timestampUs,
+      data: samples as Float32Array<ArrayBuffer>,
+    });
+    this.timestampUs += (samples.length / SAMPLE_RATE) * 1_000_000;
+    this.encoder.encode(audioData);
+    audioData.close();
+  }
+
+  public close(): void {
+    if (this.encoder.state !== "closed") {
+      this.encoder.close();
+    }
+  }
+}
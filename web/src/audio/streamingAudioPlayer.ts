@@ -0,0 +1,218 @@
+const MIME_TYPE = "audio/mpeg";
+// keep at most this much decoded audio queued ahead of the playhead
+const MAX_BUFFER_AHEAD_SECS = 20;
+// seconds of already played audio kept in the source buffer
+const KEEP_BEHIND_SECS = 2;
+const PROGRESS_INTERVAL_MS = 500;
+
+// plays question audio while it is still streaming from the server
+export default class StreamingAudioPlayer {
+  private audio: HTMLAudioElement | null = null;
+  private mediaSource: MediaSource | null = null;
+  private sourceBuffer: SourceBuffer | null = null;
+  private objectUrl: string | null = null;
+  private pending: Uint8Array[] = [];
+  private fallbackChunks: Uint8Array[] = [];
+  private streamEnded: boolean = false;
+  private active: boolean = false;
+  private lastProgressTime: number = 0;
+  private finished: Promise<void> | null = null;
+  private resolveFinished: (() => void) | null = null;
+  private onProgress?: (positionSecs: number) => void;
+
+  constructor(onProgress?: (positionSecs: number) => void) {
+    this.onProgress = onProgress;
+  }
+
+  public static isSupported(): boolean {
+    return (
+      typeof MediaSource !== "undefined" &&
+      MediaSource.isTypeSupported(MIME_TYPE)
+    );
+  }
+
+  public isActive(): boolean {
+    return this.active;
+  }
+
+  // add a chunk, the first chunk of a stream starts playback
+  public push(chunk: Uint8Array): void {
+    if (!this.active) {
+      this.start();
+    }
+    if (!StreamingAudioPlayer.isSupported()) {
+      this.fallbackChunks.push(chunk);
+      return;
+    }
+    this.pending.push(chunk);
+    this.pump();
+  }
+
+  // no more chunks for this stream, resolves once playback has ended
+  public async finish(): Promise<void> {
+    if (!this.active) {
+      return;
+    }
+    this.streamEnded = true;
+    if (!StreamingAudioPlayer.isSupported()) {
+      this.playFallback();
+    } else {
+      this.pump();
+    }
+    await this.finished;
+  }
+
+  // stop playback immediately and drop everything still buffered
+  public stop(): void {
+    if (!this.active) {
+      return;
+    }
+    this.audio?.pause();
+    this.complete();
+  }
+
+  private start(): void {
+    this.active = true;
+    this.streamEnded = false;
+    this.pending = [];
+    this.fallbackChunks = [];
+    this.lastProgressTime = 0;
+    this.finished = new Promise<void>((resolve) => {
+      this.resolveFinished = resolve;
+    });
+
+    if (!StreamingAudioPlayer.isSupported()) {
+      return;
+    }
+
+    this.mediaSource = new MediaSource();
+    this.objectUrl = URL.createObjectURL(this.mediaSource);
+    this.audio = new Audio(this.objectUrl);
+    this.audio.onended = () => this.complete();
+    this.audio.onerror = (error) => {
+      console.error("[PLAYER] Audio playback error:", error);
+      this.complete();
+    };
+    this.audio.ontimeupdate = () => {
+      this.reportProgress();
+      // playhead moved, there may be room for held back chunks
+      this.pump();
+    };
+
+    this.mediaSource.addEventListener(
+      "sourceopen",
+      () => {
+        if (!this.mediaSource) return;
+        this.sourceBuffer = this.mediaSource.addSourceBuffer(MIME_TYPE);
+        this.sourceBuffer.mode = "sequence";
+        this.sourceBuffer.addEventListener("updateend", () => this.pump());
+        this.pump();
+      },
+      { once: true },
+    );
+
+    this.audio.play().catch((error) => {
+      console.error("[PLAYER] Error starting playback:", error);
+      this.complete();
+    });
+  }
+
+  // append queued chunks one at a time, holding back when far ahead of the playhead
+  private pump(): void {
+    const sourceBuffer = this.sourceBuffer;
+    if (!this.active || !sourceBuffer || !this.mediaSource || !this.audio) {
+      return;
+    }
+    if (sourceBuffer.updating || this.mediaSource.readyState !== "open") {
+      return;
+    }
+
+    if (this.pending.length === 0) {
+      if (this.streamEnded) {
+        this.mediaSource.endOfStream();
+      }
+      return;
+    }
+
+    if (this.bufferedAhead() > MAX_BUFFER_AHEAD_SECS) {
+      return;
+    }
+
+    const chunk = this.pending[0];
+    try {
+      sourceBuffer.appendBuffer(chunk as Uint8Array<ArrayBuffer>);
+      this.pending.shift();
+    } catch (error) {
+      if ((error as DOMException).name === "QuotaExceededError") {
+        // free already played audio and retry on updateend
+        const playedUntil = this.audio.currentTime - KEEP_BEHIND_SECS;
+        if (playedUntil > 0) {
+          sourceBuffer.remove(0, playedUntil);
+        }
+        return;
+      }
+      console.error("[PLAYER] Error appending audio:", error);
+      this.stop();
+    }
+  }
+
+  private bufferedAhead(): number {
+    if (!this.sourceBuffer || !this.audio) return 0;
+    const buffered = this.sourceBuffer.buffered;
+    if (buffered.length === 0) return 0;
+    return buffered.end(buffered.length - 1) - this.audio.currentTime;
+  }
+
+  private reportProgress(): void {
+    if (!this.audio || !this.onProgress) return;
+    const now = performance.now();
+    if (now - this.lastProgressTime < PROGRESS_INTERVAL_MS) return;
+    this.lastProgressTime = now;
+    this.onProgress(this.audio.currentTime);
+  }
+
+  // browsers without MediaSource mp3 support play the whole clip at the end
+  private playFallback(): void {
+    if (this.fallbackChunks.length === 0) {
+      this.complete();
+      return;
+    }
+    const blob = new Blob(this.fallbackChunks as Uint8Array<ArrayBuffer>[], {
+      type: MIME_TYPE,
+    });
+    this.objectUrl = URL.createObjectURL(blob);
+    this.audio = new Audio(this.objectUrl);
+    this.audio.onended = () => this.complete();
+    this.audio.onerror = (error) => {
+      console.error("[PLAYER] Audio playback error:", error);
+      this.complete();
+    };
+    this.audio.ontimeupdate = () => this.reportProgress();
+    this.audio.play().catch((error) => {
+      console.error("[PLAYER] Error playing audio:", error);
+      this.complete();
+    });
+  }
+
+  private complete(): void {
+    if (this.audio) {
+      this.audio.onended = null;
+      this.audio.onerror = null;
+      this.audio.ontimeupdate = null;
+    }
+    if (this.objectUrl) {
+      URL.revokeObjectURL(this.objectUrl);
+    }
+    this.audio = null;
+    this.mediaSource = null;
+    this.sourceBuffer = null;
+    this.objectUrl = null;
+    this.pending = [];
+    this.fallbackChunks = [];
+    this.active = false;
+    if (this.resolveFinished) {
+      this.resolveFinished();
+      this.resolveFinished = null;
+    }
+  }
+}
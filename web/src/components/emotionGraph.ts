@@ -1,9 +1,23 @@
 import Chart from "chart.js/auto";
 
+const NEGATIVE_EMOTIONS = [
+  "Depressed",
+  "Sad",
+  "Stressed",
+  "Anxious",
+  "Angry",
+  "Frustrated",
+  "Unfocused",
+  "Confused",
+];
+
 export default class EmotionGraph {
   private container: HTMLElement;
   private emotionGraphElement: HTMLElement;
   private chartInstance: Chart | null = null;
+  private moodElement: HTMLElement | null = null;
+  private confidenceElement: HTMLElement | null = null;
+  private sessionMoodElement: HTMLElement | null = null;
 
   constructor(container: HTMLElement) {
     this.container = container;
@@ -13,55 +27,77 @@ export default class EmotionGraph {
     this.container.appendChild(this.emotionGraphElement);
   }
 
+  // the chart is built once and updated in place on every turn
   public update(
     mood: string,
     confidence: number,
     negativeEmotionPercentages: Record<string, number> | null,
+    emotionDistribution: Record<string, number> | null = null,
   ): void {
     this.show();
-    const NEGATIVE_EMOTIONS = [
-      "Depressed",
-      "Sad",
-      "Stressed",
-      "Anxious",
-      "Angry",
-      "Frustrated",
-      "Unfocused",
-      "Confused",
-    ];
+    if (!this.chartInstance) {
+      this.render();
+    }
+
+    if (this.moodElement) this.moodElement.textContent = mood;
+    if (this.confidenceElement) {
+      this.confidenceElement.textContent = `Confidence: ${(confidence * 100).toFixed(0)}%`;
+    }
+    const sessionEntries = Object.entries(emotionDistribution ?? {});
+    if (this.sessionMoodElement && sessionEntries.length > 0) {
+      const [sessionMood, share] = sessionEntries.reduce((best, entry) =>
+        entry[1] > best[1] ? entry : best,
+      );
+      this.sessionMoodElement.textContent = `Session mood: ${sessionMood} (${(share * 100).toFixed(0)}%)`;
+    }
+
+    if (!this.chartInstance) return;
+    const [turnDataset, sessionDataset] = this.chartInstance.data.datasets;
+    turnDataset.data = NEGATIVE_EMOTIONS.map(
+      (emotion) =>
+        (negativeEmotionPercentages && negativeEmotionPercentages[emotion]) ||
+        0,
+    );
+    sessionDataset.data = NEGATIVE_EMOTIONS.map(
+      (emotion) =>
+        ((emotionDistribution && emotionDistribution[emotion]) || 0) * 100,
+    );
+    this.chartInstance.update();
+  }
+
+  private render(): void {
     this.emotionGraphElement.innerHTML = `
       <div class="emotion-graph-content">
         <div class="result-title">Analysis Breakdown</div>
-        <div class="result-label">Current detected mood: <span class="result-mood">${mood}</span></div>
-        <div class="result-confidence">Confidence: ${(confidence * 100).toFixed(0)}%</div>
+        <div class="result-label">Current detected mood: <span class="result-mood"></span></div>
+        <div class="result-confidence"></div>
+        <div class="result-confidence session-mood"></div>
         <div class="emotion-chart-container">
           <canvas id="emotion-bar-chart" width="400" height="250"></canvas>
         </div>
       </div>
     `;
+    this.moodElement = this.emotionGraphElement.querySelector(".result-mood");
+    this.confidenceElement = this.emotionGraphElement.querySelector(
+      ".result-confidence:not(.session-mood)",
+    );
+    this.sessionMoodElement =
+      this.emotionGraphElement.querySelector(".session-mood");
+
     const canvas = this.emotionGraphElement.querySelector(
       "#emotion-bar-chart",
     ) as HTMLCanvasElement | null;
     if (!canvas) return;
     const ctx = canvas.getContext("2d");
     if (!ctx) return;
-    const labels = NEGATIVE_EMOTIONS;
-    const data = labels.map(
-      (emotion) =>
-        (negativeEmotionPercentages && negativeEmotionPercentages[emotion]) ||
-        0,
-    );
-    if (this.chartInstance) {
-      this.chartInstance.destroy();
-    }
     this.chartInstance = new Chart(ctx, {
       type: "bar",
       data: {
-        labels,
+        labels: NEGATIVE_EMOTIONS,
         datasets: [
           {
-            label: "Negative Emotion (%)",
-            data,
+            label: "This answer (%)",
+            data: NEGATIVE_EMOTIONS.map(() => 0),
             backgroundColor: [
               "#ef4444",
               "#f59e42",
@@ -75,6 +111,13 @@ export default class EmotionGraph {
             borderRadius: 6,
             borderSkipped: false,
           },
+          {
+            label: "Session (%)",
+            data: NEGATIVE_EMOTIONS.map(() => 0),
+            backgroundColor: "#94a3b8",
+            borderRadius: 6,
+            borderSkipped: false,
+          },
         ],
       },
       options: {
@@ -83,7 +126,7 @@ export default class EmotionGraph {
           x: { min: 0, max: 100, title: { display: true, text: "%" } },
         },
         plugins: {
-          legend: { display: false },
+          legend: { display: true },
         },
         animation: false,
         responsive: false,
@@ -1,4 +1,17 @@
 const WS_URL = import.meta.env.VITE_AGENT_URL;
+const MAX_RECONNECT_ATTEMPTS = 3;
+const RECONNECT_DELAY_MS = 1000;
+const USER_ID_KEY = "userId";
+
+// anonymous id kept in the browser so the server can load this user's music preferences
+function getUserId(): string {
+  let userId = localStorage.getItem(USER_ID_KEY);
+  if (!userId) {
+    userId = crypto.randomUUID();
+    localStorage.setItem(USER_ID_KEY, userId);
+  }
+  return userId;
+}
 
 export default class StreamingService {
   private websocket: WebSocket | null = null;
@@ -14,12 +27,14 @@ export default class StreamingService {
     mood: string,
     confidence: number,
     negativeEmotionPercentages: Record<string, number> | null,
+    emotionDistribution: Record<string, number> | null,
   ) => void;
   public setOnIntermediateResult(
     callback: (
       mood: string,
       confidence: number,
       negativeEmotionPercentages: Record<string, number> | null,
+      emotionDistribution: Record<string, number> | null,
     ) => void,
   ): void {
     this.onIntermediateResult = callback;
@@ -28,6 +43,11 @@ export default class StreamingService {
   private onWebSocketClosed?: () => void;
   private onMusicRecommendation?: (music: string) => void;
   private helper: any = null;
+  private sessionId: string | null = null;
+  private closedByClient: boolean = false;
+  private reconnectAttempts: number = 0;
+  private requestedAudioCodec: string = "pcm";
+  private audioCodec: string | null = null;
   private onAgentStream?: (payload: any, isFinal: boolean) => void;
   public setOnAgentStream(
     callback: (payload: any, isFinal: boolean) => void,
@@ -51,6 +71,7 @@ export default class StreamingService {
       mood: string,
       confidence: number,
       negativeEmotionPercentages: Record<string, number> | null,
+      emotionDistribution: Record<string, number> | null,
     ) => void,
   ) {
     this.onTranscriptUpdate = onTranscriptUpdate;
@@ -71,11 +92,30 @@ export default class StreamingService {
     this.helper = helper;
   }
 
-  public connect(): void {
-    this.websocket = new WebSocket(WS_URL);
+  // audioCodec is a request, the server answers with the codec it accepted
+  public connect(audioCodec: string = "pcm"): void {
+    this.requestedAudioCodec = audioCodec;
+    this.closedByClient = false;
+    this.sessionId = null;
+    this.reconnectAttempts = 0;
+    this.open();
+  }
+
+  // resume handshake: reconnect with the session id the server gave us
+  private open(): void {
+    const params = new URLSearchParams({
+      audio_codec: this.requestedAudioCodec,
+      user_id: getUserId(),
+    });
+    if (this.sessionId) {
+      params.set("session_id", this.sessionId);
+    }
+    this.audioCodec = null;
+    this.websocket = new WebSocket(`${WS_URL}?${params.toString()}`);
 
     this.websocket.onopen = () => {
       console.log("WebSocket connection opened");
+      this.reconnectAttempts = 0;
       if (this.helper) {
         this.helper.setWebSocket(this.websocket);
       }
@@ -86,6 +126,27 @@ export default class StreamingService {
         const data = JSON.parse(event.data);
 
         switch (data.type) {
+          case "session":
+            this.sessionId = data.session_id;
+            this.audioCodec = data.audio_codec ?? "pcm";
+            console.log(
+              `Session ${data.session_id} ${data.resumed ? "resumed" : "started"}`,
+            );
+            break;
+          case "queued":
+            if (this.helper) {
+              this.helper.onQueued(data.position, data.eta_secs);
+            }
+            break;
+          case "overloaded":
+            // the server shed this session, don't auto-reconnect into the overload
+            this.sessionId = null;
+            if (this.onError) {
+              this.onError(
+                `Server is busy, please try again in ${data.retry_after}s`,
+              );
+            }
+            break;
           case "agent_stream_delta":
             if (this.onAgentStream) this.onAgentStream(data.delta, false);
             break;
@@ -98,6 +159,7 @@ export default class StreamingService {
                 data.mood,
                 data.confidence,
                 data.negative_emotion_percentages,
+                data.emotion_distribution ?? null,
               );
             }
             break;
@@ -116,6 +178,11 @@ export default class StreamingService {
               this.onQuestion(data.text);
             }
             break;
+          case "stop_playback":
+            if (this.helper) {
+              this.helper.stopPlayback();
+            }
+            break;
           case "listening":
             if (this.onListening) {
               this.onListening();
@@ -147,6 +214,8 @@ export default class StreamingService {
             }
             break;
           case "music_recommendation":
+            // finished sessions can't be resumed
+            this.sessionId = null;
             if (this.onMusicRecommendation) {
               this.onMusicRecommendation(data.music);
             }
@@ -170,6 +239,20 @@ export default class StreamingService {
 
     this.websocket.onclose = () => {
       console.log("WebSocket connection closed");
+      if (
+        !this.closedByClient &&
+        this.sessionId &&
+        this.reconnectAttempts < MAX_RECONNECT_ATTEMPTS
+      ) {
+        this.reconnectAttempts++;
+        console.log(
+          `Reconnecting to session ${this.sessionId} (attempt ${this.reconnectAttempts})`,
+        );
+        setTimeout(() => {
+          if (!this.closedByClient) this.open();
+        }, RECONNECT_DELAY_MS * this.reconnectAttempts);
+        return;
+      }
       if (this.onWebSocketClosed) {
         this.onWebSocketClosed();
       }
@@ -177,6 +260,8 @@ export default class StreamingService {
   }
 
   public disconnect(): void {
+    this.closedByClient = true;
+    this.sessionId = null;
     if (this.websocket) {
       this.websocket.close();
       this.websocket = null;
@@ -189,6 +274,17 @@ export default class StreamingService {
     }
   }
 
+  public processEncodedAudio(packet: ArrayBuffer): void {
+    if (this.websocket && this.websocket.readyState === WebSocket.OPEN) {
+      this.websocket.send(packet);
+    }
+  }
+
+  // null until the server has confirmed the uplink codec
+  public getAudioCodec(): string | null {
+    return this.audioCodec;
+  }
+
   public isWebSocketOpen(): boolean {
     return this.websocket?.readyState === WebSocket.OPEN;
   }
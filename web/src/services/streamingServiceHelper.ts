@@ -3,9 +3,10 @@ import RealtimeTranscript from "../components/realtimeTranscript";
 import RecordButton from "../components/recordButton";
 import AudioRecorder from "../audio/audioRecorder";
 import MusicRecommendation from "../components/musicRecommendation";
+import StreamingAudioPlayer from "../audio/streamingAudioPlayer";
 
 export class StreamingServiceHelper {
-  private audioChunks: Uint8Array[] = [];
+  private player: StreamingAudioPlayer;
   private agentStatus: AgentStatus;
   private emotionGraph: any;
   private realtimeTranscript: RealtimeTranscript;
@@ -31,6 +32,9 @@ export class StreamingServiceHelper {
     this.recordButton = recordButton;
     this.audioRecorder = audioRecorder;
     this.musicRecommendation = musicRecommendation;
+    this.player = new StreamingAudioPlayer((position) =>
+      this.sendPlaybackProgress(position),
+    );
 
     this.onTranscriptUpdate = this.onTranscriptUpdate.bind(this);
     this.onQuestionAudio = this.onQuestionAudio.bind(this);
@@ -45,6 +49,20 @@ export class StreamingServiceHelper {
     this.onMusicRecommendation = this.onMusicRecommendation.bind(this);
     this.onIntermediateResult = this.onIntermediateResult.bind(this);
     this.onAgentStream = this.onAgentStream.bind(this);
+    this.stopPlayback = this.stopPlayback.bind(this);
+  }
+
+  // barge-in: server heard the user, cut the question short
+  public stopPlayback(): void {
+    this.player.stop();
+  }
+
+  private sendPlaybackProgress(position: number): void {
+    if (this.websocket && this.websocket.readyState === WebSocket.OPEN) {
+      this.websocket.send(
+        JSON.stringify({ type: "playback_progress", position }),
+      );
+    }
   }
 
   public setWebSocket(websocket: WebSocket): void {
@@ -55,12 +73,14 @@ export class StreamingServiceHelper {
     this.realtimeTranscript.update(transcript, isFinal);
   }
 
+  // playback starts with the first chunk, not when the question arrives
   public onQuestionAudio(chunk: string): void {
-    const bytes = new Uint8Array(atob(chunk).length);
+    const binary = atob(chunk);
+    const bytes = new Uint8Array(binary.length);
     for (let i = 0; i < bytes.length; i++) {
-      bytes[i] = atob(chunk).charCodeAt(i);
+      bytes[i] = binary.charCodeAt(i);
     }
-    this.audioChunks.push(bytes);
+    this.player.push(bytes);
   }
 
   public async onQuestion(question: string): Promise<void> {
@@ -76,46 +96,8 @@ export class StreamingServiceHelper {
     this.recordButton.setEnabled(false);
     this.recordButton.setSessionActive(false);
 
-    if (this.audioChunks.length > 0) {
-      const totalLength = this.audioChunks.reduce(
-        (sum, chunk) => sum + chunk.length,
-        0,
-      );
-      const combined = new Uint8Array(totalLength);
-      let offset = 0;
-      for (const chunk of this.audioChunks) {
-        combined.set(chunk, offset);
-        offset += chunk.length;
-      }
-
-      const blob = new Blob([combined.buffer as ArrayBuffer], {
-        type: "audio/mpeg",
-      });
-      const url = URL.createObjectURL(blob);
-      const audio = new Audio(url);
-
-      const audioFinished = new Promise<void>((resolve) => {
-        audio.onended = () => {
-          URL.revokeObjectURL(url);
-          resolve();
-        };
-
-        audio.onerror = (error) => {
-          console.error("[HELPER] Audio playback error:", error);
-          URL.revokeObjectURL(url);
-          resolve();
-        };
-      });
-
-      try {
-        await audio.play();
-        await audioFinished;
-      } catch (error) {
-        console.error("[HELPER] Error playing audio:", error);
-      }
-
-      this.audioChunks = [];
-    }
+    // stream is complete once the status arrives, wait for the tail to play
+    await this.player.finish();
 
     if (this.websocket && this.websocket.readyState === WebSocket.OPEN) {
       this.websocket.send(JSON.stringify({ type: "audio_playback_finished" }));
@@ -124,6 +106,13 @@ export class StreamingServiceHelper {
     }
   }
 
+  // the worker is full, the session starts when a slot frees up
+  public onQueued(position: number, etaSecs: number): void {
+    this.agentStatus.showNoResult(
+      `Waiting for a free slot: you're number ${position} in line (about ${etaSecs}s)`,
+    );
+  }
+
   public onListening(): void {
     this.agentStatus.showListening();
     this.recordButton.setEnabled(true);
@@ -155,49 +144,8 @@ export class StreamingServiceHelper {
     this.recordButton.setEnabled(false);
     this.recordButton.setSessionActive(false);
 
-    if (this.audioChunks.length > 0) {
-      const totalLength = this.audioChunks.reduce(
-        (sum, chunk) => sum + chunk.length,
-        0,
-      );
-      const combined = new Uint8Array(totalLength);
-      let offset = 0;
-      for (const chunk of this.audioChunks) {
-        combined.set(chunk, offset);
-        offset += chunk.length;
-      }
-
-      const blob = new Blob([combined.buffer as ArrayBuffer], {
-        type: "audio/mpeg",
-      });
-      const url = URL.createObjectURL(blob);
-      const audio = new Audio(url);
-
-      const audioFinished = new Promise<void>((resolve) => {
-        audio.onended = () => {
-          URL.revokeObjectURL(url);
-          resolve();
-        };
-
-        audio.onerror = (error) => {
-          console.error(
-            "[HELPER] Empty transcript audio playback error:",
-            error,
-          );
-          URL.revokeObjectURL(url);
-          resolve();
-        };
-      });
-
-      try {
-        await audio.play();
-        await audioFinished;
-      } catch (error) {
-        console.error("[HELPER] Error playing empty transcript audio:", error);
-      }
-
-      this.audioChunks = [];
-    }
+    // stream is complete once the status arrives, wait for the tail to play
+    await this.player.finish();
 
     if (this.websocket && this.websocket.readyState === WebSocket.OPEN) {
       this.websocket.send(JSON.stringify({ type: "audio_playback_finished" }));
@@ -225,15 +173,21 @@ export class StreamingServiceHelper {
   public onWebSocketClosed(): void {
     this.recordButton.setEnabled(true);
     this.recordButton.setSessionActive(false);
-    this.audioChunks = [];
+    this.player.stop();
   }
 
   public onIntermediateResult(
     mood: string,
     confidence: number,
     negativeEmotionPercentages: Record<string, number> | null,
+    emotionDistribution: Record<string, number> | null = null,
   ): void {
-    this.emotionGraph.update(mood, confidence, negativeEmotionPercentages);
+    this.emotionGraph.update(
+      mood,
+      confidence,
+      negativeEmotionPercentages,
+      emotionDistribution,
+    );
   }
 
   public onAgentStream(payload: any, isFinal: boolean): void {